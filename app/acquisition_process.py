@@ -0,0 +1,251 @@
+import gc
+import multiprocessing
+import os
+import signal
+import stat
+import struct
+from multiprocessing import shared_memory
+from gpio_nats_logging import logger
+
+# Ring header: write index (u32, wraps) and capacity (u32). A u32 index is written with
+# a single aligned store, which is atomic on the 32-bit ARM cores of older boards.
+INDEX_FORMAT = struct.Struct("<I")
+HEADER_FORMAT = struct.Struct("<II")
+# Event record: timestamp ns (u64), record index (u32), channel (u16), level (u8), padding
+RECORD_FORMAT = struct.Struct("<QIHBx")
+INDEX_MASK = 0xFFFFFFFF
+
+
+class EventRing:
+    """Single-producer/single-consumer ring of fixed-size edge records in shared memory.
+
+    The producer writes a record, then advances the write index, then announces the
+    record with a Wakeup. Python has no memory barrier, and ARM cores may make plain
+    stores visible to another core out of order, so the write index alone does not
+    prove that a record's bytes have arrived. The wakeup does: writing and reading an
+    eventfd go through a lock in the kernel, so every store the producer made before
+    notify() is visible to the consumer once it has read that notification. The
+    consumer therefore reads no more records than it has taken wakeups for (``read``'s
+    ``announced``), however far the write index has moved.
+
+    Each record carries its own index, and the write index is read again after the
+    records are copied. A consumer that the producer laps therefore counts the
+    overwritten slots as lost and does not return them.
+    """
+
+    def __init__(self, capacity=1024):
+        # Power-of-two capacity keeps slot numbers consistent when the u32 index wraps
+        self.capacity = 1 << max(4, (capacity - 1).bit_length())
+        size = HEADER_FORMAT.size + self.capacity * RECORD_FORMAT.size
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.buf = self.shm.buf
+        HEADER_FORMAT.pack_into(self.buf, 0, 0, self.capacity)
+        self._write_index = 0
+        self.read_index = 0
+        self.announced = 0
+        self.lost = 0
+
+    def write(self, t_ns, channel, level):
+        """Append one edge record (producer side); announce it with Wakeup.notify() afterwards."""
+        index = self._write_index
+        offset = HEADER_FORMAT.size + (index & (self.capacity - 1)) * RECORD_FORMAT.size
+        # Record first, write index after it: a consumer never finds the index ahead of a record
+        # it was woken for
+        RECORD_FORMAT.pack_into(self.buf, offset, t_ns, index, channel, level)
+        self._write_index = (index + 1) & INDEX_MASK
+        INDEX_FORMAT.pack_into(self.buf, 0, self._write_index)
+
+    def read(self, announced):
+        """Return the records announced so far as (t_ns, channel, level) tuples.
+
+        ``announced`` is the number of notifications taken from the producer since the
+        last call (Wakeup.clear()); records written but not yet announced wait for the
+        next call.
+        """
+        self.announced += announced
+        write_index = INDEX_FORMAT.unpack_from(self.buf, 0)[0]
+        available = min((write_index - self.read_index) & INDEX_MASK, self.announced)
+        if available > self.capacity:
+            # The producer lapped us: skip to the oldest record still in the ring
+            skipped = available - self.capacity
+            self.lost += skipped
+            self.announced -= skipped
+            self.read_index = (self.read_index + skipped) & INDEX_MASK
+            available = self.capacity
+
+        first_index = self.read_index
+        records = []
+        for position in range(available):
+            index = self.read_index
+            offset = HEADER_FORMAT.size + (index & (self.capacity - 1)) * RECORD_FORMAT.size
+            t_ns, record_index, channel, level = RECORD_FORMAT.unpack_from(self.buf, offset)
+            self.read_index = (index + 1) & INDEX_MASK
+            if record_index != index:
+                # Overwritten before we got to it
+                self.lost += 1
+                continue
+            records.append((position, t_ns, channel, level))
+        self.announced -= available
+
+        # Slots the producer reached again while we were copying may mix two records
+        overwritten = ((INDEX_FORMAT.unpack_from(self.buf, 0)[0] - first_index) & INDEX_MASK) - self.capacity
+        kept = [(t_ns, channel, level) for position, t_ns, channel, level in records if position >= overwritten]
+        self.lost += len(records) - len(kept)
+        return kept
+
+    def close(self, unlink=False):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class Wakeup:
+    """Cross-process wakeup counting its notifications: an eventfd where available, a pipe otherwise.
+
+    A pipe drops notifications once 64 KiB of them are unread, far beyond any ring size;
+    the records they announced are then only read once later ones are announced.
+    """
+
+    def __init__(self):
+        if hasattr(os, 'eventfd'):
+            self.read_fd = self.write_fd = os.eventfd(0, os.EFD_NONBLOCK)
+            self._token = (1).to_bytes(8, 'little')
+        else:
+            self.read_fd, self.write_fd = os.pipe()
+            os.set_blocking(self.read_fd, False)
+            os.set_blocking(self.write_fd, False)
+            self._token = b'\x01'
+
+    def notify(self):
+        try:
+            os.write(self.write_fd, self._token)
+        except BlockingIOError:
+            # Pipe full: the consumer already has a wakeup pending
+            pass
+
+    def clear(self):
+        """Take the pending notifications; returns how many there were."""
+        count = 0
+        try:
+            if self.read_fd == self.write_fd:
+                # An eventfd returns its counter and resets it
+                count = int.from_bytes(os.read(self.read_fd, 8), 'little')
+            else:
+                while True:
+                    data = os.read(self.read_fd, 4096)
+                    if not data:
+                        break
+                    count += len(data)
+        except BlockingIOError:
+            pass
+        return count
+
+    def close(self):
+        os.close(self.read_fd)
+        if self.write_fd != self.read_fd:
+            os.close(self.write_fd)
+
+
+def _close_inherited_sockets():
+    """Close the sockets a forked child inherited, so the parent alone owns its connections."""
+    try:
+        fds = [int(fd) for fd in os.listdir("/proc/self/fd")]
+    except OSError:
+        return
+    for fd in fds:
+        try:
+            if stat.S_ISSOCK(os.fstat(fd).st_mode):
+                os.close(fd)
+        except OSError:
+            pass
+
+
+def _acquisition_main(ring, wakeup, stop_event, parent_pid):
+    """Entry point of the acquisition process: own the GPIO lines and fill the ring."""
+    # The parent handles SIGINT and stops us through stop_event; SIGTERM must still kill
+    # us even though the forked parent's handlers are inherited
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.set_wakeup_fd(-1)
+    # The parent forks us before opening its sockets; this catches the event loop's own
+    # and any opened by an application embedding the starter
+    _close_inherited_sockets()
+    # Nothing allocated here needs collecting; keep the collector away from the callback thread
+    gc.freeze()
+    gc.disable()
+
+    from simple_gpio_handler import SimpleGPIOHandler
+
+    handler = None
+
+    def on_edge(channel, t_ns):
+        ring.write(t_ns, channel, handler.read_level(channel))
+        wakeup.notify()
+
+    def on_sampled(channel, level, t_ns):
+        ring.write(t_ns, channel, level)
+        wakeup.notify()
+
+    # No per-edge logging here: the log write would compete with the next edge's capture
+    handler = SimpleGPIOHandler(callback_function=on_edge, sample_callback=on_sampled, log_edges=False)
+    logger.info(f"GPIO acquisition process {os.getpid()} started")
+    try:
+        while not stop_event.wait(1.0):
+            if os.getppid() != parent_pid:
+                logger.warning("Parent process exited, stopping GPIO acquisition")
+                break
+    finally:
+        handler.cleanup()
+
+
+class AcquisitionProcess:
+    """Runs GPIO acquisition in a separate process and feeds its edges to the event loop.
+
+    Edge capture then no longer competes for the GIL with logging, garbage collection
+    or NATS protocol handling in the main process. ``edge_callback(t_ns, channel, level)``
+    is called on the loop thread for every captured edge.
+    """
+
+    def __init__(self, edge_callback, ring_size=1024):
+        self.edge_callback = edge_callback
+        self.ring = EventRing(ring_size)
+        self.wakeup = Wakeup()
+        self.loop = None
+        self.process = None
+        self.reported_lost = 0
+        context = multiprocessing.get_context('fork')
+        self.stop_event = context.Event()
+        self._context = context
+
+    def start(self, loop):
+        self.loop = loop
+        self.process = self._context.Process(
+            target=_acquisition_main,
+            args=(self.ring, self.wakeup, self.stop_event, os.getpid()),
+            name="dunebugger-gpio-acquisition",
+            daemon=True
+        )
+        self.process.start()
+        loop.add_reader(self.wakeup.read_fd, self._drain)
+        logger.info(f"GPIO acquisition running in process {self.process.pid} "
+                    f"(ring of {self.ring.capacity} events)")
+
+    def _drain(self):
+        for t_ns, channel, level in self.ring.read(self.wakeup.clear()):
+            self.edge_callback(t_ns, channel, level)
+        if self.ring.lost != self.reported_lost:
+            logger.warning(f"GPIO event ring overrun: {self.ring.lost - self.reported_lost} edges lost")
+            self.reported_lost = self.ring.lost
+
+    def stop(self):
+        if self.loop:
+            self.loop.remove_reader(self.wakeup.read_fd)
+        if self.process:
+            self.stop_event.set()
+            self.process.join(timeout=3)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout=1)
+        self.wakeup.close()
+        self.ring.close(unlink=True)
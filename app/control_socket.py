@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+import socket
+import stat
+from gpio_nats_logging import logger
+
+# Longest accepted request line; requests are small JSON objects
+MAX_REQUEST_SIZE = 4096
+
+# Socket mode 0660, applied through the umask so the socket never exists with wider permissions
+SOCKET_UMASK = 0o117
+
+
+class ControlServer:
+    """Local control socket served from the event loop.
+
+    Clients connect to a Unix stream socket and send one JSON object per line, e.g.
+    ``{"cmd": "status"}``. Every request gets one JSON line back: ``{"ok": true,
+    "result": ...}`` or ``{"ok": false, "error": "..."}``.
+
+    ``commands`` maps command names to plain functions taking the request dict. They run
+    on the loop thread and must only read in-memory state or hand work to the trigger
+    queue, so a query never waits on the trigger path.
+
+    The socket accepts pause, resume and test triggers, so it is created with mode 0660
+    from the start: the umask is narrowed for the bind() call instead of chmod'ing the
+    socket afterwards, which would leave a window where any local user could connect.
+    """
+
+    def __init__(self, path, commands):
+        self.path = path
+        self.commands = commands
+        self.server = None
+        self.writers = set()
+        self.requests = 0
+
+    async def start(self):
+        self.server = await asyncio.start_unix_server(self._handle_client, sock=self._bind(), limit=MAX_REQUEST_SIZE)
+        logger.info(f"Control socket listening on {self.path}")
+
+    def _bind(self):
+        try:
+            if not stat.S_ISSOCK(os.lstat(self.path).st_mode):
+                raise OSError(f"{self.path} exists and is not a socket")
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(SOCKET_UMASK)
+        try:
+            sock.bind(self.path)
+        except OSError:
+            sock.close()
+            raise
+        finally:
+            os.umask(umask)
+        return sock
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            for writer in list(self.writers):
+                writer.close()
+            await self.server.wait_closed()
+            self.server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle_client(self, reader, writer):
+        self.writers.add(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(self._encode({"ok": False, "error": "request too long"}))
+                    break
+                if not line:
+                    break
+                writer.write(self._encode(self._dispatch(line)))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    def _dispatch(self, line):
+        self.requests += 1
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"ok": False, "error": "invalid JSON"}
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "request must be a JSON object"}
+
+        command = request.get("cmd")
+        handler = self.commands.get(command)
+        if handler is None:
+            return {"ok": False, "error": f"unknown command '{command}', expected one of: {', '.join(self.commands)}"}
+        try:
+            return {"ok": True, "result": handler(request)}
+        except (KeyError, TypeError, ValueError) as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            logger.error(f"Control command '{command}' failed: {e}")
+            return {"ok": False, "error": f"internal error: {e}"}
+
+    @staticmethod
+    def _encode(response):
+        return json.dumps(response, default=str).encode() + b"\n"
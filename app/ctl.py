@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Dunebugger Starter Control
+Query and control a running starter through its local control socket.
+"""
+
+import argparse
+import configparser
+import json
+import socket
+import sys
+import time
+from os import path
+
+CONFIG_FILE = path.join(path.dirname(path.abspath(__file__)), "config/dunebugger-starter.conf")
+DEFAULT_SOCKET = "/tmp/dunebugger-starter.ctl"
+
+
+def configured_socket():
+    """Control socket path from the configuration file, without loading the application."""
+    config = configparser.ConfigParser()
+    config.optionxform = lambda x: x
+    config.read(CONFIG_FILE)
+    return config.get("Control", "controlSocket", fallback=DEFAULT_SOCKET)
+
+
+def request(socket_path, payload, timeout=5.0):
+    """Send one request line and return the decoded response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(payload).encode() + b"\n")
+        response = b""
+        while not response.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            response += chunk
+    return json.loads(response)
+
+
+def print_result(result, prefix=""):
+    if isinstance(result, dict):
+        for key, value in result.items():
+            if isinstance(value, dict):
+                print_result(value, f"{prefix}{key}.")
+            else:
+                print(f"{prefix}{key}: {value}")
+    else:
+        print(result)
+
+
+def print_events(events):
+    for event in events:
+        timestamp = time.strftime("%H:%M:%S", time.localtime(event["time"]))
+        channel = "-" if event["channel"] is None else event["channel"]
+        print(f"{timestamp}.{int(event['time'] * 1000) % 1000:03d}  {event['event']:10} {channel:>4}  {event['detail']}")
+
+
+def print_fleet(fleet):
+    status = ", ".join(f"{count} {name}" for name, count in fleet["status"].items() if count)
+    print(f"{fleet['starters']} starters: {status or 'none'}")
+    for member in fleet["members"]:
+        last_trigger = "-" if member["last_trigger_s_ago"] is None else f"{member['last_trigger_s_ago']}s ago"
+        print(f"{member['client_id']:32} {member['status']:8} seen {member['last_seen_s']:>6}s ago  "
+              f"published {member['published']:>6}  failed {member['failed']:>4}  last trigger {last_trigger}")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Control a running dunebugger starter")
+    parser.add_argument("--socket", help=f"Control socket path (default: from configuration, {DEFAULT_SOCKET})")
+    parser.add_argument("--json", action="store_true", help="Print the raw JSON response")
+    commands = parser.add_subparsers(dest="cmd", required=True)
+    commands.add_parser("status", help="Uptime, GPIO mode, NATS and pause state")
+    commands.add_parser("counters", help="Publish, queue, ingress and sampler counters")
+    commands.add_parser("connection", help="NATS connection state")
+    events = commands.add_parser("events", help="Recent trigger events")
+    events.add_argument("--limit", type=int, default=20, help="Number of events to show")
+    fire = commands.add_parser("fire", help="Queue a test trigger without touching the hardware")
+    fire.add_argument("--pin", type=int, help="Channel to fire (default: gpioPin)")
+    fire.add_argument("--route", default="default", help="Route: default or a pulse class (short, long, ...)")
+    commands.add_parser("pause", help="Hold publishing; triggers stay queued")
+    commands.add_parser("resume", help="Resume publishing")
+    commands.add_parser("memory", help="RSS and, under tracemalloc, Python allocations by module")
+    cues = commands.add_parser("cues", help="Running cue sequences")
+    cues.add_argument("--cancel", metavar="ROUTE", help="Cancel the running sequences of a route, or 'all'")
+    fleet = commands.add_parser("fleet", help="Starters seen through their heartbeats (aggregator mode)")
+    fleet.add_argument("--client", help="Show only this client id")
+    fleet.add_argument("--status", choices=["armed", "idle", "paused", "stale", "offline"],
+                       help="Show only starters with this status")
+    fleet.add_argument("--limit", type=int, help="Number of starters to show")
+    args = parser.parse_args()
+
+    payload = {key: value for key, value in vars(args).items()
+               if value is not None and key not in ("socket", "json")}
+    socket_path = args.socket or configured_socket()
+    try:
+        response = request(socket_path, payload)
+    except (OSError, ValueError) as e:
+        print(f"Cannot reach dunebugger starter at {socket_path}: {e} "
+              f"(is controlEnabled set in [Control]?)", file=sys.stderr)
+        sys.exit(2)
+
+    if args.json:
+        print(json.dumps(response, indent=2))
+    elif not response.get("ok"):
+        print(f"Error: {response.get('error')}", file=sys.stderr)
+    elif args.cmd == "events":
+        print_events(response["result"])
+    elif args.cmd == "fleet":
+        print_fleet(response["result"])
+    else:
+        print_result(response["result"])
+    sys.exit(0 if response.get("ok") else 1)
+
+
+if __name__ == "__main__":
+    main()
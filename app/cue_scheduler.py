@@ -0,0 +1,306 @@
+import contextvars
+import time
+from gpio_nats_logging import logger
+
+RETRIGGER_POLICIES = ("restart", "cancel", "ignore")
+
+
+def parse_cue_sequence(spec):
+    """Parse an '<offset>:<message>[@<subject>], ...' cue list.
+
+    Offsets are seconds from the trigger's edge. Returns (offset_ns, message, subject or
+    None) tuples sorted by offset; invalid entries are logged and skipped.
+    """
+    cues = []
+    if not spec:
+        return cues
+
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            offset, message = entry.split(':', 1)
+            offset_ns = int(float(offset) * 1e9)
+        except ValueError:
+            logger.error(f"Invalid cue entry '{entry}', expected <seconds>:<message>[@<subject>]")
+            continue
+        if offset_ns < 0:
+            logger.error(f"Invalid cue entry '{entry}', the offset must not be negative")
+            continue
+        subject = None
+        if '@' in message:
+            message, subject = message.rsplit('@', 1)
+            subject = subject.strip() or None
+        cues.append((offset_ns, message.strip(), subject))
+    cues.sort(key=lambda cue: cue[0])
+    return cues
+
+
+class WheelTimer:
+    """A callback scheduled on a TimerWheel; cancel() removes it in constant time."""
+
+    __slots__ = ("deadline_ns", "tick", "callback", "args", "wheel")
+
+    def __init__(self, deadline_ns, tick, callback, args, wheel):
+        self.deadline_ns = deadline_ns
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.wheel = wheel
+
+    def cancel(self):
+        if self.wheel is not None:
+            self.wheel._remove(self)
+
+
+class TimerWheel:
+    """Hashed timer wheel on the asyncio loop, with deadlines in time.monotonic_ns().
+
+    Timers are hashed by deadline tick into ``slots`` buckets, so scheduling and
+    cancelling a timer is a set insert or removal however many are pending. The wheel
+    keeps one loop timer, armed at the exact deadline of the earliest pending timer: the
+    tick only buckets timers, it does not round their deadlines, and an empty wheel
+    never wakes the loop. Deadlines are absolute, so a sequence of timers computed from
+    one anchor does not accumulate the lateness of the ones before it. Callbacks run in
+    an empty context: the loop timer is shared, so it carries no caller's contextvars.
+    """
+
+    def __init__(self, tick=0.01, slots=512):
+        self.tick_ns = max(1, int(tick * 1e9))
+        self.slots = [set() for _ in range(max(1, slots))]
+        self.loop = None
+        self.count = 0
+        self._cursor = 0
+        self._handle = None
+        self._wake_ns = None
+
+        # Metrics
+        self.scheduled = 0
+        self.fired = 0
+        self.cancelled = 0
+        self.max_late_ns = 0
+        self.total_late_ns = 0
+
+    def start(self, loop):
+        self.loop = loop
+        self._cursor = time.monotonic_ns() // self.tick_ns
+
+    def close(self):
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+            self._wake_ns = None
+
+    def call_at(self, deadline_ns, callback, *args):
+        """Run ``callback(*args)`` on the loop at ``deadline_ns``; returns the timer."""
+        # Overdue timers go into the current slot rather than a full revolution ahead
+        tick = max(deadline_ns // self.tick_ns, self._cursor)
+        timer = WheelTimer(deadline_ns, tick, callback, args, self)
+        self.slots[tick % len(self.slots)].add(timer)
+        self.count += 1
+        self.scheduled += 1
+        if self._wake_ns is None or deadline_ns < self._wake_ns:
+            self._arm(deadline_ns)
+        return timer
+
+    def _remove(self, timer):
+        # The loop timer stays armed; a wake-up with nothing due just re-arms it
+        self.slots[timer.tick % len(self.slots)].discard(timer)
+        timer.wheel = None
+        self.count -= 1
+        self.cancelled += 1
+
+    def _arm(self, wake_ns):
+        if self._handle:
+            self._handle.cancel()
+        self._wake_ns = wake_ns
+        # loop.time() is time.monotonic(), the same clock as the deadlines. call_at() would
+        # copy the context of whichever caller armed the timer into every callback it runs
+        self._handle = self.loop.call_at(wake_ns / 1e9, self._on_wake, context=contextvars.Context())
+
+    def _on_wake(self):
+        self._handle = None
+        self._wake_ns = None
+        now = time.monotonic_ns()
+        now_tick = now // self.tick_ns
+        size = len(self.slots)
+
+        due = []
+        for tick in range(self._cursor, self._cursor + min(now_tick - self._cursor + 1, size)):
+            slot = self.slots[tick % size]
+            if slot:
+                expired = [timer for timer in slot if timer.deadline_ns <= now]
+                slot.difference_update(expired)
+                due.extend(expired)
+        self._cursor = now_tick
+
+        due.sort(key=lambda timer: timer.deadline_ns)
+        for timer in due:
+            timer.wheel = None
+            self.count -= 1
+            self.fired += 1
+            late_ns = time.monotonic_ns() - timer.deadline_ns
+            self.total_late_ns += late_ns
+            if late_ns > self.max_late_ns:
+                self.max_late_ns = late_ns
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                logger.error(f"Timer callback failed: {e}")
+
+        # Callbacks may have scheduled timers; re-arm for whichever is earliest now
+        if self.count:
+            self._arm(self._next_deadline())
+        else:
+            self.close()
+
+    def _next_deadline(self):
+        """Earliest pending deadline: the first tick ahead with a timer due in it."""
+        size = len(self.slots)
+        for offset in range(size):
+            tick = self._cursor + offset
+            slot = self.slots[tick % size]
+            if slot:
+                deadlines = [timer.deadline_ns for timer in slot if timer.tick <= tick]
+                if deadlines:
+                    return min(deadlines)
+        # Everything pending is more than one revolution away
+        return min(timer.deadline_ns for slot in self.slots for timer in slot)
+
+    def get_metrics(self):
+        return {
+            "pending": self.count,
+            "scheduled": self.scheduled,
+            "fired": self.fired,
+            "cancelled": self.cancelled,
+            "max_late_ms": self.max_late_ns / 1e6,
+            "avg_late_ms": self.total_late_ns / self.fired / 1e6 if self.fired else 0.0,
+        }
+
+
+class CueRun:
+    """A started cue sequence with its pending cue timers and the context it was triggered in."""
+
+    __slots__ = ("route", "channel", "anchor_ns", "context", "timers", "pending")
+
+    def __init__(self, route, channel, anchor_ns, context):
+        self.route = route
+        self.channel = channel
+        self.anchor_ns = anchor_ns
+        self.context = context
+        self.timers = []
+        self.pending = 0
+
+
+class CueSequencer:
+    """Runs the cue sequence of a route when it is triggered.
+
+    ``sequences`` maps route names to (offset_ns, cue route) lists. Every cue is due at
+    the trigger's edge time plus its offset and is handed to ``submit(cue_route, channel,
+    due_ns)`` when due, so cues go through the trigger queue like any trigger. Each cue is
+    submitted in a copy of the context the sequence was triggered in (its trace, for
+    one), not in that of whichever trigger armed the wheel's loop timer. A route
+    triggered again on the same channel while its sequence is still running is handled
+    by the retrigger policy:
+    - restart: the pending cues are cancelled and the sequence starts over from the new edge
+    - cancel: the pending cues are cancelled and nothing is started
+    - ignore: the running sequence continues and the trigger is dropped
+    """
+
+    def __init__(self, wheel, submit, sequences, retrigger="restart", on_cancel=None):
+        if retrigger not in RETRIGGER_POLICIES:
+            logger.error(f"Unknown cue retrigger policy '{retrigger}', using restart")
+            retrigger = "restart"
+        self.wheel = wheel
+        self.submit = submit
+        self.sequences = sequences
+        self.retrigger = retrigger
+        self.on_cancel = on_cancel
+        self.running = {}
+
+        # Metrics
+        self.started = 0
+        self.restarted = 0
+        self.ignored = 0
+        self.cancelled = 0
+
+    def trigger(self, route, channel, captured_ns):
+        """Start (or apply the retrigger policy to) the sequence of ``route``."""
+        run = self.running.get((route.name, channel))
+        if run is not None:
+            if self.retrigger == "ignore":
+                self.ignored += 1
+                logger.info(f"Cue sequence '{route.name}' on channel {channel} is running, trigger ignored")
+                return
+            self._cancel(run)
+            if self.retrigger == "cancel":
+                logger.info(f"Cue sequence '{route.name}' on channel {channel} cancelled by re-trigger")
+                return
+            self.restarted += 1
+        self._start(route, channel, captured_ns)
+
+    def _start(self, route, channel, anchor_ns):
+        run = CueRun(route, channel, anchor_ns, contextvars.copy_context())
+        now = time.monotonic_ns()
+        overdue = []
+        for offset_ns, cue in self.sequences[route.name]:
+            due_ns = anchor_ns + offset_ns
+            if due_ns <= now:
+                overdue.append((cue, due_ns))
+            else:
+                run.timers.append(self.wheel.call_at(due_ns, self._on_cue, run, cue, due_ns))
+        run.pending = len(run.timers)
+        if run.pending:
+            self.running[(route.name, channel)] = run
+        self.started += 1
+        logger.info(f"Cue sequence '{route.name}' started on channel {channel} ({len(overdue) + run.pending} cues)")
+        for cue, due_ns in overdue:
+            self.submit(cue, channel, due_ns)
+
+    def _on_cue(self, run, cue, due_ns):
+        run.pending -= 1
+        if not run.pending and self.running.get((run.route.name, run.channel)) is run:
+            del self.running[(run.route.name, run.channel)]
+        run.context.run(self.submit, cue, run.channel, due_ns)
+
+    def _cancel(self, run):
+        for timer in run.timers:
+            timer.cancel()
+        del self.running[(run.route.name, run.channel)]
+        self.cancelled += run.pending
+        if self.on_cancel:
+            self.on_cancel(run.route, run.channel, run.pending)
+        run.pending = 0
+
+    def cancel(self, route_name=None):
+        """Cancel the running sequences (of one route, or all); returns the number of cues cancelled."""
+        cancelled = 0
+        for run in list(self.running.values()):
+            if route_name is None or run.route.name == route_name:
+                cancelled += run.pending
+                self._cancel(run)
+        return cancelled
+
+    def get_running(self):
+        now = time.monotonic_ns()
+        return [
+            {
+                "route": run.route.name,
+                "channel": run.channel,
+                "elapsed_s": round((now - run.anchor_ns) / 1e9, 3),
+                "pending": run.pending,
+                "next_in_s": round((min(timer.deadline_ns for timer in run.timers if timer.wheel) - now) / 1e9, 3),
+            }
+            for run in self.running.values()
+        ]
+
+    def get_metrics(self):
+        return {
+            "running": len(self.running),
+            "started": self.started,
+            "restarted": self.restarted,
+            "ignored": self.ignored,
+            "cancelled_cues": self.cancelled,
+            "timers": self.wheel.get_metrics(),
+        }
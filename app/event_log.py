@@ -0,0 +1,236 @@
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from gpio_nats_logging import logger
+
+# Segment header: magic, format version, record size, segment sequence, and the wall time (ns)
+# of the previous segment's last record, 0 if unknown
+HEADER_FORMAT = struct.Struct("<8sHHIq")
+EVENT_LOG_MAGIC = b"DBEVLOG\x00"
+EVENT_LOG_VERSION = 2
+
+# Event record (24 bytes): wall time ns, latency us, route id, count, channel, event, lane
+RECORD_FORMAT = struct.Struct("<qIIIHBB")
+
+# Event codes are indexes into this tuple; new events are only ever appended
+EVENT_TYPES = (
+    "unknown", "queued", "published", "failed", "expired", "overflow",
+    "disconnected", "reconnected", "paused", "resumed", "test-fire", "cancelled",
+    "coalesced",
+)
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+
+SEGMENT_PREFIX = "events-"
+SEGMENT_SUFFIX = ".bin"
+# events-<sequence>-<UTC start>.bin[.gz]; the sequence orders segments, the time is informational
+SEGMENT_PATTERN = re.compile(r"events-(\d{10})-\d{8}T\d{6}Z\.bin(?:\.gz)?$")
+
+
+def route_id(name):
+    """Stable 32-bit id of a route name, as stored in event records."""
+    return zlib.crc32(name.encode()) if name else 0
+
+
+def segment_sequence(filename):
+    """Sequence number in a segment file name, or None if it is not a segment."""
+    match = SEGMENT_PATTERN.match(os.path.basename(filename))
+    return int(match.group(1)) if match else None
+
+
+def list_segments(directory):
+    """Segment files (plain and gzip-compressed) in the order they were written."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    segments = [(segment_sequence(name), name) for name in names]
+    return [os.path.join(directory, name) for sequence, name in sorted(segments) if sequence is not None]
+
+
+def last_record_time(path):
+    """Wall time (ns) of the last record in a plain segment, 0 if it has none or is compressed."""
+    if not path.endswith(SEGMENT_SUFFIX):
+        return 0
+    try:
+        with open(path, "rb") as f:
+            count = (os.fstat(f.fileno()).st_size - HEADER_FORMAT.size) // RECORD_FORMAT.size
+            if count <= 0:
+                return 0
+            f.seek(HEADER_FORMAT.size + (count - 1) * RECORD_FORMAT.size)
+            return RECORD_FORMAT.unpack(f.read(RECORD_FORMAT.size))[0]
+    except (OSError, struct.error):
+        return 0
+
+
+class EventLog:
+    """Structured event log of fixed-size binary records, next to the text log.
+
+    Records are packed into a preallocated batch buffer and appended to the active
+    segment with one write per batch: when the batch is full or every
+    ``flush_interval`` seconds. Segments rotate at ``segment_size`` bytes or
+    ``segment_age`` seconds. Closed segments are gzip-compressed in a background
+    thread, and only the newest ``keep_segments`` are kept.
+
+    Segments are numbered in the order they are written, and the records of one segment
+    are in wall-clock order: when the clock steps back (NTP on a board without RTC),
+    the log rotates so queries can still bisect every segment by time.
+    """
+
+    def __init__(self, directory, segment_size=1048576, segment_age=86400, keep_segments=30,
+                 batch_size=256, flush_interval=2.0, clock=time.time_ns):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.segment_age = segment_age
+        self.keep_segments = max(1, keep_segments)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.loop = None
+        self.timer = None
+        self.fd = None
+        self.path = None
+        self.segment_bytes = 0
+        self.segment_opened = 0
+        self.sequence = 0
+        self.last_time_ns = 0
+        self.clock = clock
+        self._buffer = bytearray(RECORD_FORMAT.size * self.batch_size)
+        self._view = memoryview(self._buffer)
+        self._pending = 0
+        self._route_ids = {}
+        self._compressor = None
+
+        # Counters
+        self.records = 0
+        self.batches = 0
+        self.segments = 0
+        self.write_errors = 0
+        self.clock_steps = 0
+
+    def start(self, loop):
+        """Open a new segment and start the periodic flush timer."""
+        self.loop = loop
+        os.makedirs(self.directory, exist_ok=True)
+        existing = list_segments(self.directory)
+        if existing:
+            self.sequence = segment_sequence(existing[-1]) + 1
+            self.last_time_ns = last_record_time(existing[-1])
+        self._open_segment()
+        # Segments left uncompressed by a previous run are closed now
+        self._compress_closed()
+        self.timer = loop.call_later(self.flush_interval, self._on_timer)
+        logger.info(f"Event log writing to {self.directory}")
+
+    def _open_segment(self):
+        stamp = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(self.clock() / 1e9))
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{self.sequence:010d}-{stamp}{SEGMENT_SUFFIX}")
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        os.write(self.fd, HEADER_FORMAT.pack(
+            EVENT_LOG_MAGIC, EVENT_LOG_VERSION, RECORD_FORMAT.size, self.sequence, self.last_time_ns
+        ))
+        self.path = path
+        self.segment_bytes = HEADER_FORMAT.size
+        self.segment_opened = time.monotonic()
+        self.sequence += 1
+        self.segments += 1
+
+    def record(self, event, channel=None, route=None, lane=0, latency_ns=0, count=1):
+        """Add one event to the current batch (event loop thread)."""
+        if self.fd is None:
+            return
+        rid = self._route_ids.get(route)
+        if rid is None:
+            rid = self._route_ids[route] = route_id(route)
+        t_ns = self.clock()
+        if t_ns < self.last_time_ns:
+            self.clock_steps += 1
+            logger.warning(f"Wall clock stepped back {(self.last_time_ns - t_ns) / 1e9:.3f}s, starting a new event log segment")
+            self.flush(rotate=False)
+            self._rotate()
+        self.last_time_ns = t_ns
+        RECORD_FORMAT.pack_into(
+            self._buffer, self._pending * RECORD_FORMAT.size,
+            t_ns, min(max(latency_ns // 1000, 0), 0xFFFFFFFF), rid, min(count, 0xFFFFFFFF),
+            channel or 0, EVENT_CODES.get(event, 0), lane
+        )
+        self._pending += 1
+        self.records += 1
+        if self._pending == self.batch_size:
+            self.flush()
+
+    def flush(self, rotate=True):
+        """Append the pending batch to the active segment, rotating it if due."""
+        if self._pending and self.fd is not None:
+            size = self._pending * RECORD_FORMAT.size
+            try:
+                os.write(self.fd, self._view[:size])
+                self.segment_bytes += size
+                self.batches += 1
+            except OSError as e:
+                self.write_errors += 1
+                logger.error(f"Event log write failed, {self._pending} events lost: {e}")
+            self._pending = 0
+        if rotate and self.fd is not None and (
+                self.segment_bytes >= self.segment_size or time.monotonic() - self.segment_opened >= self.segment_age):
+            self._rotate()
+
+    def _on_timer(self):
+        self.flush()
+        self.timer = self.loop.call_later(self.flush_interval, self._on_timer)
+
+    def _rotate(self):
+        os.close(self.fd)
+        self._open_segment()
+        self._compress_closed()
+
+    def _compress_closed(self):
+        if self._compressor and self._compressor.is_alive():
+            # Still busy with the previous rotation; the next one picks these segments up
+            return
+        # Segments from the active one on are still written to, however far the log rotates meanwhile
+        self._compressor = threading.Thread(target=self._compress_and_prune, args=(self.sequence - 1,),
+                                            name="event-log-compress", daemon=True)
+        self._compressor.start()
+
+    def _compress_and_prune(self, active):
+        import gzip
+        import shutil
+        closed = [path for path in list_segments(self.directory)
+                  if path.endswith(SEGMENT_SUFFIX) and segment_sequence(path) < active]
+        for path in closed:
+            try:
+                with open(path, "rb") as source, gzip.open(path + ".gz", "wb") as target:
+                    shutil.copyfileobj(source, target)
+                os.unlink(path)
+            except OSError as e:
+                logger.error(f"Failed to compress event log segment {path}: {e}")
+        segments = list_segments(self.directory)
+        for path in segments[:-self.keep_segments]:
+            if segment_sequence(path) < active:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def close(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        self.flush(rotate=False)
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        if self._compressor:
+            self._compressor.join(timeout=10)
+
+    def get_metrics(self):
+        return {
+            "records": self.records,
+            "batches": self.batches,
+            "segments": self.segments,
+            "write_errors": self.write_errors,
+            "clock_steps": self.clock_steps,
+            "segment": os.path.basename(self.path) if self.path else None,
+        }
@@ -1,23 +1,69 @@
 from os import path
 import configparser
-try:
-    from dotenv import load_dotenv
-    dotenv_available = True
-except ImportError:
-    dotenv_available = False
 from gpio_nats_logging import logger
 from utils import is_raspberry_pi
 
+CONFIG_SECTIONS = (
+    "General", "NATS", "GPIO", "Triggers", "Pulses", "Ingress", "Control", "Tracing", "EventLog", "Heartbeat",
+    "Cues",
+)
+
+# Every option the application reads. Settings keep one slot per option instead of an
+# instance dictionary; options not listed here are reported and ignored.
+KNOWN_OPTIONS = (
+    # General
+    "gpioEnabled", "natsEnabled", "debugMode", "clientId", "lowMemory", "memoryReport",
+    # GPIO
+    "gpioPin", "gpioEdgeDetection", "bouncingThreshold", "gpioAcquisitionProcess", "gpioEventRingSize",
+    "gpioSampling", "gpioSampleRate", "gpioSampleBlock", "gpioStableTime",
+    # NATS
+    "natsServer", "natsPort", "natsSubject", "natsMessage", "natsTimeout", "natsMaxRetries", "natsRetryDelay",
+    "natsDnsCacheTtl", "natsPendingSize", "natsFlusherQueueSize",
+    "natsTls", "natsTlsCaFile", "natsTlsCertFile", "natsTlsKeyFile", "natsTlsHostname", "natsTlsVerify",
+    "natsTlsHandshakeFirst", "natsTlsSessionResumption",
+    "natsCredentials", "natsNkeySeed", "natsToken", "natsUser", "natsPassword",
+    # Triggers
+    "triggerQueueSize", "triggerQueueLanes", "triggerQueueOverflow", "triggerMaxAge", "triggerPriorities",
+    # Pulses
+    "pulseLongPress", "pulseMultiPressWindow", "pulseHoldDelay", "pulseHoldInterval", "pulseDebounce",
+    "pulseShortMessage", "pulseLongMessage", "pulseDoubleMessage", "pulseTripleMessage", "pulseHoldMessage",
+    "pulseShortSubject", "pulseLongSubject", "pulseDoubleSubject", "pulseTripleSubject", "pulseHoldSubject",
+    # Ingress
+    "ingressUdpEnabled", "ingressUdpBind", "ingressUnixEnabled", "ingressUnixSocket", "ingressUnixToken",
+    "ingressAllow", "ingressBatchSize",
+    # Control
+    "controlEnabled", "controlSocket", "controlEventHistory",
+    # Tracing
+    "tracingSampleRate", "tracingExport", "tracingBatchSize", "tracingFlushInterval",
+    # EventLog
+    "eventLogEnabled", "eventLogDir", "eventLogSegmentSize", "eventLogSegmentAge", "eventLogKeepSegments",
+    "eventLogBatchSize", "eventLogFlushInterval",
+    # Heartbeat
+    "heartbeatEnabled", "heartbeatSubject", "heartbeatInterval", "heartbeatMinInterval", "heartbeatAggregate",
+    # Cues
+    "cueDefaultSequence", "cueShortSequence", "cueLongSequence", "cueDoubleSequence", "cueTripleSequence",
+    "cueHoldSequence", "cueRetrigger", "cueTimerTick", "cueTimerSlots",
+)
+
+# Defaults of the low-memory profile (lowMemory = True), for options not set explicitly.
+# They cap the buffers that otherwise grow to nats-py's and this application's defaults.
+LOW_MEMORY_DEFAULTS = {
+    "natsPendingSize": 65536,
+    "natsFlusherQueueSize": 16,
+    "controlEventHistory": 50,
+    "eventLogBatchSize": 64,
+    "gpioEventRingSize": 256,
+    "gpioSampleBlock": 250,
+}
+
 
 class GPIONATSSettings:
     """Configuration settings for dunebugger-starter."""
     
+    __slots__ = ("config_file", "ON_RASPBERRY_PI") + KNOWN_OPTIONS
+    
     def __init__(self):
-        if dotenv_available:
-            load_dotenv()
-        self.config = configparser.ConfigParser()
-        # Set optionxform to lambda x: x to preserve case
-        self.config.optionxform = lambda x: x
+        self._load_dotenv()
         
         # Configuration file path
         self.config_file = path.join(path.dirname(path.abspath(__file__)), "config/dunebugger-starter.conf")
@@ -29,31 +75,43 @@ class GPIONATSSettings:
         self.ON_RASPBERRY_PI = is_raspberry_pi()
         logger.info(f"Running on Raspberry Pi: {self.ON_RASPBERRY_PI}")
 
+    def _load_dotenv(self):
+        """Load a .env file if there is one; python-dotenv is only imported then."""
+        app_dir = path.dirname(path.abspath(__file__))
+        for candidate in (".env", path.join(app_dir, ".env"), path.join(app_dir, "..", ".env")):
+            if path.isfile(candidate):
+                try:
+                    from dotenv import load_dotenv
+                except ImportError:
+                    return
+                load_dotenv(candidate)
+                return
+
     def load_configuration(self):
         """Load configuration from config file."""
+        config = configparser.ConfigParser()
+        # Set optionxform to lambda x: x to preserve case
+        config.optionxform = lambda x: x
         try:
-            self.config.read(self.config_file)
-            
-            # Load General settings
-            if self.config.has_section("General"):
-                for option in self.config.options("General"):
-                    value = self.config.get("General", option)
-                    setattr(self, option, self.validate_option(option, value))
-                    logger.debug(f"Setting {option}: {value}")
+            config.read(self.config_file)
             
-            # Load NATS settings
-            if self.config.has_section("NATS"):
-                for option in self.config.options("NATS"):
-                    value = self.config.get("NATS", option)
-                    setattr(self, option, self.validate_option(option, value))
-                    logger.debug(f"Setting {option}: {value}")
+            # Load settings from every known section
+            for section in CONFIG_SECTIONS:
+                if config.has_section(section):
+                    for option in config.options(section):
+                        value = config.get(section, option)
+                        try:
+                            setattr(self, option, self.validate_option(option, value))
+                        except AttributeError:
+                            logger.warning(f"Unknown option '{option}' in [{section}] ignored")
+                            continue
+                        logger.debug(f"Setting {option}: {value}")
             
-            # Load GPIO settings
-            if self.config.has_section("GPIO"):
-                for option in self.config.options("GPIO"):
-                    value = self.config.get("GPIO", option)
-                    setattr(self, option, self.validate_option(option, value))
-                    logger.debug(f"Setting {option}: {value}")
+            if getattr(self, 'lowMemory', False):
+                for option, value in LOW_MEMORY_DEFAULTS.items():
+                    if not hasattr(self, option):
+                        setattr(self, option, value)
+                logger.info("Low-memory profile enabled")
                     
             logger.info("Configuration loaded successfully")
         except configparser.Error as e:
@@ -64,12 +122,20 @@ class GPIONATSSettings:
     def validate_option(self, option, value):
         """Validate and convert configuration options."""
         # Boolean options
-        boolean_options = ['gpioEnabled', 'natsEnabled', 'debugMode']
+        boolean_options = ['gpioEnabled', 'natsEnabled', 'debugMode', 'ingressUdpEnabled', 'ingressUnixEnabled',
+                           'gpioAcquisitionProcess', 'gpioSampling', 'controlEnabled',
+                           'eventLogEnabled', 'natsTls', 'natsTlsVerify', 'natsTlsHandshakeFirst',
+                           'natsTlsSessionResumption', 'lowMemory', 'memoryReport', 'heartbeatEnabled',
+                           'heartbeatAggregate']
         if option in boolean_options:
             return value.lower() in ['true', '1', 'yes', 'on']
         
         # Integer options
-        integer_options = ['gpioPin', 'natsPort', 'natsTimeout', 'natsMaxRetries', 'natsRetryDelay']
+        integer_options = ['gpioPin', 'natsPort', 'natsTimeout', 'natsMaxRetries', 'natsRetryDelay',
+                           'triggerQueueSize', 'triggerQueueLanes', 'ingressBatchSize', 'gpioEventRingSize',
+                           'gpioSampleRate', 'gpioSampleBlock', 'controlEventHistory',
+                           'tracingBatchSize', 'eventLogSegmentSize', 'eventLogSegmentAge', 'eventLogKeepSegments',
+                           'eventLogBatchSize', 'natsPendingSize', 'natsFlusherQueueSize', 'cueTimerSlots']
         if option in integer_options:
             try:
                 return int(value)
@@ -78,7 +144,10 @@ class GPIONATSSettings:
                 return 0
         
         # Float options
-        float_options = ['bouncingThreshold']
+        float_options = ['bouncingThreshold', 'triggerMaxAge', 'pulseLongPress', 'pulseMultiPressWindow',
+                         'pulseHoldDelay', 'pulseHoldInterval', 'pulseDebounce', 'gpioStableTime',
+                         'tracingSampleRate', 'tracingFlushInterval', 'eventLogFlushInterval', 'natsDnsCacheTtl',
+                         'heartbeatInterval', 'heartbeatMinInterval', 'cueTimerTick']
         if option in float_options:
             try:
                 return float(value)
@@ -0,0 +1,226 @@
+import threading
+import time
+from gpio_nats_logging import logger
+try:
+    import numpy as np
+    numpy_available = True
+except ImportError:
+    numpy_available = False
+
+# Sleep between samples only when the next one is further away than this; closer
+# deadlines are met by spinning, sleep() granularity being far too coarse at kHz rates
+SPIN_THRESHOLD_NS = 300_000
+
+
+class GPIOSampler:
+    """Polls one GPIO input at a fixed rate and detects transitions block by block.
+
+    Levels and timestamps go into preallocated buffers of ``block_size`` samples. When a
+    block is full it is analysed as a whole (with NumPy when available, bytearray.find
+    otherwise), so per-sample work stays in C:
+
+    - edges: every level change between consecutive samples
+    - glitches: runs shorter than ``stable_time`` (spikes, contact bounce)
+    - stable transitions: a new level held for at least ``stable_time``
+
+    ``transition_callback(channel, level, t_ns)`` is called from the sampling thread for
+    each stable transition, timestamped at the first edge after the previous stable level
+    (the start of any contact bounce rather than its end).
+    Runs carry over block boundaries, so a transition is reported as soon as the block
+    in which it became stable is analysed.
+    """
+
+    def __init__(self, read_level, channel, transition_callback, rate_hz=10000, block_size=1000,
+                 stable_time=0.005, report_interval=60.0):
+        self.read_level = read_level
+        self.channel = channel
+        self.transition_callback = transition_callback
+        self.rate_hz = max(1, rate_hz)
+        self.period_ns = int(1e9 / self.rate_hz)
+        self.block_size = max(2, block_size)
+        self.stable_samples = max(1, round(stable_time * self.rate_hz))
+        self.report_interval = report_interval
+        self.thread = None
+        self._stop = threading.Event()
+
+        # Preallocated sample buffers, reused for every block
+        self.levels = bytearray(self.block_size)
+        self.times = [0] * self.block_size
+        if numpy_available:
+            self._levels_np = np.frombuffer(self.levels, dtype=np.uint8)
+
+        # Detection state carried across blocks
+        self.stable_level = None
+        self.run_level = 0
+        self.run_start = 0
+        self.unstable_ns = 0
+        self.sample_base = 0
+
+        # Counters
+        self.samples = 0
+        self.blocks = 0
+        self.late_samples = 0
+        self.edges = 0
+        self.glitches = 0
+        self.transitions = 0
+        self.detect_ns = 0
+        self.cpu_percent = 0.0
+        self.achieved_rate = 0.0
+
+    def start(self):
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, name="gpio-sampler", daemon=True)
+        self.thread.start()
+        backend = "numpy" if numpy_available else "bytearray"
+        logger.info(f"GPIO pin {self.channel} sampled at {self.rate_hz} Hz in blocks of {self.block_size} "
+                    f"({backend} detection, stable after {self.stable_samples} samples)")
+
+    def stop(self):
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def _run(self):
+        clock = time.monotonic_ns
+        read = self.read_level
+        channel = self.channel
+        levels = self.levels
+        times = self.times
+        period = self.period_ns
+        block_size = self.block_size
+
+        report_wall = clock()
+        report_cpu = time.thread_time_ns()
+        report_samples = 0
+        deadline = clock()
+        while not self._stop.is_set():
+            for i in range(block_size):
+                deadline += period
+                now = clock()
+                if now - deadline > period:
+                    # Fell behind (preempted): resynchronize instead of bursting to catch up
+                    self.late_samples += 1
+                    deadline = now
+                while now < deadline:
+                    if deadline - now > SPIN_THRESHOLD_NS:
+                        time.sleep((deadline - now - SPIN_THRESHOLD_NS) / 1e9)
+                    else:
+                        # Yield the GIL while spinning
+                        time.sleep(0)
+                    now = clock()
+                levels[i] = 1 if read(channel) else 0
+                times[i] = now
+
+            start = time.perf_counter_ns()
+            self._detect(block_size)
+            self.detect_ns += time.perf_counter_ns() - start
+            self.samples += block_size
+            self.blocks += 1
+
+            now = clock()
+            if now - report_wall >= self.report_interval * 1e9:
+                cpu = time.thread_time_ns()
+                self.cpu_percent = 100.0 * (cpu - report_cpu) / (now - report_wall)
+                self.achieved_rate = (self.samples - report_samples) * 1e9 / (now - report_wall)
+                self._log_metrics()
+                report_wall, report_cpu, report_samples = now, cpu, self.samples
+
+    def _detect(self, n):
+        """Find edges, glitches and stable transitions in the first n buffered samples."""
+        if self.stable_level is None:
+            # First block: start from the initial level without reporting it
+            self.stable_level = self.run_level = self.levels[0]
+            self.unstable_ns = self.times[0]
+
+        if numpy_available:
+            self._detect_numpy(n)
+        else:
+            self._detect_bytes(n)
+        self.sample_base += n
+
+        # The open run may already be long enough to count as the new stable level
+        if self.run_level != self.stable_level and self.sample_base - self.run_start >= self.stable_samples:
+            self._transition(self.run_level, self.unstable_ns)
+
+    def _detect_numpy(self, n):
+        levels = self._levels_np[:n]
+        changes = np.flatnonzero(levels[1:] != levels[:-1]) + 1
+        if levels[0] != self.run_level:
+            changes = np.concatenate(([0], changes))
+        if not len(changes):
+            return
+        self.edges += len(changes)
+
+        # Runs completed in this block: the carried run, then one per change but the last.
+        # Run k ends where run k + 1 starts, at changes[k].
+        starts = np.concatenate(([self.run_start], changes + self.sample_base))
+        lengths = np.diff(starts)
+        stable = lengths >= self.stable_samples
+        stable_runs = np.flatnonzero(stable)
+        self.glitches += len(lengths) - len(stable_runs)
+
+        if len(stable_runs):
+            # Binary levels alternate from run to run
+            run_levels = (stable_runs & 1) ^ self.run_level
+            sequence = np.concatenate(([self.stable_level], run_levels))
+            for j in np.flatnonzero(np.diff(sequence)):
+                # A transition dates from the end of the previous stable run, so contact
+                # bounce before the new level settles does not delay its timestamp
+                t_ns = self.unstable_ns if j == 0 else self.times[changes[stable_runs[j - 1]]]
+                self._transition(int(run_levels[j]), t_ns)
+            self.stable_level = int(run_levels[-1])
+            self.unstable_ns = self.times[changes[stable_runs[-1]]]
+
+        last = int(changes[-1])
+        self.run_level = self.levels[last]
+        self.run_start = self.sample_base + last
+
+    def _detect_bytes(self, n):
+        levels = self.levels
+        level = self.run_level
+        position = 0
+        while True:
+            position = levels.find(level ^ 1, position, n)
+            if position < 0:
+                break
+            self.edges += 1
+            # The run at `level` ends here
+            if self.sample_base + position - self.run_start < self.stable_samples:
+                self.glitches += 1
+            else:
+                if level != self.stable_level:
+                    self._transition(level, self.unstable_ns)
+                self.unstable_ns = self.times[position]
+            level ^= 1
+            self.run_level = level
+            self.run_start = self.sample_base + position
+
+    def _transition(self, level, t_ns):
+        self.stable_level = level
+        self.transitions += 1
+        try:
+            self.transition_callback(self.channel, level, t_ns)
+        except Exception as e:
+            logger.error(f"Error in GPIO sampler callback: {e}")
+
+    def get_metrics(self):
+        return {
+            "samples": self.samples,
+            "blocks": self.blocks,
+            "late_samples": self.late_samples,
+            "edges": self.edges,
+            "glitches": self.glitches,
+            "transitions": self.transitions,
+            "detect_us_per_block": round(self.detect_ns / self.blocks / 1e3, 1) if self.blocks else 0.0,
+            "cpu_percent": round(self.cpu_percent, 1),
+            "achieved_rate": round(self.achieved_rate),
+        }
+
+    def _log_metrics(self):
+        m = self.get_metrics()
+        logger.info(
+            f"GPIO sampler: {m['achieved_rate']} Hz, CPU {m['cpu_percent']}%, "
+            f"detect {m['detect_us_per_block']} us/block, late {m['late_samples']}, "
+            f"edges {m['edges']}, glitches {m['glitches']}, transitions {m['transitions']}"
+        )
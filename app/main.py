@@ -6,21 +6,67 @@ Based on the dunebugger architecture pattern.
 """
 
 import asyncio
+import os
 import signal
 import sys
+import time
+from collections import deque
 from gpio_nats_logging import logger
 from gpio_nats_settings import settings
 from simple_gpio_handler import SimpleGPIOHandler
-from simple_nats_client import SimpleNATSClient
+from simple_nats_client import SimpleNATSClient, encode_payload
+from network_diagnostics import dns_cache
+from nats_security import security_options
+from memory_report import log_memory_report, memory_report
+from pulse_recognizer import PulseRecognizer, PULSE_CLASSES, SHORT, DOUBLE, TRIPLE
+from trigger_queue import TriggerQueue, QUEUED, REPLACED, COALESCED
+from trigger_routes import Route, parse_priorities
+import tracing
+from tracing import tracer
+
+# Optional components (acquisition process, ingress, event log, control socket, span
+# export, heartbeats, cue sequences) are imported where they are started, so disabled features cost no memory
 
 
 class GPIONATSSender:
     """Main application class for dunebugger-starter."""
     
+    __slots__ = (
+        "running", "gpio_handler", "acquisition", "nats_client", "loop", "trigger_queue", "trigger_worker",
+        "ingress", "started_at", "paused", "published", "publish_failures", "expired", "events", "control",
+        "event_log", "nats_server", "nats_subject", "nats_message", "client_id", "edge_mode", "pulse_mode",
+        "pulse_recognizers", "pulse_timers", "pulse_routes", "default_route", "queue_size", "queue_lanes",
+        "queue_overflow", "trigger_max_age", "pin_lanes", "subject_lanes", "last_metrics_report",
+        "last_trigger_at", "heartbeat", "fleet", "cues", "publish_ready",
+    )
+    
     def __init__(self):
         self.running = False
         self.gpio_handler = None
+        self.acquisition = None
         self.nats_client = None
+        self.loop = None
+        self.trigger_queue = None
+        self.trigger_worker = None
+        self.default_route = None
+        self.last_metrics_report = 0
+        self.started_at = time.monotonic()
+        
+        # Publishing state and counters, exposed through the control socket
+        self.paused = False
+        # Set while the trigger worker may publish: not paused, and NATS connected (or disabled)
+        self.publish_ready = None
+        self.published = 0
+        self.publish_failures = 0
+        self.expired = 0
+        self.last_trigger_at = None
+        self.events = deque(maxlen=getattr(settings, 'controlEventHistory', 200))
+        self.control = None
+        self.event_log = None
+        
+        # Fleet heartbeat publisher and, in aggregator mode, the fleet view
+        self.heartbeat = None
+        self.fleet = None
         
         # Configuration from settings
         self.nats_server = getattr(settings, 'natsServer', 'nats://localhost:4222')
@@ -28,43 +74,605 @@ class GPIONATSSender:
         self.nats_message = getattr(settings, 'natsMessage', 'c')
         self.client_id = getattr(settings, 'clientId', 'dunebugger-starter')
         
+        # Trigger queue configuration
+        self.queue_size = getattr(settings, 'triggerQueueSize', 64)
+        self.queue_lanes = getattr(settings, 'triggerQueueLanes', 2)
+        self.queue_overflow = getattr(settings, 'triggerQueueOverflow', 'drop_oldest')
+        self.trigger_max_age = getattr(settings, 'triggerMaxAge', 5.0)
+        self.pin_lanes, self.subject_lanes = parse_priorities(getattr(settings, 'triggerPriorities', ''))
+        
+        # Pulse pattern recognition (both-edges mode)
+        self.edge_mode = str(getattr(settings, 'gpioEdgeDetection', 'RISING')).upper()
+        self.pulse_routes = {}
+        self.pulse_recognizers = {}
+        self.pulse_timers = {}
+        self.pulse_mode = (self.edge_mode == 'BOTH')
+        
+        # Network trigger ingress
+        self.ingress = None
+        
+        # Timed cue sequences per route
+        self.cues = None
+        
         logger.info(f"Configured to send '{self.nats_message}' to '{self.nats_subject}' on '{self.nats_server}'")
     
-    async def gpio_trigger_callback(self, channel):
-        """Callback function called when GPIO is triggered."""
+    def _on_gpio_edge(self, channel, captured_ns):
+        """GPIO edge handler; runs in the GPIO library's thread and only hands the edge to the loop."""
+        if self.pulse_mode:
+            level = self.gpio_handler.read_level(channel)
+            self.loop.call_soon_threadsafe(self._on_pulse_edge, channel, level, captured_ns)
+        else:
+            self.loop.call_soon_threadsafe(self.submit_trigger, channel, None, captured_ns)
+    
+    def _on_sampled_edge(self, channel, level, captured_ns):
+        """Stable transition from the polled sampler; runs in the sampling thread."""
+        self.loop.call_soon_threadsafe(self._on_acquired_edge, captured_ns, channel, level)
+    
+    def _on_acquired_edge(self, captured_ns, channel, level):
+        """Edge read from the acquisition process ring; already on the loop thread."""
+        if self.pulse_mode:
+            self._on_pulse_edge(channel, level, captured_ns)
+        else:
+            self.submit_trigger(channel, None, captured_ns)
+    
+    def _build_pulse_routes(self):
+        """Precompute the route (subject and payload) of every configured pulse class."""
+        routes = {}
+        for pulse in PULSE_CLASSES:
+            name = pulse.capitalize()
+            message = getattr(settings, f'pulse{name}Message', '')
+            if not message:
+                if pulse != SHORT and not getattr(settings, f'cue{name}Sequence', ''):
+                    continue
+                # A plain short press keeps sending the configured natsMessage
+                message = self.nats_message
+            subject = getattr(settings, f'pulse{name}Subject', '') or self.nats_subject
+            lane = self.subject_lanes.get(subject, self.queue_lanes - 1)
+            routes[pulse] = Route(pulse, subject, message, lane, encode_payload(message, self.client_id))
+            logger.debug(f"Pulse '{pulse}' sends '{message}' to '{subject}'")
+        return routes
+    
+    def _new_pulse_recognizer(self):
+        if TRIPLE in self.pulse_routes:
+            max_presses = 3
+        elif DOUBLE in self.pulse_routes:
+            max_presses = 2
+        else:
+            max_presses = 1
+        return PulseRecognizer(
+            long_press_ns=int(getattr(settings, 'pulseLongPress', 0.8) * 1e9),
+            multi_press_window_ns=int(getattr(settings, 'pulseMultiPressWindow', 0.4) * 1e9),
+            hold_delay_ns=int(getattr(settings, 'pulseHoldDelay', 1.5) * 1e9),
+            hold_interval_ns=int(getattr(settings, 'pulseHoldInterval', 0.5) * 1e9),
+            debounce_ns=int(getattr(settings, 'pulseDebounce', 0.02) * 1e9),
+            max_presses=max_presses
+        )
+    
+    def _on_pulse_edge(self, channel, level, captured_ns):
+        """Feed an edge to the pin's pulse recognizer (event loop thread)."""
+        recognizer = self.pulse_recognizers.get(channel)
+        if recognizer is None:
+            recognizer = self.pulse_recognizers[channel] = self._new_pulse_recognizer()
+        self._submit_pulse(channel, recognizer.on_edge(level, captured_ns), captured_ns)
+        self._schedule_pulse_timeout(channel, recognizer)
+    
+    def _on_pulse_timeout(self, channel):
+        recognizer = self.pulse_recognizers[channel]
+        now = time.monotonic_ns()
+        self._submit_pulse(channel, recognizer.on_timeout(now), now)
+        self._schedule_pulse_timeout(channel, recognizer)
+    
+    def _schedule_pulse_timeout(self, channel, recognizer):
+        """Keep exactly one timer per pin armed at the recognizer's next deadline."""
+        timer = self.pulse_timers.pop(channel, None)
+        if timer:
+            timer.cancel()
+        if recognizer.next_deadline is not None:
+            # loop.time() is time.monotonic(), the same clock as the edge timestamps
+            self.pulse_timers[channel] = self.loop.call_at(
+                recognizer.next_deadline / 1e9, self._on_pulse_timeout, channel
+            )
+    
+    def _on_network_trigger(self, channel, pulse, source):
+        """Route a trigger received by the network ingress exactly like a GPIO one."""
+        logger.info(f"Network trigger from {source} on channel {channel}{f' ({pulse})' if pulse else ''}")
+        captured_ns = time.monotonic_ns()
+        if pulse is None:
+            self.submit_trigger(channel, None, captured_ns)
+        else:
+            self._submit_pulse(channel, pulse, captured_ns)
+    
+    def _start_ingress(self):
+        """Open the UDP and Unix datagram trigger sockets if enabled."""
+        udp_bind = None
+        unix_path = None
+        if getattr(settings, 'ingressUdpEnabled', False):
+            udp_bind = getattr(settings, 'ingressUdpBind', '0.0.0.0:5005')
+        if getattr(settings, 'ingressUnixEnabled', False):
+            unix_path = getattr(settings, 'ingressUnixSocket', '/tmp/dunebugger-starter.trigger')
+        if not udp_bind and not unix_path:
+            return
+        
+        from trigger_ingress import TriggerIngress, parse_allowlist, parse_token
+        self.ingress = TriggerIngress(
+            self._on_network_trigger,
+            udp_bind=udp_bind,
+            unix_path=unix_path,
+            allowlist=parse_allowlist(getattr(settings, 'ingressAllow', '')),
+            unix_token=parse_token(getattr(settings, 'ingressUnixToken', '')),
+            batch_size=getattr(settings, 'ingressBatchSize', 32)
+        )
+        try:
+            self.ingress.start(self.loop)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to start trigger ingress: {e}")
+    
+    def _submit_pulse(self, channel, pulse, captured_ns):
+        if pulse is None:
+            return
+        route = self.pulse_routes.get(pulse)
+        if route is None:
+            logger.debug(f"Pulse '{pulse}' on channel {channel} has no route configured")
+            return
+        logger.info(f"Pulse '{pulse}' detected on channel {channel}")
+        self.submit_trigger(channel, route, captured_ns)
+    
+    def submit_trigger(self, channel, route=None, captured_ns=None):
+        """Queue a trigger for publishing, or start its route's cue sequence.
+        
+        Must be called from the event loop thread.
+        """
+        if route is None:
+            route = self.default_route
+        if captured_ns is None:
+            captured_ns = time.monotonic_ns()
+        if self.cues and route.name in self.cues.sequences:
+            token = None
+            if tracer.enabled and tracing.current_context() is None:
+                # The sequence keeps the context it starts in, so all its cues share one trace
+                span = tracer.start_span("trigger.submit", start_ns=captured_ns, activate=False,
+                                         channel=channel, route=route.name)
+                span.end()
+                token = tracing.attach(span.context)
+            try:
+                self.cues.trigger(route, channel, captured_ns)
+            finally:
+                if token is not None:
+                    tracing.detach(token)
+        else:
+            self._queue_trigger(route, channel, captured_ns)
+    
+    def _queue_trigger(self, route, channel, captured_ns):
+        lane = self.pin_lanes.get(channel, route.lane)
+        trace = None
+        if tracer.enabled:
+            # GPIO edges arrive with the context of their gpio.callback span (copied by
+            # call_soon_threadsafe); other sources start their trace here
+            trace = tracing.current_context()
+            if trace is None:
+                span = tracer.start_span("trigger.submit", start_ns=captured_ns, activate=False,
+                                         channel=channel, route=route.name)
+                span.end()
+                trace = span.context
+        result = self.trigger_queue.put(route, channel, captured_ns, lane, trace)
+        if result == COALESCED:
+            # Not lost: published with the queued trigger it was merged into
+            self._record_event("coalesced", channel, route.name, route.name, lane)
+            logger.debug(f"Trigger queue full on lane {lane}, coalesced trigger on channel {channel}")
+            return
+        if result == QUEUED:
+            self._record_event("queued", channel, route.name, route.name, lane)
+            return
+        if result == REPLACED:
+            self._record_event("queued", channel, route.name, route.name, lane)
+        self._record_event("overflow", channel, self.trigger_queue.overflow, route.name, lane)
+        logger.warning(f"Trigger queue full on lane {lane}, applied '{self.trigger_queue.overflow}' to channel {channel}")
+    
+    def _record_event(self, event, channel=None, detail='', route=None, lane=0, latency_ns=0, count=1):
+        """Keep a short history of trigger events for the control socket and log them."""
+        self.events.append((time.time(), event, channel, detail))
+        if self.event_log:
+            self.event_log.record(event, channel, route, lane, latency_ns, count)
+    
+    def _update_publish_ready(self):
+        """Hold the trigger worker while paused or NATS is disconnected, release it otherwise."""
+        if self.paused or (self.nats_client and not self.nats_client.get_connection_status()):
+            self.publish_ready.clear()
+        else:
+            self.publish_ready.set()
+
+    def _on_nats_state(self, event):
+        """Record a NATS connection change and hold or release the trigger worker."""
+        self._record_event(event)
+        self._update_publish_ready()
+
+    async def _trigger_worker(self):
+        """Publish queued triggers in priority order, holding them while paused or NATS is disconnected."""
+        while True:
+            await self.trigger_queue.wait()
+            # Leave triggers queued (subject to the overflow policy) until publishing is possible;
+            # checked again once a trigger is waiting, as pausing or a disconnect may have come since
+            if not self.publish_ready.is_set():
+                await self.publish_ready.wait()
+                continue
+            route, channel, captured_ns, count, lane, trace = self.trigger_queue.pop()
+            age_ns = time.monotonic_ns() - captured_ns
+            age = age_ns / 1e9
+            if self.trigger_max_age and age > self.trigger_max_age:
+                self.expired += 1
+                self._record_event("expired", channel, f"{age:.2f}s", route.name, lane, age_ns, count)
+                logger.warning(f"Discarding trigger on channel {channel} queued for {age:.2f}s")
+                continue
+            if count > 1:
+                logger.info(f"Coalesced {count} triggers on channel {channel}")
+
+            token = None
+            if trace is not None and tracer.enabled:
+                # Time from the edge to here: loop handoff, queueing and any hold
+                tracer.start_span("trigger.wait", parent=trace, start_ns=captured_ns, activate=False,
+                                  lane=lane, count=count).end()
+                token = tracing.attach(trace)
+            try:
+                success = await self.gpio_trigger_callback(channel, route)
+            finally:
+                if token is not None:
+                    tracing.detach(token)
+            latency_ns = time.monotonic_ns() - captured_ns
+            if success:
+                self.published += 1
+                self.last_trigger_at = time.time()
+                self._record_event("published", channel, f"{route.subject} {route.message}",
+                                   route.name, lane, latency_ns, count)
+            else:
+                self.publish_failures += 1
+                self._record_event("failed", channel, route.subject, route.name, lane, latency_ns, count)
+
+    def _report_queue_metrics(self):
+        """Log trigger queue metrics once a minute."""
+        now = time.monotonic()
+        if self.trigger_queue is None or now - self.last_metrics_report < 60:
+            return
+        self.last_metrics_report = now
+        metrics = self.trigger_queue.get_metrics()
+        logger.debug(f"Trigger queue metrics: {metrics}")
+        if metrics['dropped'] or metrics['coalesced']:
+            logger.info(
+                f"Trigger queue: depth {metrics['depth']}, dropped {metrics['dropped']}, "
+                f"coalesced {metrics['coalesced']}, max wait {metrics['max_wait_ms']:.1f}ms"
+            )
+    
+    def _gpio_mode(self):
+        if self.acquisition:
+            return "acquisition-process"
+        if self.gpio_handler:
+            return "sampling" if self.gpio_handler.sampler else "interrupt"
+        return "disabled"
+    
+    def _ctl_status(self, request):
+        return {
+            "pid": os.getpid(),
+            "uptime_s": round(time.monotonic() - self.started_at, 1),
+            "running": self.running,
+            "paused": self.paused,
+            "nats_connected": bool(self.nats_client and self.nats_client.get_connection_status()),
+            "gpio": self._gpio_mode(),
+            "edge_mode": self.edge_mode,
+            "queue_depth": len(self.trigger_queue) if self.trigger_queue is not None else 0,
+            "routes": [self.default_route.name] + sorted(self.pulse_routes) if self.default_route else [],
+        }
+    
+    def _ctl_counters(self, request):
+        counters = {
+            "published": self.published,
+            "publish_failures": self.publish_failures,
+            "expired": self.expired,
+        }
+        if self.trigger_queue is not None:
+            counters["queue"] = self.trigger_queue.get_metrics()
+        if self.ingress:
+            counters["ingress"] = self.ingress.get_metrics()
+        if self.gpio_handler and self.gpio_handler.sampler:
+            counters["sampler"] = self.gpio_handler.sampler.get_metrics()
+        if self.acquisition:
+            counters["acquisition"] = {"lost": self.acquisition.ring.lost}
+        if self.event_log:
+            counters["event_log"] = self.event_log.get_metrics()
+        if self.heartbeat:
+            counters["heartbeat"] = self.heartbeat.get_metrics()
+        if self.cues:
+            counters["cues"] = self.cues.get_metrics()
+        return counters
+    
+    def _ctl_connection(self, request):
+        if not self.nats_client:
+            return {"enabled": False}
+        nc = self.nats_client.nc
+        connected = self.nats_client.get_connection_status()
+        return {
+            "enabled": True,
+            "connected": connected,
+            "servers": self.nats_client.servers,
+            "client_id": self.client_id,
+            "connected_url": nc.connected_url.netloc if connected and nc.connected_url else None,
+            "last_attempt_s_ago": round(time.time() - self.nats_client.last_connection_attempt, 1)
+            if self.nats_client.last_connection_attempt else None,
+            "reconnecting": nc.is_reconnecting,
+            "dns_cache": {"hits": dns_cache.hits, "misses": dns_cache.misses, "shared": dns_cache.shared,
+                          "stale": dns_cache.stale},
+            "tls": self.nats_client.tls.get_metrics() if hasattr(self.nats_client.tls, "get_metrics")
+            else self.nats_client.tls is not None,
+        }
+    
+    def _ctl_events(self, request):
+        limit = int(request.get("limit", 20))
+        events = list(self.events)[-limit:] if limit > 0 else []
+        return [
+            {"time": timestamp, "event": event, "channel": channel, "detail": detail}
+            for timestamp, event, channel, detail in events
+        ]
+    
+    def _ctl_fire(self, request):
+        """Queue a test trigger as if the pin had fired, optionally on a pulse route."""
+        channel = int(request.get("pin", getattr(settings, 'gpioPin', 6)))
+        name = request.get("route") or "default"
+        route = self.default_route if name == "default" else self.pulse_routes.get(name)
+        if route is None:
+            raise ValueError(f"unknown route '{name}', expected one of: default, {', '.join(self.pulse_routes)}")
+        logger.info(f"Test trigger on channel {channel} via control socket ({name})")
+        self._record_event("test-fire", channel, name, route.name)
+        self.submit_trigger(channel, route)
+        return {"channel": channel, "route": name, "paused": self.paused}
+    
+    def _ctl_pause(self, request):
+        if not self.paused:
+            self.paused = True
+            self._update_publish_ready()
+            self._record_event("paused")
+            logger.warning("Publishing paused via control socket")
+        return {"paused": True}
+    
+    def _ctl_resume(self, request):
+        if self.paused:
+            self.paused = False
+            self._update_publish_ready()
+            self._record_event("resumed")
+            logger.info("Publishing resumed via control socket")
+        return {"paused": False}
+    
+    def _ctl_memory(self, request):
+        return memory_report()
+    
+    def _ctl_cues(self, request):
+        if self.cues is None:
+            raise ValueError("no cue sequences are configured ([Cues])")
+        cancel = request.get("cancel")
+        result = {}
+        if cancel:
+            result["cancelled"] = self.cues.cancel(None if cancel == "all" else cancel)
+            logger.info(f"Cancelled {result['cancelled']} cues via control socket ({cancel})")
+        result["running"] = self.cues.get_running()
+        return result
+    
+    def _ctl_fleet(self, request):
+        if self.fleet is None:
+            raise ValueError("fleet view is not enabled (heartbeatAggregate in [Heartbeat])")
+        limit = request.get("limit")
+        return self.fleet.query(request.get("client"), request.get("status"), int(limit) if limit else None)
+    
+    def _heartbeat_state(self):
+        """State carried by heartbeats, in heartbeat.STATE_FIELDS order."""
+        return (
+            self.published,
+            self.publish_failures,
+            self.expired,
+            len(self.trigger_queue) if self.trigger_queue is not None else 0,
+            self.last_trigger_at,
+            self.paused,
+        )
+    
+    async def _start_heartbeat(self):
+        """Publish heartbeats and, in aggregator mode, collect the fleet's, if enabled."""
+        publish = getattr(settings, 'heartbeatEnabled', False)
+        aggregate = getattr(settings, 'heartbeatAggregate', False)
+        if not (publish or aggregate):
+            return
+        if not self.nats_client:
+            logger.warning("Heartbeats need NATS, which is disabled")
+            return
+        from heartbeat import HeartbeatPublisher, FleetView
+        subject = getattr(settings, 'heartbeatSubject', '') or 'dunebugger.starter.heartbeat'
+        if publish:
+            armed = self.gpio_handler is not None or self.acquisition is not None
+            self.heartbeat = HeartbeatPublisher(
+                self.nats_client,
+                subject,
+                self.client_id,
+                [getattr(settings, 'gpioPin', 6)] if armed else [],
+                [self.default_route.name] + sorted(self.pulse_routes),
+                self._heartbeat_state,
+                interval=getattr(settings, 'heartbeatInterval', 30.0),
+                min_interval=getattr(settings, 'heartbeatMinInterval', 1.0)
+            )
+            self.heartbeat.start(self.loop)
+        if aggregate:
+            self.fleet = FleetView()
+            await self.nats_client.subscribe(f"{subject}.>", self.fleet.on_message)
+            logger.info(f"Collecting fleet heartbeats from '{subject}.>'")
+    
+    def _start_cues(self):
+        """Build the cue sequences configured for the routes and their timer wheel."""
+        routes = [self.default_route] + list(self.pulse_routes.values())
+        specs = {route: getattr(settings, f'cue{route.name.capitalize()}Sequence', '') for route in routes}
+        if not any(specs.values()):
+            return
+        from cue_scheduler import CueSequencer, TimerWheel, parse_cue_sequence
+        sequences = {}
+        for route, spec in specs.items():
+            cues = []
+            for index, (offset_ns, message, subject) in enumerate(parse_cue_sequence(spec), 1):
+                subject = subject or route.subject
+                lane = self.subject_lanes.get(subject, self.queue_lanes - 1)
+                cue = Route(f"{route.name}/{index}", subject, message, lane, encode_payload(message, self.client_id))
+                cues.append((offset_ns, cue))
+            if cues:
+                sequences[route.name] = cues
+                logger.info(f"Route '{route.name}' plays {len(cues)} cues over {cues[-1][0] / 1e9:g}s")
+        wheel = TimerWheel(getattr(settings, 'cueTimerTick', 0.01), getattr(settings, 'cueTimerSlots', 512))
+        wheel.start(self.loop)
+        self.cues = CueSequencer(
+            wheel,
+            # Cues are queued with their due time as capture time; latency and expiry count from it
+            self._queue_trigger,
+            sequences,
+            retrigger=getattr(settings, 'cueRetrigger', 'restart'),
+            on_cancel=self._on_cues_cancelled
+        )
+    
+    def _on_cues_cancelled(self, route, channel, pending):
+        self._record_event("cancelled", channel, f"{pending} cues", route.name, count=pending)
+    
+    def _start_event_log(self):
+        """Open the binary event log if enabled."""
+        if not getattr(settings, 'eventLogEnabled', False):
+            return
+        directory = getattr(settings, 'eventLogDir', '') or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), '../events'
+        )
+        from event_log import EventLog
+        self.event_log = EventLog(
+            os.path.normpath(directory),
+            segment_size=getattr(settings, 'eventLogSegmentSize', 1048576),
+            segment_age=getattr(settings, 'eventLogSegmentAge', 86400),
+            keep_segments=getattr(settings, 'eventLogKeepSegments', 30),
+            batch_size=getattr(settings, 'eventLogBatchSize', 256),
+            flush_interval=getattr(settings, 'eventLogFlushInterval', 2.0)
+        )
+        try:
+            self.event_log.start(self.loop)
+        except OSError as e:
+            logger.error(f"Failed to open event log in {directory}: {e}")
+            self.event_log = None
+    
+    async def _start_control(self):
+        """Serve the local control socket if enabled."""
+        if not getattr(settings, 'controlEnabled', False):
+            return
+        from control_socket import ControlServer
+        self.control = ControlServer(
+            getattr(settings, 'controlSocket', '/tmp/dunebugger-starter.ctl'),
+            {
+                "status": self._ctl_status,
+                "counters": self._ctl_counters,
+                "connection": self._ctl_connection,
+                "events": self._ctl_events,
+                "fire": self._ctl_fire,
+                "pause": self._ctl_pause,
+                "resume": self._ctl_resume,
+                "memory": self._ctl_memory,
+                "fleet": self._ctl_fleet,
+                "cues": self._ctl_cues,
+            }
+        )
+        try:
+            await self.control.start()
+        except OSError as e:
+            logger.error(f"Failed to start control socket: {e}")
+            self.control = None
+    
+    async def gpio_trigger_callback(self, channel, route=None):
+        """Publish the NATS message for a GPIO trigger on the given route (default: configured subject and message)."""
+        span = tracer.start_span("trigger.publish", channel=channel) if tracer.enabled else None
         logger.info(f"GPIO trigger detected on channel {channel}")
+        subject = route.subject if route else self.nats_subject
+        message = route.message if route else self.nats_message
+        payload = route.payload if route else None
         
         # Send NATS message
         if self.nats_client and self.nats_client.get_connection_status():
-            success = await self.nats_client.send_message(
-                self.nats_subject,
-                self.nats_message
-            )
+            success = await self.nats_client.send_message(subject, message, payload=payload)
             if success:
-                logger.info(f"Successfully sent NATS message: '{self.nats_message}' to '{self.nats_subject}'")
+                logger.info(f"Successfully sent NATS message: '{message}' to '{subject}'")
             else:
                 logger.error("Failed to send NATS message")
         else:
             logger.error("Cannot send message: NATS client not connected")
+            success = False
+        
+        if span:
+            span.end(route=route.name if route else "default", success=success)
+        return success
+    
+    def _configure_tracing(self):
+        """Enable span export if a sample rate is configured."""
+        sample_rate = getattr(settings, 'tracingSampleRate', 0.0)
+        if sample_rate <= 0:
+            return
+        target = getattr(settings, 'tracingExport', '') or '/tmp/dunebugger-starter-traces.jsonl'
+        from tracing import BatchSpanExporter
+        exporter = BatchSpanExporter(
+            target,
+            service_name=self.client_id,
+            batch_size=getattr(settings, 'tracingBatchSize', 64),
+            flush_interval=getattr(settings, 'tracingFlushInterval', 5.0)
+        )
+        tracer.configure(sample_rate, exporter)
+        logger.info(f"Tracing {sample_rate:.0%} of triggers, exporting spans to {target}")
     
     async def initialize(self):
         """Initialize the application components."""
         logger.info("Initializing Dunebugger Starter...")
         
         try:
+            # Trigger queue between the GPIO edge and the NATS publish
+            self.loop = asyncio.get_running_loop()
+            self.default_route = Route(
+                "default",
+                self.nats_subject,
+                self.nats_message,
+                self.subject_lanes.get(self.nats_subject, self.queue_lanes - 1),
+                encode_payload(self.nats_message, self.client_id)
+            )
+            self.pulse_routes = self._build_pulse_routes()
+            self._start_cues()
+            self.trigger_queue = TriggerQueue(self.queue_size, self.queue_lanes, self.queue_overflow)
+            self.publish_ready = asyncio.Event()
+            
+            gpio_enabled = getattr(settings, 'gpioEnabled', True)
+            if gpio_enabled and getattr(settings, 'gpioAcquisitionProcess', False):
+                # GPIO owned by a separate process, edges arrive through a shared-memory ring. It is
+                # forked before any socket, file or thread is opened, so it inherits none of them.
+                from acquisition_process import AcquisitionProcess
+                self.acquisition = AcquisitionProcess(
+                    self._on_acquired_edge,
+                    getattr(settings, 'gpioEventRingSize', 1024)
+                )
+                self.acquisition.start(self.loop)
+            
+            self._configure_tracing()
+            self._start_event_log()
+            self._start_ingress()
+            await self._start_control()
+            self.trigger_worker = asyncio.create_task(self._trigger_worker())
+            
             # Initialize NATS client if enabled
             if getattr(settings, 'natsEnabled', True):
                 # Get connection parameters from settings
                 timeout = getattr(settings, 'natsTimeout', 10)
                 max_retries = getattr(settings, 'natsMaxRetries', 3)
                 retry_delay = getattr(settings, 'natsRetryDelay', 5)
+                dns_cache.ttl = getattr(settings, 'natsDnsCacheTtl', 300.0)
                 
                 self.nats_client = SimpleNATSClient(
                     servers=self.nats_server,
                     client_id=self.client_id,
                     connection_timeout=timeout,
                     max_retries=max_retries,
-                    retry_delay=retry_delay
+                    retry_delay=retry_delay,
+                    pending_size=getattr(settings, 'natsPendingSize', 0) or None,
+                    flusher_queue_size=getattr(settings, 'natsFlusherQueueSize', 0) or None,
+                    # Connection changes are recorded as "disconnected" / "reconnected" events
+                    state_callback=self._on_nats_state,
+                    **security_options(settings)
                 )
                 
                 # Try to connect, but don't fail initialization if NATS is unavailable
@@ -72,16 +680,23 @@ class GPIONATSSender:
                     logger.warning("Initial NATS connection failed, but application will continue. Will retry in main loop.")
             else:
                 logger.warning("NATS is disabled in configuration")
+            self._update_publish_ready()
             
             # Initialize GPIO handler if enabled
-            if getattr(settings, 'gpioEnabled', True):
-                self.gpio_handler = SimpleGPIOHandler(
-                    callback_function=self.gpio_trigger_callback
-                )
+            if gpio_enabled:
+                if not self.acquisition:
+                    self.gpio_handler = SimpleGPIOHandler(
+                        callback_function=self._on_gpio_edge,
+                        sample_callback=self._on_sampled_edge
+                    )
             else:
                 logger.warning("GPIO is disabled in configuration")
             
+            await self._start_heartbeat()
+            
             logger.info("Initialization completed successfully")
+            if getattr(settings, 'memoryReport', False):
+                log_memory_report()
             return True
             
         except Exception as e:
@@ -93,14 +708,54 @@ class GPIONATSSender:
         logger.info("Cleaning up resources...")
         
         try:
+            # Stop answering control requests
+            if self.control:
+                await self.control.close()
+            
             # Cleanup GPIO
             if self.gpio_handler:
                 self.gpio_handler.cleanup()
+            if self.acquisition:
+                self.acquisition.stop()
+            
+            # Stop accepting network triggers
+            if self.ingress:
+                self.ingress.close()
+            
+            # Drop cues that are not due yet
+            if self.cues:
+                self.cues.cancel()
+                self.cues.wheel.close()
+            
+            # Stop pending pulse classification timers
+            for timer in self.pulse_timers.values():
+                timer.cancel()
+            self.pulse_timers.clear()
+            
+            # Stop publishing queued triggers
+            if self.trigger_worker:
+                self.trigger_worker.cancel()
+                try:
+                    await self.trigger_worker
+                except asyncio.CancelledError:
+                    pass
+            
+            # Announce that this starter goes offline
+            if self.heartbeat:
+                await self.heartbeat.stop()
             
             # Disconnect NATS
             if self.nats_client:
                 await self.nats_client.disconnect()
             
+            # Write out buffered events
+            if self.event_log:
+                self.event_log.close()
+            
+            # Export the remaining spans
+            if tracer.enabled:
+                tracer.shutdown()
+            
             logger.info("Cleanup completed")
         
         except Exception as e:
@@ -128,10 +783,13 @@ class GPIONATSSender:
         
         try:
             while self.running:
-                # Check NATS connection status and attempt reconnection if needed
+                # Check NATS connection status and attempt reconnection if needed; connect() skips
+                # attempts while nats-py reconnects by itself and throttles the others
                 if self.nats_client and not self.nats_client.get_connection_status():
-                    logger.warning("NATS connection lost, attempting to reconnect...")
                     await self.nats_client.connect()  # This now handles retries internally
+                    self._update_publish_ready()
+                
+                self._report_queue_metrics()
                 
                 # Sleep for a short time to prevent busy waiting
                 await asyncio.sleep(1)
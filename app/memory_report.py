@@ -0,0 +1,75 @@
+import os
+import sys
+from gpio_nats_logging import logger
+
+
+def process_memory():
+    """Resident set size and its peak in KiB, from /proc (zeros where it is not available)."""
+    memory = {"rss_kb": 0, "peak_rss_kb": 0}
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    memory["rss_kb"] = int(line.split()[1])
+                elif line.startswith("VmHWM:"):
+                    memory["peak_rss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return memory
+
+
+def _origin(filename):
+    """Group an allocation by where its code lives: an app module, a package or a stdlib module."""
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    if filename.startswith(app_dir):
+        return "app/" + os.path.basename(filename)
+    for marker in ("site-packages" + os.sep, "dist-packages" + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1].split(os.sep, 1)[0]
+    if filename.startswith("<frozen importlib"):
+        # Code objects and module dicts created while importing
+        return "(imports)"
+    if filename.startswith("<"):
+        return "(interpreter)"
+    name = os.path.basename(os.path.dirname(filename))
+    if name.startswith("python3"):
+        # A top-level stdlib module
+        return os.path.splitext(os.path.basename(filename))[0]
+    return name
+
+
+def memory_report(top=12):
+    """RSS, loaded modules and, when tracemalloc is tracing, Python allocations by origin.
+
+    Start the application with ``python -X tracemalloc`` (or PYTHONTRACEMALLOC=1) to get the
+    allocation breakdown from the very first import. Tracing costs memory of its own, so
+    it is off otherwise.
+    """
+    report = process_memory()
+    report["modules"] = len(sys.modules)
+    # The built-in _tracemalloc answers is_tracing() without importing tracemalloc and pickle
+    import _tracemalloc
+    if not _tracemalloc.is_tracing():
+        return report
+
+    import tracemalloc
+    traced, peak = tracemalloc.get_traced_memory()
+    report["python_kb"] = traced // 1024
+    report["python_peak_kb"] = peak // 1024
+    sizes = {}
+    for stat in tracemalloc.take_snapshot().statistics("filename"):
+        origin = _origin(stat.traceback[0].filename)
+        sizes[origin] = sizes.get(origin, 0) + stat.size
+    ranked = sorted(sizes.items(), key=lambda item: item[1], reverse=True)[:top]
+    report["top_kb"] = {origin: size // 1024 for origin, size in ranked}
+    return report
+
+
+def log_memory_report():
+    report = memory_report()
+    logger.info(f"Memory: RSS {report['rss_kb']} KiB (peak {report['peak_rss_kb']} KiB), "
+                f"{report['modules']} modules loaded")
+    if "python_kb" in report:
+        logger.info(f"Python allocations: {report['python_kb']} KiB (peak {report['python_peak_kb']} KiB)")
+        for origin, size in report["top_kb"].items():
+            logger.info(f"  {size:>6} KiB  {origin}")
@@ -0,0 +1,138 @@
+import os
+import ssl
+try:
+    import nkeys  # noqa: F401  (used by nats-py for NKEY and credentials authentication)
+    nkeys_available = True
+except ImportError:
+    nkeys_available = False
+from gpio_nats_logging import logger
+
+
+class _ResumptionSSLObject(ssl.SSLObject):
+    """SSLObject that reports its finished handshake to its ResumingSSLContext."""
+
+    def do_handshake(self):
+        super().do_handshake()
+        self.context._handshake_done(self)
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """Client SSLContext that resumes the previous TLS session on reconnect.
+
+    asyncio creates an SSLObject through ``wrap_bio`` for every handshake but offers
+    no way to pass a session. This context remembers the last connection per server
+    name and offers its session to the next handshake. That is an abbreviated
+    handshake without certificate exchange or verification, and the costly part
+    of a full one on small CPUs.
+
+    The previous connection is kept until the one after it has started. OpenSSL
+    marks the session of a connection that was dropped without a TLS shutdown
+    as not resumable when that connection is freed, and on an unstable network
+    that is how most connections end.
+    """
+
+    sslobject_class = _ResumptionSSLObject
+
+    def __init__(self, protocol=ssl.PROTOCOL_TLS_CLIENT):
+        # The protocol is taken by SSLContext.__new__; __init__ only sets up our state
+        super().__init__()
+        self._connections = {}
+        self.handshakes = 0
+        self.offered = 0
+        self.resumed = 0
+
+    def wrap_bio(self, incoming, outgoing, server_side=False, server_hostname=None, session=None):
+        if server_side:
+            return super().wrap_bio(incoming, outgoing, server_side, server_hostname, session)
+
+        previous = self._connections.get(server_hostname, (None, None))[0]
+        if previous is not None and session is None:
+            session = previous.session
+        try:
+            sslobj = super().wrap_bio(incoming, outgoing, server_side, server_hostname, session)
+        except ValueError:
+            # Session from a different context or protocol; fall back to a full handshake
+            sslobj = super().wrap_bio(incoming, outgoing, server_side, server_hostname)
+            session = None
+        self.handshakes += 1
+        if session is not None:
+            self.offered += 1
+        self._connections[server_hostname] = (sslobj, previous)
+        return sslobj
+
+    def _handshake_done(self, sslobj):
+        # Called once per connection, as soon as its handshake has finished
+        if not sslobj.server_side and sslobj.session_reused:
+            self.resumed += 1
+
+    def get_metrics(self):
+        return {"handshakes": self.handshakes, "offered": self.offered, "resumed": self.resumed}
+
+
+def create_tls_context(ca_file=None, cert_file=None, key_file=None, verify=True, resume=True):
+    """Build the client SSLContext once, at startup, for every connection and reconnect.
+
+    Loading CA bundles and keys is slow on a Pi Zero; reusing one context also keeps its
+    session state across reconnects.
+    """
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT) if resume else ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    if verify:
+        if ca_file:
+            context.load_verify_locations(cafile=ca_file)
+        else:
+            context.load_default_certs(ssl.Purpose.SERVER_AUTH)
+    else:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        logger.warning("NATS TLS certificate verification is disabled")
+    if cert_file:
+        # Client certificate for servers that require mutual TLS
+        context.load_cert_chain(cert_file, key_file or None)
+    return context
+
+
+def auth_options(user=None, password=None, token=None, nkey_seed=None, credentials=None):
+    """nats-py connect() keyword arguments for the configured credentials."""
+    options = {}
+    if credentials:
+        options["user_credentials"] = credentials
+    elif nkey_seed:
+        options["nkeys_seed"] = nkey_seed
+    elif token:
+        options["token"] = token
+    elif user:
+        options["user"] = user
+        options["password"] = password or ""
+    if (credentials or nkey_seed) and not nkeys_available:
+        logger.error("NKEY and credentials authentication need the 'nkeys' package (pip install nkeys)")
+    for path in (credentials, nkey_seed):
+        if path and not os.path.isfile(path):
+            logger.error(f"NATS credentials file not found: {path}")
+    return options
+
+
+def security_options(settings):
+    """TLS and authentication keyword arguments for SimpleNATSClient, from the [NATS] settings."""
+    servers = getattr(settings, 'natsServer', '')
+    tls = None
+    if getattr(settings, 'natsTls', False) or 'tls://' in servers:
+        tls = create_tls_context(
+            ca_file=getattr(settings, 'natsTlsCaFile', '') or None,
+            cert_file=getattr(settings, 'natsTlsCertFile', '') or None,
+            key_file=getattr(settings, 'natsTlsKeyFile', '') or None,
+            verify=getattr(settings, 'natsTlsVerify', True),
+            resume=getattr(settings, 'natsTlsSessionResumption', True)
+        )
+    return {
+        "tls": tls,
+        "tls_hostname": getattr(settings, 'natsTlsHostname', '') or None,
+        "tls_handshake_first": getattr(settings, 'natsTlsHandshakeFirst', False),
+        "auth": auth_options(
+            user=getattr(settings, 'natsUser', '') or None,
+            password=getattr(settings, 'natsPassword', '') or None,
+            token=getattr(settings, 'natsToken', '') or None,
+            nkey_seed=getattr(settings, 'natsNkeySeed', '') or None,
+            credentials=getattr(settings, 'natsCredentials', '') or None
+        ),
+    }
@@ -0,0 +1,314 @@
+import asyncio
+import ipaddress
+import json
+import socket
+import time
+from urllib.parse import urlsplit
+from gpio_nats_logging import logger
+from utils import percentile
+
+DEFAULT_NATS_PORT = 4222
+
+
+class NATSEndpoint:
+    """Scheme, host and port of a NATS server URL."""
+
+    __slots__ = ("url", "scheme", "host", "port", "userinfo")
+
+    def __init__(self, url, scheme, host, port, userinfo=""):
+        self.url = url
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.userinfo = userinfo
+
+    def with_address(self, address):
+        """This URL with the host replaced by a resolved IP address (bracketed for IPv6)."""
+        host = f"[{address}]" if ":" in address else address
+        userinfo = f"{self.userinfo}@" if self.userinfo else ""
+        return f"{self.scheme}://{userinfo}{host}:{self.port}"
+
+    def __repr__(self):
+        return f"NATSEndpoint({self.url!r})"
+
+
+def parse_nats_url(url, default_port=DEFAULT_NATS_PORT):
+    """Parse 'nats://host:port', 'host:port', 'host' or '[v6addr]:port' into a NATSEndpoint.
+
+    Raises ValueError for URLs without a host or with an invalid port.
+    """
+    url = url.strip()
+    # urlsplit only finds the host after '//'
+    parts = urlsplit(url if "://" in url else f"nats://{url}")
+    if not parts.hostname:
+        raise ValueError(f"no host in NATS URL '{url}'")
+    port = parts.port or default_port
+    userinfo = parts.netloc.rpartition("@")[0]
+    return NATSEndpoint(url, parts.scheme or "nats", parts.hostname, port, userinfo)
+
+
+def split_servers(servers):
+    """Server URLs from a list or a comma-separated string."""
+    if isinstance(servers, str):
+        servers = servers.split(",")
+    return [server.strip() for server in servers if server and server.strip()]
+
+
+def is_ip_address(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+class RTTStats:
+    """Min/avg/p99 of round-trip samples in milliseconds."""
+
+    def __init__(self, samples=None):
+        self.samples = list(samples or [])
+        self.errors = 0
+
+    def add(self, ms):
+        self.samples.append(ms)
+
+    @property
+    def count(self):
+        return len(self.samples)
+
+    def summary(self):
+        if not self.samples:
+            return {"count": 0, "errors": self.errors}
+        values = sorted(self.samples)
+        return {
+            "count": len(values),
+            "errors": self.errors,
+            "min_ms": round(values[0], 3),
+            "avg_ms": round(sum(values) / len(values), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+        }
+
+    def __str__(self):
+        if not self.samples:
+            return f"no samples ({self.errors} errors)"
+        s = self.summary()
+        errors = f", {self.errors} errors" if self.errors else ""
+        return f"min {s['min_ms']:.3f}ms  avg {s['avg_ms']:.3f}ms  p99 {s['p99_ms']:.3f}ms  (n={s['count']}{errors})"
+
+
+class DNSCache:
+    """Asynchronous getaddrinfo() with a time-to-live per host.
+
+    A failed lookup falls back to the last good answer, so a flaky resolver does not
+    turn into a NATS outage. IP literals are never cached. ``misses`` counts lookups
+    actually sent to the resolver; callers that wait on a lookup already in flight are
+    counted in ``shared``.
+    """
+
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self._entries = {}
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.stale = 0
+
+    async def resolve(self, host, port):
+        """Return a list of (family, sockaddr) for host:port, resolving at most once per TTL."""
+        if is_ip_address(host):
+            family = socket.AF_INET6 if ":" in host else socket.AF_INET
+            return [(family, (host, port))]
+
+        key = (host, port)
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        # Concurrent probes of the same host share one lookup
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = asyncio.ensure_future(self._lookup(host, port))
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+            self.misses += 1
+        else:
+            self.shared += 1
+        try:
+            addresses = await asyncio.shield(pending)
+        except OSError:
+            if entry:
+                self.stale += 1
+                logger.warning(f"DNS lookup for {host} failed, using cached addresses")
+                return entry[1]
+            raise
+        self._entries[key] = (time.monotonic() + self.ttl, addresses)
+        return addresses
+
+    async def _lookup(self, host, port):
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = []
+        for family, _, _, _, sockaddr in infos:
+            if (family, sockaddr) not in addresses:
+                addresses.append((family, sockaddr))
+        return addresses
+
+    def clear(self):
+        self._entries.clear()
+
+
+async def tcp_connect_time(address, timeout):
+    """Open and close a TCP connection to (family, sockaddr); return the connect time in ms."""
+    family, sockaddr = address
+    start = time.perf_counter()
+    _, writer = await asyncio.wait_for(
+        asyncio.open_connection(sockaddr[0], sockaddr[1], family=family), timeout=timeout
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return elapsed
+
+
+async def first_reachable(addresses, timeout):
+    """The first address accepting a TCP connection, or None."""
+    for address in addresses:
+        try:
+            await tcp_connect_time(address, timeout)
+            return address
+        except (OSError, asyncio.TimeoutError):
+            continue
+    return None
+
+
+async def nats_ping_rtt(address, samples, timeout, client_name="dunebugger-diagnostics"):
+    """Connect at the NATS protocol level and time PING/PONG round trips.
+
+    Returns (server INFO dict, RTTStats). Servers requiring TLS only report their INFO.
+    """
+    family, sockaddr = address
+    stats = RTTStats()
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(sockaddr[0], sockaddr[1], family=family), timeout=timeout
+    )
+    try:
+        line = await asyncio.wait_for(reader.readline(), timeout=timeout)
+        if not line.startswith(b"INFO "):
+            raise ConnectionError(f"unexpected greeting {line[:40]!r}")
+        info = json.loads(line[5:])
+        if info.get("tls_required"):
+            return info, stats
+
+        connect = {"verbose": False, "pedantic": False, "name": client_name, "lang": "python", "protocol": 1}
+        writer.write(f"CONNECT {json.dumps(connect)}\r\n".encode())
+        for _ in range(samples):
+            start = time.perf_counter()
+            writer.write(b"PING\r\n")
+            await writer.drain()
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=timeout)
+                if not line:
+                    raise ConnectionError("connection closed by server")
+                if line.startswith(b"-ERR"):
+                    raise ConnectionError(line.decode().strip())
+                if line.startswith(b"PONG"):
+                    break
+                if line.startswith(b"PING"):
+                    writer.write(b"PONG\r\n")
+            stats.add((time.perf_counter() - start) * 1000)
+        return info, stats
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+
+class ProbeResult:
+    """Outcome of probing one NATS server."""
+
+    def __init__(self, url):
+        self.url = url
+        self.endpoint = None
+        self.addresses = []
+        self.dns_ms = None
+        self.tcp = RTTStats()
+        self.nats = RTTStats()
+        self.server_info = None
+        self.error = None
+
+    @property
+    def reachable(self):
+        return self.tcp.count > 0
+
+    def as_dict(self):
+        return {
+            "url": self.url,
+            "host": self.endpoint.host if self.endpoint else None,
+            "port": self.endpoint.port if self.endpoint else None,
+            "addresses": [sockaddr[0] for _, sockaddr in self.addresses],
+            "dns_ms": None if self.dns_ms is None else round(self.dns_ms, 3),
+            "tcp": self.tcp.summary(),
+            "nats": self.nats.summary(),
+            "server": {key: self.server_info.get(key) for key in ("server_name", "version", "tls_required", "headers")}
+            if self.server_info else None,
+            "error": self.error,
+        }
+
+
+async def probe_server(url, dns_cache, samples=5, timeout=3.0, nats_ping=True):
+    """Resolve one server and sample its TCP connect time and NATS PING RTT."""
+    result = ProbeResult(url)
+    try:
+        result.endpoint = parse_nats_url(url)
+    except ValueError as e:
+        result.error = str(e)
+        return result
+
+    start = time.perf_counter()
+    try:
+        result.addresses = await asyncio.wait_for(
+            dns_cache.resolve(result.endpoint.host, result.endpoint.port), timeout=timeout
+        )
+        result.dns_ms = (time.perf_counter() - start) * 1000
+    except (OSError, asyncio.TimeoutError) as e:
+        result.error = f"DNS resolution failed: {e or 'timed out'}"
+        return result
+
+    address = None
+    for _ in range(samples):
+        for candidate in ([address] if address else result.addresses):
+            try:
+                result.tcp.add(await tcp_connect_time(candidate, timeout))
+                address = candidate
+                break
+            except (OSError, asyncio.TimeoutError) as e:
+                result.error = f"TCP connect failed: {e or 'timed out'}"
+        else:
+            result.tcp.errors += 1
+    if address is None:
+        return result
+    result.error = None
+
+    if nats_ping:
+        try:
+            result.server_info, result.nats = await nats_ping_rtt(address, samples, timeout)
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            result.nats.errors += 1
+            result.error = f"NATS PING failed: {e or 'timed out'}"
+    return result
+
+
+async def probe_servers(urls, dns_cache, samples=5, timeout=3.0, nats_ping=True):
+    """Probe every server concurrently; results are in the order of ``urls``."""
+    return await asyncio.gather(*(
+        probe_server(url, dns_cache, samples, timeout, nats_ping) for url in urls
+    ))
+
+
+# Process-wide cache shared by the NATS client and the diagnostics tools
+dns_cache = DNSCache()
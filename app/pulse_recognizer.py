@@ -0,0 +1,138 @@
+SHORT = "short"
+LONG = "long"
+DOUBLE = "double"
+TRIPLE = "triple"
+HOLD = "hold"
+
+PULSE_CLASSES = (SHORT, LONG, DOUBLE, TRIPLE, HOLD)
+
+# Pulse class emitted for a sequence of 1, 2 or 3 short presses
+MULTI_PRESS_CLASSES = (None, SHORT, DOUBLE, TRIPLE)
+
+
+class PulseRecognizer:
+    """Per-pin state machine classifying presses from edge timestamps.
+
+    Fed with every edge (level and monotonic timestamp in nanoseconds) and with
+    timeouts at ``next_deadline``; each call does a constant amount of work and
+    returns at most one pulse class:
+
+    - short/double/triple: 1-3 short presses, each released before ``long_press_ns``
+      and started within ``multi_press_window_ns`` of the previous release
+    - long: press held for ``long_press_ns`` (emitted while still held)
+    - hold: press held for ``hold_delay_ns``, then repeated every ``hold_interval_ns``
+
+    ``max_presses`` limits multi-press counting; with 1 a short press is emitted on
+    release without waiting for the multi-press window. A press that turns long while
+    earlier short presses are still pending first returns their class from
+    ``on_timeout`` and leaves the deadline in place, so the next call returns LONG.
+
+    An edge back to the previous level within ``debounce_ns`` of the last edge marks
+    that edge as a glitch: the state it changed (such as a press and its deadline) is
+    restored, unless it already produced a pulse.
+    """
+
+    __slots__ = (
+        "long_press_ns", "multi_press_window_ns", "hold_delay_ns", "hold_interval_ns",
+        "debounce_ns", "max_presses", "active_level",
+        "pressed", "press_start_ns", "last_edge_ns", "presses", "long_emitted", "next_deadline",
+        "glitch_state",
+    )
+
+    def __init__(self, long_press_ns, multi_press_window_ns, hold_delay_ns=0, hold_interval_ns=0,
+                 debounce_ns=0, max_presses=3, active_level=1):
+        self.long_press_ns = long_press_ns
+        self.multi_press_window_ns = multi_press_window_ns
+        self.hold_delay_ns = hold_delay_ns
+        self.hold_interval_ns = hold_interval_ns
+        self.debounce_ns = debounce_ns
+        self.max_presses = min(max(max_presses, 1), 3)
+        self.active_level = active_level
+        self.reset()
+
+    def reset(self):
+        self.pressed = False
+        self.press_start_ns = 0
+        self.last_edge_ns = None
+        self.presses = 0
+        self.long_emitted = False
+        self.next_deadline = None
+        self.glitch_state = None
+
+    def _save_state(self):
+        self.glitch_state = (self.pressed, self.press_start_ns, self.last_edge_ns, self.presses,
+                             self.long_emitted, self.next_deadline)
+
+    def on_edge(self, level, t_ns):
+        """Process one edge; returns a pulse class or None."""
+        pressed = (level == self.active_level)
+        if pressed == self.pressed:
+            # Repeated level (missed or duplicated edge): nothing changes
+            return None
+        if self.last_edge_ns is not None and t_ns - self.last_edge_ns < self.debounce_ns:
+            # Back to the earlier level inside the debounce time: undo the glitch edge
+            if self.glitch_state is not None:
+                (self.pressed, self.press_start_ns, self.last_edge_ns, self.presses,
+                 self.long_emitted, self.next_deadline) = self.glitch_state
+                self.glitch_state = None
+            return None
+        self._save_state()
+        self.last_edge_ns = t_ns
+        self.pressed = pressed
+
+        if pressed:
+            self.press_start_ns = t_ns
+            self.long_emitted = False
+            self.next_deadline = t_ns + self.long_press_ns
+            return None
+
+        # Release
+        if self.long_emitted:
+            # Long press or hold already reported while held
+            self.presses = 0
+            self.next_deadline = None
+            return None
+
+        self.presses += 1
+        if self.presses >= self.max_presses:
+            pulse = MULTI_PRESS_CLASSES[self.presses]
+            self.presses = 0
+            self.next_deadline = None
+            # A pulse cannot be taken back
+            self.glitch_state = None
+            return pulse
+        self.next_deadline = t_ns + self.multi_press_window_ns
+        return None
+
+    def on_timeout(self, t_ns):
+        """Process an expired deadline; returns a pulse class or None."""
+        if self.next_deadline is None or t_ns < self.next_deadline:
+            return None
+        self.glitch_state = None
+
+        if self.pressed:
+            if not self.long_emitted:
+                if self.presses:
+                    # Report the short presses before this one; LONG follows at the same deadline
+                    pulse = MULTI_PRESS_CLASSES[self.presses]
+                    self.presses = 0
+                    return pulse
+                self.long_emitted = True
+                self.presses = 0
+                if self.hold_delay_ns:
+                    self.next_deadline = self.press_start_ns + self.hold_delay_ns
+                else:
+                    self.next_deadline = None
+                return LONG
+            # Hold repeats are anchored to the press start so they do not drift
+            if self.hold_interval_ns:
+                self.next_deadline += self.hold_interval_ns
+            else:
+                self.next_deadline = None
+            return HOLD
+
+        # Multi-press window expired
+        pulse = MULTI_PRESS_CLASSES[self.presses] if self.presses else None
+        self.presses = 0
+        self.next_deadline = None
+        return pulse
@@ -1,6 +1,8 @@
 import asyncio
+import time
 from gpio_nats_logging import logger
 from gpio_nats_settings import settings
+from tracing import tracer
 
 if settings.ON_RASPBERRY_PI and settings.gpioEnabled:
     import RPi.GPIO as GPIO
@@ -15,6 +17,11 @@ else:
         FALLING = "FALLING"
         BOTH = "BOTH"
         
+        # Simulated pin state, driven by simulate_edge() or a waveform
+        levels = {}
+        callbacks = {}
+        waveforms = {}
+        
         @staticmethod
         def setmode(mode):
             logger.debug(f"Mock GPIO: Set mode to {mode}")
@@ -25,12 +32,40 @@ else:
         
         @staticmethod
         def add_event_detect(pin, edge, callback=None, bouncetime=None):
+            MockGPIO.callbacks[pin] = (edge, callback)
             logger.debug(f"Mock GPIO: Added event detect on pin {pin} for {edge} edge")
         
         @staticmethod
         def remove_event_detect(pin):
+            MockGPIO.callbacks.pop(pin, None)
             logger.debug(f"Mock GPIO: Removed event detect on pin {pin}")
         
+        @staticmethod
+        def input(pin):
+            waveform = MockGPIO.waveforms.get(pin)
+            if waveform is not None:
+                return waveform(time.monotonic_ns())
+            return MockGPIO.levels.get(pin, 0)
+        
+        @staticmethod
+        def set_waveform(pin, waveform):
+            """Drive a pin from waveform(t_ns) -> level for sampled input; None removes it."""
+            if waveform is None:
+                MockGPIO.waveforms.pop(pin, None)
+            else:
+                MockGPIO.waveforms[pin] = waveform
+        
+        @staticmethod
+        def simulate_edge(pin, level):
+            """Set a pin level and run its event callback if the edge matches the detection."""
+            previous = MockGPIO.levels.get(pin, 0)
+            MockGPIO.levels[pin] = level
+            edge, callback = MockGPIO.callbacks.get(pin, (None, None))
+            if callback is None or level == previous:
+                return
+            if edge == MockGPIO.BOTH or (edge == MockGPIO.RISING) == bool(level):
+                callback(pin)
+        
         @staticmethod
         def cleanup():
             logger.debug("Mock GPIO: Cleanup called")
@@ -41,12 +76,28 @@ else:
 class SimpleGPIOHandler:
     """Simple GPIO handler for detecting input changes."""
     
-    def __init__(self, callback_function=None):
+    __slots__ = ("gpio_pin", "edge_detection", "bounce_time", "callback_function", "sample_callback",
+                 "sampler", "sampling", "log_edges")
+    
+    def __init__(self, callback_function=None, sample_callback=None, log_edges=True):
         self.gpio_pin = getattr(settings, 'gpioPin', 6)  # Default to pin 6
 
-        self.edge_detection = 'RISING'
+        self.edge_detection = str(getattr(settings, 'gpioEdgeDetection', 'RISING')).upper()
+        if self.edge_detection not in ('RISING', 'FALLING', 'BOTH'):
+            logger.error(f"Invalid edge detection '{self.edge_detection}', using RISING")
+            self.edge_detection = 'RISING'
         self.bounce_time = int(getattr(settings, 'bouncingThreshold', 200) * 1000)  # Convert to milliseconds
+        # Synchronous callbacks receive (channel, captured_ns), with the timestamp taken first
+        # thing in the GPIO thread; coroutine callbacks receive (channel)
         self.callback_function = callback_function
+        # Per-edge INFO logs, written after the edge was handed to the callback
+        self.log_edges = log_edges
+        
+        # Polled sampling replaces edge interrupts when enabled; sample_callback receives
+        # (channel, level, t_ns) for every stable transition matching the edge detection
+        self.sample_callback = sample_callback
+        self.sampler = None
+        self.sampling = bool(getattr(settings, 'gpioSampling', False)) and sample_callback is not None
         
         # Initialize GPIO
         self._setup_gpio()
@@ -62,8 +113,21 @@ class SimpleGPIOHandler:
             # Setup pin
             GPIO.setup(self.gpio_pin, GPIO.IN, pull_up_down=pull)
             
+            if self.sampling:
+                from gpio_sampler import GPIOSampler
+                self.sampler = GPIOSampler(
+                    GPIO.input,
+                    self.gpio_pin,
+                    self._on_sampled_transition,
+                    rate_hz=getattr(settings, 'gpioSampleRate', 10000),
+                    block_size=getattr(settings, 'gpioSampleBlock', 1000),
+                    stable_time=getattr(settings, 'gpioStableTime', 0.005)
+                )
+                self.sampler.start()
+                return
+            
             # Configure edge detection
-            edge = GPIO.RISING
+            edge = getattr(GPIO, self.edge_detection)
             
             # Add event detection
             GPIO.add_event_detect(
@@ -74,7 +138,7 @@ class SimpleGPIOHandler:
                 #bouncetime=self.bounce_time
             )
             
-            logger.info(f"GPIO pin {self.gpio_pin} configured for RISING edge detection")
+            logger.info(f"GPIO pin {self.gpio_pin} configured for {self.edge_detection} edge detection")
             logger.info(f"Pull resistor: DOWN, Bounce time: {self.bounce_time}ms")
             
         except Exception as e:
@@ -82,10 +146,28 @@ class SimpleGPIOHandler:
     
     def _gpio_callback(self, channel):
         """GPIO interrupt callback."""
-        logger.info(f"GPIO event detected on pin {channel}")
-        
+        captured_ns = time.monotonic_ns()
+        # Root span of the trigger's trace; the callback hands its context to the loop
+        span = tracer.start_span("gpio.callback", start_ns=captured_ns, channel=channel) if tracer.enabled else None
+        try:
+            self._run_callback(channel, captured_ns)
+        finally:
+            if span:
+                span.end()
+    
+    def _run_callback(self, channel, captured_ns):
         if self.callback_function:
             try:
+                if not asyncio.iscoroutinefunction(self.callback_function):
+                    # Synchronous callbacks are called directly from the GPIO thread
+                    self.callback_function(channel, captured_ns)
+                    if self.log_edges:
+                        logger.info(f"GPIO event detected on pin {channel}")
+                    return
+                
+                if self.log_edges:
+                    logger.info(f"GPIO event detected on pin {channel}")
+                
                 # Create an event loop if one doesn't exist
                 loop = None
                 try:
@@ -97,20 +179,27 @@ class SimpleGPIOHandler:
                     asyncio.set_event_loop(loop)
                 
                 # Run the callback
-                if asyncio.iscoroutinefunction(self.callback_function):
-                    if loop.is_running():
-                        # If loop is already running, schedule the callback
-                        asyncio.create_task(self.callback_function(channel))
-                    else:
-                        # Run the callback in the event loop
-                        loop.run_until_complete(self.callback_function(channel))
+                if loop.is_running():
+                    # If loop is already running, schedule the callback
+                    asyncio.create_task(self.callback_function(channel))
                 else:
-                    # Call synchronous function
-                    self.callback_function(channel)
+                    # Run the callback in the event loop
+                    loop.run_until_complete(self.callback_function(channel))
                     
             except Exception as e:
                 logger.error(f"Error in GPIO callback: {e}")
     
+    def _on_sampled_transition(self, channel, level, t_ns):
+        """Stable transition from the sampler; keep only the configured edge direction."""
+        if self.edge_detection == 'BOTH' or bool(level) == (self.edge_detection == 'RISING'):
+            self.sample_callback(channel, level, t_ns)
+            if self.log_edges:
+                logger.info(f"GPIO level {level} sampled on pin {channel}")
+    
+    def read_level(self, channel=None):
+        """Read the current level (0 or 1) of a pin, by default the configured one."""
+        return GPIO.input(self.gpio_pin if channel is None else channel)
+    
     def set_callback(self, callback_function):
         """Set or change the callback function."""
         self.callback_function = callback_function
@@ -119,7 +208,10 @@ class SimpleGPIOHandler:
     def cleanup(self):
         """Cleanup GPIO resources."""
         try:
-            GPIO.remove_event_detect(self.gpio_pin)
+            if self.sampler:
+                self.sampler.stop()
+            else:
+                GPIO.remove_event_detect(self.gpio_pin)
             GPIO.cleanup()
             logger.info("GPIO cleanup completed")
         except Exception as e:
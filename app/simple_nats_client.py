@@ -1,17 +1,35 @@
 from nats.aio.client import Client as NATS
 import json
 import asyncio
-import socket
 import time
 from gpio_nats_logging import logger
+from network_diagnostics import dns_cache, first_reachable, is_ip_address, parse_nats_url, split_servers
+from tracing import tracer
+
+# First nats-server release that accepts message headers (HPUB)
+HEADERS_MIN_VERSION = (2, 2)
+
+
+def encode_payload(message_body, sender):
+    """Encode a message body as the JSON payload expected by the dunebugger core."""
+    return json.dumps({"body": message_body, "sender": sender}).encode()
 
 
 class SimpleNATSClient:
-    """Simplified NATS client for sending messages only."""
+    """Simplified NATS client for sending messages, plus the fleet heartbeat subscription."""
+    
+    __slots__ = (
+        "nc", "servers", "client_id", "is_connected", "connection_timeout", "max_retries", "retry_delay",
+        "last_connection_attempt", "tls", "tls_handshake_first", "tls_hostname", "auth", "pending_size",
+        "flusher_queue_size", "subscriptions", "subscribed_on", "state_callback", "connected_once",
+        "headers_supported",
+    )
     
-    def __init__(self, servers, client_id="dunebugger-starter", connection_timeout=10, max_retries=3, retry_delay=5):
+    def __init__(self, servers, client_id="dunebugger-starter", connection_timeout=10, max_retries=3, retry_delay=5,
+                 tls=None, tls_hostname=None, tls_handshake_first=False, auth=None,
+                 pending_size=None, flusher_queue_size=None, state_callback=None):
         self.nc = NATS()
-        self.servers = servers if isinstance(servers, list) else [servers]
+        self.servers = split_servers(servers)
         self.client_id = client_id
         self.is_connected = False
         self.connection_timeout = connection_timeout
@@ -19,54 +37,108 @@ class SimpleNATSClient:
         self.retry_delay = retry_delay
         self.last_connection_attempt = 0
         
-        # Set up connection callbacks
-        self.nc.on_connect = self._on_connect
-        self.nc.on_disconnect = self._on_disconnect
-        self.nc.on_reconnect = self._on_reconnect
-
-    async def _on_connect(self, nc):
-        """Called when connected to NATS."""
-        self.is_connected = True
-        logger.info(f"Connected to NATS server: {self.servers}")
-
-    async def _on_disconnect(self, nc):
-        """Called when disconnected from NATS."""
-        self.is_connected = False
-        logger.warning("Disconnected from NATS server")
+        # TLS context created once and reused, so reconnects can resume the TLS session
+        self.tls = tls
+        self.tls_handshake_first = tls_handshake_first
+        self.auth = auth or {}
+        self.tls_hostname = tls_hostname or self._common_hostname()
+        
+        # Caps on nats-py's buffers (bytes pending while disconnected, queued flushes); None keeps its defaults
+        self.pending_size = pending_size
+        self.flusher_queue_size = flusher_queue_size
+
+        # Subscriptions as (subject, callback), renewed when a fresh client replaces a closed one
+        self.subscriptions = []
+        self.subscribed_on = None
+
+        # Called with "disconnected" or "reconnected" when the connection state flips after
+        # the first connection, whether nats-py or connect() restored it
+        self.state_callback = state_callback
+        self.connected_once = False
+
+        # Whether the connected server accepts headers, checked on every (re)connection
+        self.headers_supported = False
+
+    def _set_connected(self, connected):
+        if connected == self.is_connected:
+            return
+        self.is_connected = connected
+        self.headers_supported = connected and self._server_supports_headers()
+        if self.state_callback and self.connected_once:
+            self.state_callback("reconnected" if connected else "disconnected")
+        self.connected_once = self.connected_once or connected
+
+    def _server_supports_headers(self):
+        """Whether the connected server is recent enough to accept messages with headers."""
+        try:
+            version = self.nc.connected_server_version
+            return (version.major, version.minor) >= HEADERS_MIN_VERSION
+        except ValueError:
+            # Version string that is not semver; publish without headers rather than risk
+            # the server closing the connection on an HPUB it does not understand
+            return False
+
+    async def _on_disconnect(self):
+        """Called by nats-py when the connection is lost or closed."""
+        if self.is_connected:
+            logger.warning("Disconnected from NATS server")
+        self._set_connected(False)
 
-    async def _on_reconnect(self, nc):
-        """Called when reconnected to NATS."""
-        self.is_connected = True
+    async def _on_reconnect(self):
+        """Called by nats-py after it reconnected on its own."""
         logger.info("Reconnected to NATS server")
+        self._set_connected(True)
     
-    def _can_connect_to_server(self, server_url):
-        """Check if we can establish a basic TCP connection to the NATS server."""
-        try:
-            # Parse NATS URL to get host and port
-            if '://' in server_url:
-                url_parts = server_url.split('://', 1)[1]
-            else:
-                url_parts = server_url
-            
-            if ':' in url_parts:
-                host, port_str = url_parts.rsplit(':', 1)
-                port = int(port_str)
+    def _common_hostname(self):
+        """The host name shared by all servers, used to verify certificates when connecting by address."""
+        hosts = set()
+        for server in self.servers:
+            try:
+                host = parse_nats_url(server).host
+            except ValueError:
+                continue
+            if not is_ip_address(host):
+                hosts.add(host)
+        return hosts.pop() if len(hosts) == 1 else None
+
+    def _uses_tls(self, endpoint):
+        return self.tls is not None or endpoint.scheme == "tls"
+
+    async def _reachable_servers(self):
+        """Probe all servers concurrently; return their URLs with the host replaced by a reachable address."""
+        async def probe(server):
+            try:
+                endpoint = parse_nats_url(server)
+                addresses = await asyncio.wait_for(dns_cache.resolve(endpoint.host, endpoint.port), timeout=3)
+                address = await first_reachable(addresses, timeout=3)
+            except (ValueError, OSError, asyncio.TimeoutError) as e:
+                logger.debug(f"Connection check failed for {server}: {e}")
+                return None
+            if address is None:
+                return None
+            if self._uses_tls(endpoint) and endpoint.host != self.tls_hostname and not is_ip_address(endpoint.host):
+                # The certificate is checked against one name only; keep the name in the URL
+                return server
+            # Connect by address so neither this attempt nor the client's own reconnects resolve DNS again
+            return endpoint.with_address(address[1][0])
+
+        resolved = await asyncio.gather(*(probe(server) for server in self.servers))
+        available_servers = []
+        for server, url in zip(self.servers, resolved):
+            if url:
+                available_servers.append(url)
+                logger.info(f"Server {server} is reachable")
             else:
-                host = url_parts
-                port = 4222  # Default NATS port
-            
-            # Test TCP connection with short timeout
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(3)  # 3 second timeout for connection check
-            result = sock.connect_ex((host, port))
-            sock.close()
-            return result == 0
-        except Exception as e:
-            logger.debug(f"Connection check failed for {server_url}: {e}")
-            return False
+                logger.warning(f"Server {server} is not reachable")
+        return available_servers
 
     async def connect(self):
         """Connect to NATS server with retry logic."""
+        # The client reconnects by itself after a lost connection; a second connect() would race it
+        if self.nc.is_reconnecting or self.nc.is_connecting:
+            logger.debug("NATS client is already reconnecting")
+            return False
+        
         # Check if we should throttle connection attempts
         current_time = time.time()
         if current_time - self.last_connection_attempt < self.retry_delay:
@@ -76,19 +148,23 @@ class SimpleNATSClient:
         self.last_connection_attempt = current_time
         
         # Check network connectivity first
-        available_servers = []
-        for server in self.servers:
-            if self._can_connect_to_server(server):
-                available_servers.append(server)
-                logger.info(f"Server {server} is reachable")
-            else:
-                logger.warning(f"Server {server} is not reachable")
+        available_servers = await self._reachable_servers()
         
         if not available_servers:
             logger.error("No NATS servers are reachable via TCP")
-            self.is_connected = False
+            self._set_connected(False)
             return False
         
+        if self.nc.is_closed:
+            # The client gave up reconnecting; start over with a fresh one
+            self.nc = NATS()
+        
+        buffer_options = {}
+        if self.pending_size:
+            buffer_options["pending_size"] = self.pending_size
+        if self.flusher_queue_size:
+            buffer_options["flusher_queue_size"] = self.flusher_queue_size
+        
         # Try to connect with retries
         for attempt in range(self.max_retries):
             try:
@@ -98,15 +174,24 @@ class SimpleNATSClient:
                     self.nc.connect(
                         servers=available_servers,
                         name=self.client_id,
-                        reconnect_time_wait=10,
+                        reconnect_time_wait=self.retry_delay,
                         max_reconnect_attempts=5,  # Limited attempts for initial connection
-                        connect_timeout=self.connection_timeout
+                        connect_timeout=self.connection_timeout,
+                        disconnected_cb=self._on_disconnect,
+                        reconnected_cb=self._on_reconnect,
+                        closed_cb=self._on_disconnect,
+                        tls=self.tls,
+                        tls_hostname=self.tls_hostname,
+                        tls_handshake_first=self.tls_handshake_first,
+                        **self.auth,
+                        **buffer_options
                     ),
                     timeout=self.connection_timeout + 5  # Add buffer to asyncio timeout
                 )
                 
                 logger.info(f"NATS client '{self.client_id}' connected successfully")
-                self.is_connected = True
+                self._set_connected(True)
+                await self._subscribe_all()
                 return True
                 
             except asyncio.TimeoutError:
@@ -120,7 +205,7 @@ class SimpleNATSClient:
                 await asyncio.sleep(wait_time)
         
         logger.error(f"Failed to connect to NATS after {self.max_retries} attempts")
-        self.is_connected = False
+        self._set_connected(False)
         return False
 
     async def disconnect(self):
@@ -129,34 +214,77 @@ class SimpleNATSClient:
             await self.nc.close()
             logger.info("Disconnected from NATS server")
 
-    async def send_message(self, subject, message_body, timeout=5.0):
-        """Send a message to NATS."""
+    async def send_message(self, subject, message_body, timeout=5.0, payload=None):
+        """Send a message to NATS, optionally with an already encoded payload."""
         if not self.is_connected or not self.nc.is_connected:
             logger.error("Cannot send message: Not connected to NATS")
             return False
         
+        span = None
+        headers = None
+        if tracer.enabled:
+            span = tracer.start_span("nats.publish", subject=subject)
+            # Let the receiver continue the trace, if the server supports headers
+            if span.context.sampled and self.headers_supported:
+                headers = {"traceparent": span.context.traceparent()}
+        
         try:
             # Create message payload
-            payload = {
-                "body": message_body,
-                "sender": self.client_id
-            }
+            if payload is None:
+                payload = encode_payload(message_body, self.client_id)
             
             # Send message
             await asyncio.wait_for(
-                self.nc.publish(subject, json.dumps(payload).encode()),
+                self.nc.publish(subject, payload, headers=headers),
                 timeout=timeout
             )
             
             logger.info(f"Message sent to '{subject}': {message_body}")
-            return True
+            success = True
             
         except asyncio.TimeoutError:
             logger.error(f"Timeout sending message to '{subject}'")
-            return False
+            success = False
         except Exception as e:
             logger.error(f"Error sending message to '{subject}': {e}")
+            success = False
+        
+        if span:
+            span.end(success=success)
+        return success
+
+    async def publish(self, subject, payload, timeout=5.0):
+        """Publish an encoded payload without per-message logging or tracing (heartbeats)."""
+        if not self.is_connected or not self.nc.is_connected:
             return False
+        try:
+            await asyncio.wait_for(self.nc.publish(subject, payload), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout publishing to '{subject}'")
+        except Exception as e:
+            logger.error(f"Error publishing to '{subject}': {e}")
+        return False
+
+    async def subscribe(self, subject, callback):
+        """Subscribe now if connected, and again on every fresh connection."""
+        self.subscriptions.append((subject, callback))
+        if self.get_connection_status() and self.subscribed_on is self.nc:
+            await self.nc.subscribe(subject, cb=callback)
+        else:
+            await self._subscribe_all()
+
+    async def _subscribe_all(self):
+        # nats-py restores subscriptions on its own reconnects; only a new client needs them again
+        if not self.subscriptions or self.subscribed_on is self.nc or not self.nc.is_connected:
+            return
+        try:
+            for subject, callback in self.subscriptions:
+                await self.nc.subscribe(subject, cb=callback)
+                logger.info(f"Subscribed to '{subject}'")
+            self.subscribed_on = self.nc
+        except Exception as e:
+            logger.error(f"Error subscribing: {e}")
 
     def get_connection_status(self):
         """Get current connection status."""
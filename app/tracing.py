@@ -0,0 +1,223 @@
+import collections
+import contextvars
+import json
+import random
+import threading
+import time
+from gpio_nats_logging import logger
+
+# Trace context of the span currently running in this thread or task. Contexts cross
+# threads with loop.call_soon_threadsafe (which copies the caller's context) and cross
+# the trigger queue explicitly.
+_current = contextvars.ContextVar("dunebugger_trace_context", default=None)
+
+
+class SpanContext:
+    """Identifies a span; rendered as a W3C traceparent header for NATS messages."""
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id, span_id, sampled=True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self):
+        return f"00-{self.trace_id:032x}-{self.span_id:016x}-{1 if self.sampled else 0:02x}"
+
+
+# Context of a trace that lost the sampling decision: its children are not recorded either
+UNSAMPLED = SpanContext(0, 0, sampled=False)
+
+
+class Span:
+    """A timed operation (monotonic nanoseconds) within a trace."""
+
+    __slots__ = ("tracer", "name", "context", "parent_id", "start_ns", "attributes", "_token")
+
+    def __init__(self, tracer, name, context, parent_id, start_ns, attributes, activate):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.start_ns = start_ns
+        self.attributes = attributes
+        self._token = _current.set(context) if activate else None
+
+    def end(self, end_ns=None, **attributes):
+        """Finish the span, restoring the context that was current when it started."""
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        if self.context.sampled:
+            self.attributes.update(attributes)
+            self.tracer.exporter.add((
+                self.name, self.context.trace_id, self.context.span_id, self.parent_id,
+                self.start_ns, end_ns or time.monotonic_ns(), self.attributes
+            ))
+
+
+class Tracer:
+    """Creates spans when tracing is enabled.
+
+    Instrumented code checks ``tracer.enabled`` before calling ``start_span``, so the
+    only cost with tracing disabled is that attribute lookup. The sampling decision is
+    taken once per trace, at its root span.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.exporter = None
+
+    def configure(self, sample_rate, exporter):
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.exporter = exporter
+        self.enabled = self.sample_rate > 0 and exporter is not None
+
+    def start_span(self, name, parent=None, start_ns=None, activate=True, **attributes):
+        """Start a span under ``parent`` (default: the current context), or a new trace.
+
+        With ``activate`` the span becomes the current context until ``end()``, which
+        must then be called from the same thread or task.
+        """
+        if parent is None:
+            parent = _current.get()
+        if parent is None:
+            if random.random() < self.sample_rate:
+                context = SpanContext(random.getrandbits(128) or 1, random.getrandbits(64) or 1)
+            else:
+                context = UNSAMPLED
+            parent_id = 0
+        elif parent.sampled:
+            context = SpanContext(parent.trace_id, random.getrandbits(64) or 1)
+            parent_id = parent.span_id
+        else:
+            context = UNSAMPLED
+            parent_id = 0
+        return Span(self, name, context, parent_id, start_ns or time.monotonic_ns(), attributes, activate)
+
+    def shutdown(self):
+        if self.exporter:
+            self.exporter.shutdown()
+        self.enabled = False
+
+
+def current_context():
+    """Trace context of the running span, or None."""
+    return _current.get()
+
+
+def attach(context):
+    """Make ``context`` current (e.g. after taking a trigger off the queue); returns a token for detach()."""
+    return _current.set(context)
+
+
+def detach(token):
+    _current.reset(token)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class BatchSpanExporter:
+    """Buffers finished spans and writes them in batches from a background thread.
+
+    Batches are OTLP/JSON ``ExportTraceServiceRequest`` documents, POSTed to an
+    ``http(s)://`` collector endpoint (e.g. ``http://host:4318/v1/traces``) or appended
+    to a file, one document per line. When the buffer is full the oldest spans are
+    dropped rather than slowing down the trigger path.
+    """
+
+    def __init__(self, target, service_name="dunebugger-starter", batch_size=64, flush_interval=5.0,
+                 max_buffered=4096):
+        self.target = target
+        self.service_name = service_name
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.spans = collections.deque(maxlen=max_buffered)
+        # Spans carry monotonic timestamps; OTLP wants Unix time
+        self.unix_offset_ns = time.time_ns() - time.monotonic_ns()
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def add(self, span):
+        if len(self.spans) == self.max_buffered:
+            self.dropped += 1
+        self.spans.append(span)
+        if len(self.spans) >= self.batch_size:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        while self.spans:
+            batch = []
+            while self.spans and len(batch) < self.batch_size:
+                batch.append(self.spans.popleft())
+            try:
+                self._write(self._encode(batch))
+                self.exported += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning(f"Failed to export {len(batch)} trace spans to {self.target}: {e}")
+
+    def _encode(self, batch):
+        offset = self.unix_offset_ns
+        spans = []
+        for name, trace_id, span_id, parent_id, start_ns, end_ns, attributes in batch:
+            span = {
+                "traceId": f"{trace_id:032x}",
+                "spanId": f"{span_id:016x}",
+                "name": name,
+                "kind": 1,
+                "startTimeUnixNano": str(start_ns + offset),
+                "endTimeUnixNano": str(end_ns + offset),
+                "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()],
+            }
+            if parent_id:
+                span["parentSpanId"] = f"{parent_id:016x}"
+            spans.append(span)
+        return json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "dunebugger-starter"}, "spans": spans}],
+        }]}).encode()
+
+    def _write(self, document):
+        if self.target.startswith(("http://", "https://")):
+            import urllib.request
+            request = urllib.request.Request(
+                self.target, data=document, headers={"Content-Type": "application/json"}, method="POST"
+            )
+            with urllib.request.urlopen(request, timeout=5) as response:
+                response.read()
+        else:
+            with open(self.target, "ab") as f:
+                f.write(document + b"\n")
+
+    def shutdown(self):
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout=10)
+        self.flush()
+
+
+# Process-wide tracer, configured by the application at startup
+tracer = Tracer()
@@ -0,0 +1,198 @@
+import ipaddress
+import os
+import socket
+import struct
+from gpio_nats_logging import logger
+from pulse_recognizer import SHORT, LONG, DOUBLE, TRIPLE, HOLD
+
+# Wire format of a trigger datagram (20 bytes, network byte order):
+#   magic "DB" | version u8 | pulse u8 | channel u16 | reserved u16 | sequence u32 | token u64
+TRIGGER_FORMAT = struct.Struct("!2sBBHHIQ")
+TRIGGER_MAGIC = b"DB"
+TRIGGER_VERSION = 1
+
+# Pulse codes: 0 is a plain trigger on the channel's default route
+PULSE_CODES = (None, SHORT, LONG, DOUBLE, TRIPLE, HOLD)
+
+MAX_TRACKED_SOURCES = 1024
+
+
+def encode_trigger(channel, pulse=None, sequence=0, token=0):
+    """Build a trigger datagram; pulse is None or one of the pulse class names."""
+    return TRIGGER_FORMAT.pack(
+        TRIGGER_MAGIC, TRIGGER_VERSION, PULSE_CODES.index(pulse), channel, 0, sequence & 0xFFFFFFFF, token
+    )
+
+
+def parse_token(value):
+    """Parse a hex token (with or without 0x); empty means no token, invalid never matches."""
+    value = str(value or '').strip()
+    if not value:
+        return 0
+    try:
+        return int(value, 16)
+    except ValueError:
+        logger.error(f"Invalid ingress token '{value}'")
+        return -1
+
+
+def parse_allowlist(spec):
+    """Parse 'network[=token], ...' into a list of (ip_network, token)."""
+    allowlist = []
+    for entry in (spec or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        network, _, token = entry.partition('=')
+        try:
+            allowlist.append((ipaddress.ip_network(network.strip(), strict=False), parse_token(token)))
+        except ValueError:
+            logger.error(f"Invalid ingress allowlist entry '{entry}'")
+    return allowlist
+
+
+class TriggerIngress:
+    """Accepts trigger datagrams over UDP and a Unix datagram socket.
+
+    Sockets are non-blocking and registered with the event loop's reader callbacks; each
+    readiness callback drains up to ``batch_size`` datagrams into a preallocated buffer,
+    the closest Python gets to recvmmsg. Valid triggers are passed to
+    ``trigger_callback(channel, pulse, source)`` on the loop thread.
+
+    UDP sources must match ``allowlist`` (empty allows any source); an allowlist entry
+    with a hex token also requires that token. Unix socket senders are restricted by the
+    socket file permissions and, if set, ``unix_token``. Datagrams repeating or going
+    back in sequence number per source address are dropped as duplicates; Unix senders
+    that do not bind their socket have no address to tell them apart, so their
+    datagrams are not checked.
+    """
+
+    def __init__(self, trigger_callback, udp_bind=None, unix_path=None, allowlist=None,
+                 unix_token=0, batch_size=32):
+        self.trigger_callback = trigger_callback
+        self.udp_bind = udp_bind
+        self.unix_path = unix_path
+        self.allowlist = allowlist or []
+        self.unix_token = unix_token
+        self.batch_size = max(1, batch_size)
+        self.loop = None
+        self.sockets = []
+        self.last_sequence = {}
+        self._buffer = bytearray(TRIGGER_FORMAT.size + 1)
+        self._view = memoryview(self._buffer)
+
+        # Counters
+        self.received = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.malformed = 0
+        self.duplicates = 0
+        self.batches = 0
+
+    def start(self, loop):
+        """Open the configured sockets and register them with the loop."""
+        self.loop = loop
+        if self.udp_bind:
+            host, _, port = self.udp_bind.rpartition(':')
+            host = host.strip('[]') or '0.0.0.0'
+            family = socket.AF_INET6 if ':' in host else socket.AF_INET
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                sock.bind((host, int(port)))
+            except (OSError, ValueError):
+                sock.close()
+                raise
+            self._register(sock, self._check_udp_source)
+            logger.info(f"Trigger ingress listening on udp://{self.udp_bind}")
+        if self.unix_path:
+            if os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                sock.bind(self.unix_path)
+                os.chmod(self.unix_path, 0o660)
+            except OSError:
+                sock.close()
+                raise
+            self._register(sock, self._check_unix_source)
+            logger.info(f"Trigger ingress listening on unix://{self.unix_path}")
+
+    def _register(self, sock, check_source):
+        sock.setblocking(False)
+        self.sockets.append(sock)
+        self.loop.add_reader(sock.fileno(), self._drain, sock, check_source)
+
+    def close(self):
+        for sock in self.sockets:
+            self.loop.remove_reader(sock.fileno())
+            sock.close()
+        self.sockets.clear()
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    def _drain(self, sock, check_source):
+        """Read every pending datagram (up to batch_size) from a ready socket."""
+        self.batches += 1
+        for _ in range(self.batch_size):
+            try:
+                size, source = sock.recvfrom_into(self._buffer)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.error(f"Trigger ingress receive error: {e}")
+                return
+            self.received += 1
+            self._handle(size, source, check_source)
+
+    def _handle(self, size, source, check_source):
+        if size != TRIGGER_FORMAT.size:
+            self.malformed += 1
+            return
+        magic, version, pulse_code, channel, _, sequence, token = TRIGGER_FORMAT.unpack_from(self._view)
+        if magic != TRIGGER_MAGIC or version != TRIGGER_VERSION or pulse_code >= len(PULSE_CODES):
+            self.malformed += 1
+            return
+        if not check_source(source, token):
+            self.rejected += 1
+            logger.debug(f"Rejected trigger datagram from {source or 'unix socket'}")
+            return
+
+        # Drop repeated or reordered datagrams (sequence comparison tolerates wrap-around);
+        # sequence 0 means the sender does not number its datagrams or has restarted
+        if source:
+            last = self.last_sequence.get(source)
+            if sequence and last and (last - sequence) & 0xFFFFFFFF < 0x80000000:
+                self.duplicates += 1
+                return
+            if len(self.last_sequence) >= MAX_TRACKED_SOURCES:
+                self.last_sequence.clear()
+            self.last_sequence[source] = sequence
+
+        self.accepted += 1
+        self.trigger_callback(channel, PULSE_CODES[pulse_code], source or 'unix')
+
+    def _check_udp_source(self, source, token):
+        if not self.allowlist:
+            return True
+        address = ipaddress.ip_address(source[0])
+        # IPv4 senders reach a dual-stack IPv6 socket as ::ffff:a.b.c.d
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        for network, required_token in self.allowlist:
+            if address in network:
+                return not required_token or token == required_token
+        return False
+
+    def _check_unix_source(self, source, token):
+        return not self.unix_token or token == self.unix_token
+
+    def get_metrics(self):
+        return {
+            "received": self.received,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "malformed": self.malformed,
+            "duplicates": self.duplicates,
+            "batches": self.batches,
+        }
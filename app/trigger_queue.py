@@ -0,0 +1,171 @@
+import asyncio
+import time
+from array import array
+from gpio_nats_logging import logger
+
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "coalesce")
+
+# Results of TriggerQueue.put
+QUEUED = "queued"
+REPLACED = "replaced"  # queued after dropping the oldest trigger of the lane
+COALESCED = "coalesced"
+DROPPED = "dropped"
+
+
+class TriggerQueue:
+    """Bounded, preallocated trigger queue with priority lanes.
+
+    Lane 0 has the highest priority; a trigger is only taken from a lane when every
+    lane before it is empty. Each lane is a fixed-size ring of parallel arrays, so
+    enqueueing a trigger does not allocate. The queue is not thread-safe: producers
+    outside the event loop must hand triggers over with ``call_soon_threadsafe``.
+
+    Overflow policies, applied when a lane is full:
+    - drop_oldest: the oldest trigger in the lane is discarded
+    - drop_newest: the incoming trigger is discarded
+    - coalesce: the incoming trigger is merged into the newest queued trigger for the
+      same route and channel (its count is incremented); if there is none, it is discarded
+    """
+
+    def __init__(self, capacity=64, lanes=1, overflow="drop_oldest"):
+        if overflow not in OVERFLOW_POLICIES:
+            logger.error(f"Unknown trigger queue overflow policy '{overflow}', using drop_oldest")
+            overflow = "drop_oldest"
+        self.capacity = max(1, capacity)
+        self.lanes = max(1, lanes)
+        self.overflow = overflow
+
+        self._routes = [[None] * self.capacity for _ in range(self.lanes)]
+        self._traces = [[None] * self.capacity for _ in range(self.lanes)]
+        self._channels = [array('i', bytes(4 * self.capacity)) for _ in range(self.lanes)]
+        self._captured_ns = [array('q', bytes(8 * self.capacity)) for _ in range(self.lanes)]
+        self._enqueued_ns = [array('q', bytes(8 * self.capacity)) for _ in range(self.lanes)]
+        self._counts = [array('I', bytes(4 * self.capacity)) for _ in range(self.lanes)]
+        self._heads = [0] * self.lanes
+        self._sizes = [0] * self.lanes
+        self._size = 0
+        self._not_empty = asyncio.Event()
+
+        # Metrics
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.high_water = [0] * self.lanes
+        self.last_wait_ns = 0
+        self.max_wait_ns = 0
+        self.total_wait_ns = 0
+
+    def __len__(self):
+        return self._size
+
+    def put(self, route, channel, captured_ns, lane=0, trace=None):
+        """Enqueue a trigger with its optional trace context.
+
+        Returns QUEUED, REPLACED (queued, the lane's oldest trigger was dropped), COALESCED
+        (merged into a queued trigger) or DROPPED.
+        """
+        lane = min(max(lane, 0), self.lanes - 1)
+        size = self._sizes[lane]
+        now = time.monotonic_ns()
+
+        if size == self.capacity:
+            if self.overflow == "drop_newest":
+                self.dropped += 1
+                return DROPPED
+            if self.overflow == "coalesce":
+                return self._coalesce(lane, route, channel)
+            # drop_oldest: advance the head past the oldest trigger
+            self._routes[lane][self._heads[lane]] = None
+            self._traces[lane][self._heads[lane]] = None
+            self._heads[lane] = (self._heads[lane] + 1) % self.capacity
+            self._sizes[lane] = size = size - 1
+            self._size -= 1
+            self.dropped += 1
+            result = REPLACED
+        else:
+            result = QUEUED
+
+        slot = (self._heads[lane] + size) % self.capacity
+        self._routes[lane][slot] = route
+        self._traces[lane][slot] = trace
+        self._channels[lane][slot] = channel
+        self._captured_ns[lane][slot] = captured_ns
+        self._enqueued_ns[lane][slot] = now
+        self._counts[lane][slot] = 1
+        self._sizes[lane] = size + 1
+        self._size += 1
+        self.enqueued += 1
+        if size + 1 > self.high_water[lane]:
+            self.high_water[lane] = size + 1
+        self._not_empty.set()
+        return result
+
+    def _coalesce(self, lane, route, channel):
+        head = self._heads[lane]
+        for offset in range(self._sizes[lane] - 1, -1, -1):
+            slot = (head + offset) % self.capacity
+            if self._routes[lane][slot] is route and self._channels[lane][slot] == channel:
+                self._counts[lane][slot] += 1
+                self.coalesced += 1
+                return COALESCED
+        self.dropped += 1
+        return DROPPED
+
+    def pop(self):
+        """Take the next trigger without waiting.
+
+        Returns (route, channel, captured_ns, count, lane, trace) or None if the queue is empty.
+        """
+        for lane in range(self.lanes):
+            if self._sizes[lane]:
+                break
+        else:
+            return None
+
+        slot = self._heads[lane]
+        route = self._routes[lane][slot]
+        item = (route, self._channels[lane][slot], self._captured_ns[lane][slot], self._counts[lane][slot], lane,
+                self._traces[lane][slot])
+        self._routes[lane][slot] = None
+        self._traces[lane][slot] = None
+        self._heads[lane] = (slot + 1) % self.capacity
+        self._sizes[lane] -= 1
+        self._size -= 1
+        if not self._size:
+            self._not_empty.clear()
+
+        wait_ns = time.monotonic_ns() - self._enqueued_ns[lane][slot]
+        self.dequeued += 1
+        self.last_wait_ns = wait_ns
+        self.total_wait_ns += wait_ns
+        if wait_ns > self.max_wait_ns:
+            self.max_wait_ns = wait_ns
+        return item
+
+    async def wait(self):
+        """Wait until a trigger is queued, without taking it."""
+        while not self._size:
+            await self._not_empty.wait()
+
+    async def get(self):
+        """Wait for and take the next trigger."""
+        await self.wait()
+        return self.pop()
+
+    def get_metrics(self):
+        """Queue depth and wait-time metrics."""
+        return {
+            "depth": self._size,
+            "lane_depths": list(self._sizes),
+            "high_water": list(self.high_water),
+            "capacity": self.capacity,
+            "enqueued": self.enqueued,
+            "dequeued": self.dequeued,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "last_wait_ms": self.last_wait_ns / 1e6,
+            "max_wait_ms": self.max_wait_ns / 1e6,
+            "avg_wait_ms": self.total_wait_ns / self.dequeued / 1e6 if self.dequeued else 0.0,
+        }
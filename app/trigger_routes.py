@@ -0,0 +1,47 @@
+from gpio_nats_logging import logger
+
+
+class Route:
+    """Publish target for a trigger: NATS subject, message body, queue lane and
+    optionally the payload bytes encoded ahead of time."""
+
+    __slots__ = ("name", "subject", "message", "lane", "payload")
+
+    def __init__(self, name, subject, message, lane=0, payload=None):
+        self.name = name
+        self.subject = subject
+        self.message = message
+        self.lane = lane
+        self.payload = payload
+
+    def __repr__(self):
+        return f"Route({self.name!r}, {self.subject!r}, {self.message!r}, lane={self.lane})"
+
+
+def parse_priorities(spec):
+    """Parse a 'key:lane, key:lane' priority list.
+
+    Integer keys are GPIO pins, anything else is a NATS subject. Returns two dicts:
+    pin -> lane and subject -> lane.
+    """
+    pin_lanes = {}
+    subject_lanes = {}
+    if not spec:
+        return pin_lanes, subject_lanes
+
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            key, lane = entry.rsplit(':', 1)
+            lane = int(lane)
+        except ValueError:
+            logger.error(f"Invalid trigger priority entry '{entry}', expected key:lane")
+            continue
+        key = key.strip()
+        if key.isdigit():
+            pin_lanes[int(key)] = lane
+        else:
+            subject_lanes[key] = lane
+    return pin_lanes, subject_lanes
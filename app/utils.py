@@ -20,4 +20,12 @@ def validate_path(path):
     if os.path.exists(path):
         return True
     else:
-        return False
\ No newline at end of file
+        return False
+
+
+def percentile(sorted_values, pct):
+    """Return the pct-th percentile of an already sorted list (0.0 if it is empty)."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Cue Timing Benchmark
+Measures how late timed cues run relative to their edge-anchored due times, for
+many concurrent cue sequences on a loop kept busy by synthetic load. Compares the
+timer wheel with plain loop.call_at timers and with a chain of asyncio.sleep()
+calls, and optionally measures cues end to end through the application to a
+local NATS stand-in.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from gpio_nats_logging import logger
+from cue_scheduler import TimerWheel
+from utils import percentile
+
+
+def report(name, errors_ns, drifts_ns):
+    errors = sorted(error / 1e6 for error in errors_ns)
+    print(f"  {name:16} p50 {percentile(errors, 50):7.3f}ms  p90 {percentile(errors, 90):7.3f}ms  "
+          f"p99 {percentile(errors, 99):7.3f}ms  max {errors[-1]:7.3f}ms  "
+          f"drift first->last cue {statistics.mean(drifts_ns) / 1e6:+8.3f}ms")
+
+
+async def busy_load(load_ms, period, stop):
+    """Block the loop for load_ms every period, like CPU-heavy callbacks would."""
+    while not stop.is_set():
+        end = time.perf_counter() + load_ms / 1000.0
+        while time.perf_counter() < end:
+            pass
+        await asyncio.sleep(period)
+
+
+def offsets(args):
+    return [int(index * args.spacing * 1e9) for index in range(args.cues)]
+
+
+async def run_sequences(args, start_sequence):
+    """Start args.sequences sequences at random edges; return lateness per cue and per-sequence drift."""
+    errors = []
+    drifts = []
+    done = asyncio.get_running_loop().create_future()
+    remaining = [args.sequences]
+
+    def finished(sequence_errors):
+        errors.extend(sequence_errors)
+        drifts.append(sequence_errors[-1] - sequence_errors[0])
+        remaining[0] -= 1
+        if not remaining[0]:
+            done.set_result(None)
+
+    stop = asyncio.Event()
+    load = asyncio.create_task(busy_load(args.load_ms, args.load_period, stop)) if args.load_ms else None
+    for _ in range(args.sequences):
+        await asyncio.sleep(random.uniform(0, args.stagger / args.sequences))
+        start_sequence(time.monotonic_ns(), offsets(args), finished)
+    await done
+    stop.set()
+    if load:
+        await load
+    return errors, drifts
+
+
+def wheel_sequence(wheel):
+    def start(anchor_ns, cue_offsets, finished):
+        sequence_errors = []
+
+        def fire(due_ns):
+            sequence_errors.append(time.monotonic_ns() - due_ns)
+            if len(sequence_errors) == len(cue_offsets):
+                finished(sequence_errors)
+
+        for offset_ns in cue_offsets:
+            wheel.call_at(anchor_ns + offset_ns, fire, anchor_ns + offset_ns)
+    return start
+
+
+def call_at_sequence(loop):
+    def start(anchor_ns, cue_offsets, finished):
+        sequence_errors = []
+
+        def fire(due_ns):
+            sequence_errors.append(time.monotonic_ns() - due_ns)
+            if len(sequence_errors) == len(cue_offsets):
+                finished(sequence_errors)
+
+        for offset_ns in cue_offsets:
+            loop.call_at((anchor_ns + offset_ns) / 1e9, fire, anchor_ns + offset_ns)
+    return start
+
+
+def sleep_chain_sequence():
+    def start(anchor_ns, cue_offsets, finished):
+        async def play():
+            # The way a separate cue service typically does it: sleep the gap to the next cue
+            sequence_errors = []
+            previous = 0
+            for offset_ns in cue_offsets:
+                await asyncio.sleep((offset_ns - previous) / 1e9)
+                previous = offset_ns
+                sequence_errors.append(time.monotonic_ns() - (anchor_ns + offset_ns))
+            finished(sequence_errors)
+        asyncio.get_running_loop().create_task(play())
+    return start
+
+
+async def run_scheduler(args):
+    loop = asyncio.get_running_loop()
+    print(f"Scheduling error, {args.sequences} sequences of {args.cues} cues {args.spacing:g}s apart, "
+          f"loop blocked {args.load_ms:g}ms every {args.load_period * 1000:g}ms:")
+    wheel = TimerWheel(args.tick, args.slots)
+    wheel.start(loop)
+    cases = [("timer wheel", wheel_sequence(wheel)), ("loop.call_at", call_at_sequence(loop))]
+    if not args.no_sleep_chain:
+        cases.append(("sleep chain", sleep_chain_sequence()))
+    for name, start in cases:
+        errors, drifts = await run_sequences(args, start)
+        report(name, errors, drifts)
+    wheel.close()
+
+
+async def run_app(args):
+    """Cue sequences through the application's trigger queue and NATS client to a stand-in server."""
+    from gpio_nats_settings import settings
+    from main import GPIONATSSender
+    from nats_standin import StandInNATSServer
+
+    cue_offsets = offsets(args)
+    settings.natsEnabled = True
+    settings.controlEnabled = False
+    settings.eventLogEnabled = False
+    settings.heartbeatEnabled = False
+    settings.cueDefaultSequence = ", ".join(
+        f"{offset / 1e9:g}:cue{index}" for index, offset in enumerate(cue_offsets)
+    )
+    settings.cueTimerTick = args.tick
+    settings.cueTimerSlots = args.slots
+    settings.triggerQueueSize = max(64, args.sequences)
+
+    server = StandInNATSServer()
+    await server.start()
+    anchors = []
+    errors = []
+    per_sequence = [[] for _ in range(args.sequences)]
+    received = [0] * len(cue_offsets)
+
+    def on_publish(subject, payload, headers, t_ns):
+        body = json.loads(payload)["body"]
+        if not body.startswith("cue"):
+            return
+        # Cues fire in due-time order through a FIFO queue, so the k-th delivery of a cue
+        # belongs to the k-th sequence started
+        index = int(body[3:])
+        sequence = received[index]
+        received[index] += 1
+        error = t_ns - (anchors[sequence] + cue_offsets[index])
+        per_sequence[sequence].append(error)
+        errors.append(error)
+
+    server.on_publish = on_publish
+    app = GPIONATSSender()
+    app.nats_server = server.url
+    task = asyncio.create_task(app.run())
+    while not (app.nats_client and app.nats_client.get_connection_status()):
+        await asyncio.sleep(0.05)
+
+    stop = asyncio.Event()
+    load = asyncio.create_task(busy_load(args.load_ms, args.load_period, stop)) if args.load_ms else None
+    for channel in range(args.sequences):
+        await asyncio.sleep(random.uniform(0, args.stagger / args.sequences))
+        anchor_ns = time.monotonic_ns()
+        anchors.append(anchor_ns)
+        # One channel per sequence, so none of them re-triggers another
+        app.submit_trigger(channel, None, anchor_ns)
+    deadline = time.monotonic() + cue_offsets[-1] / 1e9 + 10
+    while len(errors) < args.sequences * len(cue_offsets) and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    stop.set()
+    if load:
+        await load
+    app.running = False
+    await asyncio.wait_for(task, timeout=30)
+    await server.stop()
+
+    drifts = [sequence[-1] - sequence[0] for sequence in per_sequence if len(sequence) == len(cue_offsets)]
+    print(f"End to end (edge-anchored due time to NATS server), {len(errors)}/{args.sequences * len(cue_offsets)} "
+          f"cues received:")
+    if errors:
+        report("application", errors, drifts or [0])
+    return len(errors) == args.sequences * len(cue_offsets)
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Measure cue scheduling error under load")
+    parser.add_argument("--sequences", type=int, default=200, help="Concurrent cue sequences")
+    parser.add_argument("--cues", type=int, default=20, help="Cues per sequence")
+    parser.add_argument("--spacing", type=float, default=0.25, help="Seconds between cues")
+    parser.add_argument("--stagger", type=float, default=1.0, help="Seconds over which the sequences start")
+    parser.add_argument("--load-ms", type=float, default=2.0, help="Milliseconds the loop is blocked per load period")
+    parser.add_argument("--load-period", type=float, default=0.01, help="Seconds between load bursts")
+    parser.add_argument("--tick", type=float, default=0.01, help="Timer wheel tick (seconds)")
+    parser.add_argument("--slots", type=int, default=512, help="Timer wheel slots")
+    parser.add_argument("--no-sleep-chain", action="store_true", help="Skip the asyncio.sleep() chain comparison")
+    parser.add_argument("--app", action="store_true",
+                        help="Also measure cues end to end through the application and a NATS stand-in")
+    parser.add_argument("--verbose", action="store_true", help="Show application log output")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+
+    asyncio.run(run_scheduler(args))
+    if args.app:
+        sys.exit(0 if asyncio.run(run_app(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
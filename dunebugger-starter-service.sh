@@ -12,7 +12,7 @@ BLUE='\033[0;34m'
 NC='\033[0m'
 
 print_usage() {
-    echo "Usage: $0 {start|stop|restart|status|enable|disable|logs|config|install|uninstall}"
+    echo "Usage: $0 {start|stop|restart|status|enable|disable|logs|config|ctl|install|uninstall}"
     echo ""
     echo "Commands:"
     echo "  start      - Start the service"
@@ -23,6 +23,8 @@ print_usage() {
     echo "  disable    - Disable service from starting at boot"
     echo "  logs       - Show service logs (follow mode)"
     echo "  config     - Edit configuration file"
+    echo "  ctl        - Query or control the running service (status, counters, connection,"
+    echo "               events, fire, pause, resume; see: $0 ctl --help)"
     echo "  install    - Run installation script"
     echo "  uninstall  - Remove service and files"
 }
@@ -83,6 +85,12 @@ case "$1" in
             exit 1
         fi
         ;;
+    ctl)
+        shift
+        PYTHON="$APP_DIR/.venv/bin/python"
+        [ -x "$PYTHON" ] || PYTHON=python3
+        exec "$PYTHON" "$APP_DIR/app/ctl.py" "$@"
+        ;;
     install)
         check_root
         SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
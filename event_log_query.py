@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Event Log Query
+Answer count, rate and latency questions over a time range from the binary
+event log, without parsing text. Plain segments are memory-mapped and searched
+by time; compressed segments are decompressed in memory. Segments outside the
+range are skipped using their headers, which stay correct when the wall clock
+stepped back.
+"""
+
+import argparse
+import gzip
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from event_log import (
+    HEADER_FORMAT, RECORD_FORMAT, EVENT_LOG_MAGIC, EVENT_LOG_VERSION, EVENT_TYPES, EVENT_CODES,
+    list_segments, route_id,
+)
+from utils import percentile
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'events')
+TIME_FORMAT = struct.Struct("<q")
+RELATIVE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_time(value):
+    """Parse 'now', 'today', 'yesterday', a relative age like 12h/30m/2d, or an ISO date/time."""
+    now = datetime.now()
+    value = value.strip().lower()
+    if value == "now":
+        moment = now
+    elif value in ("today", "yesterday"):
+        moment = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if value == "yesterday":
+            moment -= timedelta(days=1)
+    else:
+        match = re.fullmatch(r"-?(\d+(?:\.\d+)?)([smhd])", value)
+        if match:
+            moment = now - timedelta(seconds=float(match.group(1)) * RELATIVE_UNITS[match.group(2)])
+        else:
+            moment = datetime.fromisoformat(value)
+    return int(moment.timestamp() * 1e9)
+
+
+def read_head(path):
+    """(previous segment's last record time, first record time or None) from the start of a segment."""
+    size = HEADER_FORMAT.size + RECORD_FORMAT.size
+    try:
+        with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as f:
+            data = f.read(size)
+    except (OSError, EOFError):
+        return None
+    if len(data) < HEADER_FORMAT.size:
+        return None
+    magic, version, record_size, _, previous_last = HEADER_FORMAT.unpack_from(data)
+    if magic != EVENT_LOG_MAGIC or version != EVENT_LOG_VERSION or record_size != RECORD_FORMAT.size:
+        return None
+    first = TIME_FORMAT.unpack_from(data, HEADER_FORMAT.size)[0] if len(data) == size else None
+    return previous_last, first
+
+
+def open_segment(path):
+    """Return (buffer, record count) for a segment, or None if it is empty or unreadable."""
+    try:
+        if path.endswith(".gz"):
+            with gzip.open(path, "rb") as f:
+                data = f.read()
+        else:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size <= HEADER_FORMAT.size:
+                    return None
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, EOFError) as e:
+        print(f"Skipping unreadable segment {path}: {e}", file=sys.stderr)
+        return None
+
+    if len(data) <= HEADER_FORMAT.size:
+        return None
+    magic, version, record_size, _, _ = HEADER_FORMAT.unpack_from(data)
+    if magic != EVENT_LOG_MAGIC or version != EVENT_LOG_VERSION or record_size != RECORD_FORMAT.size:
+        print(f"Skipping {path}: not an event log segment of this version", file=sys.stderr)
+        return None
+    # Ignore a partially written trailing record
+    return data, (len(data) - HEADER_FORMAT.size) // RECORD_FORMAT.size
+
+
+def bisect_time(data, count, t_ns):
+    """Index of the first record at or after t_ns (the log keeps each segment in time order)."""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if TIME_FORMAT.unpack_from(data, HEADER_FORMAT.size + mid * RECORD_FORMAT.size)[0] < t_ns:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def iter_records(directory, since_ns, until_ns):
+    """Yield every record tuple between since_ns (inclusive) and until_ns (exclusive)."""
+    segments = list_segments(directory)
+    plain = {path for path in segments if not path.endswith(".gz")}
+    # A segment being compressed exists twice for a moment; prefer the plain file
+    segments = [path for path in segments if not (path.endswith(".gz") and path[:-3] in plain)]
+
+    # Segments are in the order they were written; after a clock step a later segment can
+    # hold earlier times, so each one is checked against its own first record and the
+    # last record time the following segment carries in its header
+    heads = [read_head(path) for path in segments]
+    for index, path in enumerate(segments):
+        head = heads[index]
+        if head is not None and (head[1] is None or head[1] >= until_ns):
+            continue
+        following = heads[index + 1] if index + 1 < len(segments) else None
+        if following is not None and following[0] and following[0] < since_ns:
+            continue
+
+        opened = open_segment(path)
+        if opened is None:
+            continue
+        data, count = opened
+        first = bisect_time(data, count, since_ns)
+        last = bisect_time(data, count, until_ns)
+        view = memoryview(data)[HEADER_FORMAT.size + first * RECORD_FORMAT.size:
+                                HEADER_FORMAT.size + last * RECORD_FORMAT.size]
+        try:
+            yield from RECORD_FORMAT.iter_unpack(view)
+        finally:
+            view.release()
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+
+def select(args, since_ns, until_ns, default_events=None):
+    """Records in range matching the --event/--channel/--route filters."""
+    events = {EVENT_CODES[name] for name in (args.event or default_events or ())}
+    route = route_id(args.route) if args.route else None
+    for record in iter_records(args.dir, since_ns, until_ns):
+        t_ns, latency_us, rid, count, channel, event, lane = record
+        if events and event not in events:
+            continue
+        if args.channel is not None and channel != args.channel:
+            continue
+        if route is not None and rid != route:
+            continue
+        yield record
+
+
+def run_count(args, since_ns, until_ns):
+    counts = Counter()
+    triggers = Counter()
+    for _, _, _, count, _, event, _ in select(args, since_ns, until_ns):
+        counts[event] += 1
+        triggers[event] += count
+    if not counts:
+        print("No events in range")
+        return
+    for code, records in sorted(counts.items()):
+        if code == EVENT_CODES["cancelled"]:
+            extra = f"  ({triggers[code]} cues)"
+        else:
+            extra = f"  ({triggers[code]} triggers incl. coalesced)" if triggers[code] != records else ""
+        print(f"  {EVENT_TYPES[code]:14} {records:>10}{extra}")
+    attempts = counts[EVENT_CODES["published"]] + counts[EVENT_CODES["failed"]]
+    if attempts:
+        print(f"  {'failure rate':14} {100.0 * counts[EVENT_CODES['failed']] / attempts:>9.2f}%")
+
+
+def run_rate(args, since_ns, until_ns):
+    bucket_ns = int(args.bucket * 1e9)
+    buckets = Counter()
+    for record in select(args, since_ns, until_ns, default_events=["published"]):
+        buckets[record[0] // bucket_ns] += 1
+    if not buckets:
+        print("No events in range")
+        return
+    for bucket in range(min(buckets), max(buckets) + 1):
+        stamp = datetime.fromtimestamp(bucket * bucket_ns / 1e9).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"  {stamp}  {buckets[bucket]:>8}  {buckets[bucket] / args.bucket:8.3f}/s")
+
+
+def run_latency(args, since_ns, until_ns):
+    latencies = sorted(record[1] / 1000.0 for record in select(args, since_ns, until_ns, default_events=["published"]))
+    if not latencies:
+        print("No events in range")
+        return
+    print(f"  events {len(latencies)}  edge to publish (ms): p50 {percentile(latencies, 50):.3f}  "
+          f"p90 {percentile(latencies, 90):.3f}  p99 {percentile(latencies, 99):.3f}  max {latencies[-1]:.3f}")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Query the dunebugger-starter binary event log")
+    parser.add_argument("query", choices=["count", "rate", "latency"], help="What to compute")
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="Event log directory")
+    parser.add_argument("--since", default="24h", help="Start: now, today, yesterday, 12h, 30m, 2d or ISO time")
+    parser.add_argument("--until", default="now", help="End, same formats as --since")
+    parser.add_argument("--event", action="append", choices=EVENT_TYPES[1:],
+                        help="Only these events (repeatable; rate/latency default to published)")
+    parser.add_argument("--channel", type=int, help="Only this channel")
+    parser.add_argument("--route", help="Only this route (default, short, long, double, triple, hold, or a cue such as default/2)")
+    parser.add_argument("--bucket", type=float, default=3600.0, help="Seconds per rate bucket")
+    args = parser.parse_args()
+
+    try:
+        since_ns = parse_time(args.since)
+        until_ns = parse_time(args.until)
+    except ValueError as e:
+        parser.error(f"invalid time: {e}")
+
+    started = time.perf_counter()
+    print(f"{args.query} from {datetime.fromtimestamp(since_ns / 1e9):%Y-%m-%d %H:%M:%S} "
+          f"to {datetime.fromtimestamp(until_ns / 1e9):%Y-%m-%d %H:%M:%S}")
+    {"count": run_count, "rate": run_rate, "latency": run_latency}[args.query](args, since_ns, until_ns)
+    print(f"({time.perf_counter() - started:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
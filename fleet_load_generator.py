@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Fleet Load Generator
+Simulates hundreds or thousands of starters in a single asyncio process and
+reports aggregate publish throughput and latency percentiles. With --heartbeats
+the starters also publish heartbeats into a fleet view, like the aggregator mode.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import time
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from nats.aio.client import Client as NATS
+from gpio_nats_logging import logger
+from gpio_nats_settings import settings
+from main import GPIONATSSender
+from heartbeat import FleetView, HeartbeatPublisher
+from simple_nats_client import SimpleNATSClient, encode_payload
+from trigger_routes import Route
+from nats_standin import StandInNATSServer
+from utils import percentile
+
+
+def raise_fd_limit(needed):
+    """Raise the soft open-file limit so that every virtual starter can hold a socket."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        logger.debug(f"Raised open-file limit from {soft} to {target}")
+
+
+class LoadStats:
+    """Aggregate counters and latency samples for one load run."""
+
+    def __init__(self):
+        self.fired = 0
+        self.failed = 0
+        self.publish_latencies = []
+        self.delivery_latencies = []
+        self.burst_durations = []
+        # Send timestamps per starter client id; NATS keeps per-connection order, so FIFO
+        # matching is exact also when starters share a connection
+        self.in_flight = collections.defaultdict(collections.deque)
+        self.senders = set()
+
+
+class VirtualStarter(GPIONATSSender):
+    """A GPIONATSSender without GPIO, wired to its own or a shared NATS client.
+
+    Each starter has its own client id, also over a shared connection, and publishes
+    its default route with that id as the payload's sender.
+    """
+
+    def __init__(self, index, client_id, nats_client, stats, subject):
+        super().__init__()
+        self.index = index
+        self.client_id = client_id
+        self.nats_client = nats_client
+        self.stats = stats
+        self.nats_subject = subject
+        self.default_route = Route("default", subject, self.nats_message, 0,
+                                   encode_payload(self.nats_message, client_id))
+
+    async def fire(self):
+        """Run the application's trigger path and record its publish latency."""
+        in_flight = self.stats.in_flight[self.client_id]
+        started = time.perf_counter()
+        in_flight.append(started)
+        self.stats.fired += 1
+        if await self.gpio_trigger_callback(self.index, self.default_route):
+            self.stats.publish_latencies.append(time.perf_counter() - started)
+            self.published += 1
+            self.last_trigger_at = time.time()
+        else:
+            self.stats.failed += 1
+            self.publish_failures += 1
+            in_flight.remove(started)
+
+
+async def connect_fleet(server_url, count, shared, prefix, concurrency):
+    """Create and connect the NATS clients for the fleet."""
+    def make_client(client_id):
+        return SimpleNATSClient(
+            servers=server_url,
+            client_id=client_id,
+            connection_timeout=getattr(settings, 'natsTimeout', 10),
+            max_retries=getattr(settings, 'natsMaxRetries', 3),
+            retry_delay=getattr(settings, 'natsRetryDelay', 5)
+        )
+
+    if shared:
+        client = make_client(f"{prefix}-shared")
+        await client.connect()
+        return [client] * count
+
+    clients = [make_client(f"{prefix}-{index:05d}") for index in range(count)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def connect_one(client):
+        async with semaphore:
+            await client.connect()
+
+    await asyncio.gather(*(connect_one(client) for client in clients))
+    return clients
+
+
+async def burst_pattern(starters, duration, interval, stats):
+    """Every starter fires at the same instant, once per interval."""
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        await asyncio.gather(*(starter.fire() for starter in starters))
+        stats.burst_durations.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+async def poisson_pattern(starters, duration, rate):
+    """Each starter fires as an independent Poisson process with the given rate per second."""
+    total_rate = rate * len(starters)
+    deadline = time.monotonic() + duration
+    pending = set()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(random.expovariate(total_rate))
+        task = asyncio.create_task(random.choice(starters).fire())
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.gather(*pending)
+
+
+async def replay_pattern(starters, capture_file):
+    """Replay a capture of '<seconds offset> [starter index]' lines."""
+    events = []
+    with open(capture_file) as capture:
+        for line in capture:
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            index = int(fields[1]) % len(starters) if len(fields) > 1 else random.randrange(len(starters))
+            events.append((float(fields[0]), index))
+    events.sort()
+    start = time.monotonic()
+    pending = set()
+    for offset, index in events:
+        delay = start + offset - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(starters[index].fire())
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.gather(*pending)
+
+
+def time_queries(fleet, repeat=20):
+    """Median time of a full fleet query, in milliseconds."""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fleet.query()
+        durations.append(time.perf_counter() - started)
+    return sorted(durations)[len(durations) // 2] * 1000
+
+
+async def run(args):
+    stats = LoadStats()
+    server = None
+    server_url = args.server
+    if not server_url:
+        server = StandInNATSServer()
+        await server.start()
+        server_url = server.url
+    subject = args.subject or getattr(settings, 'natsSubject', 'dunebugger.core.dunebugger_set')
+
+    raise_fd_limit(args.count + 256)
+
+    # Independent subscriber measuring edge-to-delivery latency
+    subscriber = NATS()
+    await subscriber.connect(servers=[server_url], name=f"{args.prefix}-probe", pending_size=64 * 1024 * 1024)
+
+    async def on_message(msg):
+        received = time.perf_counter()
+        sender = json.loads(msg.data)["sender"]
+        stats.senders.add(sender)
+        queue = stats.in_flight.get(sender)
+        if queue:
+            stats.delivery_latencies.append(received - queue.popleft())
+
+    await subscriber.subscribe(subject, cb=on_message, pending_msgs_limit=1024 * 1024)
+
+    connect_started = time.perf_counter()
+    clients = await connect_fleet(server_url, args.count, args.shared, args.prefix, args.connect_concurrency)
+    connect_time = time.perf_counter() - connect_started
+    connected = len({id(client) for client in clients if client.get_connection_status()})
+    print(f"Connected {connected} NATS connection(s) for {args.count} virtual starters in {connect_time:.2f}s")
+
+    starters = [VirtualStarter(index, f"{args.prefix}-{index:05d}", client, stats, subject)
+                for index, client in enumerate(clients)]
+
+    fleet = None
+    if args.heartbeats:
+        heartbeat_subject = getattr(settings, 'heartbeatSubject', '') or 'dunebugger.starter.heartbeat'
+        fleet = FleetView()
+        await subscriber.subscribe(f"{heartbeat_subject}.>", cb=fleet.on_message, pending_msgs_limit=1024 * 1024)
+        loop = asyncio.get_running_loop()
+        for starter in starters:
+            starter.heartbeat = HeartbeatPublisher(
+                starter.nats_client, heartbeat_subject, starter.client_id, [starter.index],
+                ["default"], starter._heartbeat_state, interval=args.heartbeat_interval, min_interval=1.0
+            )
+            starter.heartbeat.start(loop)
+
+    started = time.perf_counter()
+    if args.pattern == "burst":
+        await burst_pattern(starters, args.duration, args.interval, stats)
+    elif args.pattern == "poisson":
+        await poisson_pattern(starters, args.duration, args.rate)
+    else:
+        await replay_pattern(starters, args.capture)
+    elapsed = time.perf_counter() - started
+
+    # Let the subscriber catch up with everything still in flight
+    await subscriber.flush()
+    drain_deadline = time.monotonic() + 5
+    while len(stats.delivery_latencies) < stats.fired - stats.failed and time.monotonic() < drain_deadline:
+        await asyncio.sleep(0.05)
+
+    if fleet:
+        # Last heartbeats carry the final counters
+        await asyncio.sleep(1.5)
+        armed = fleet.query()["status"]["armed"]
+        query_ms = time_queries(fleet)
+        await asyncio.gather(*(starter.heartbeat.stop() for starter in starters))
+        await subscriber.flush()
+        drain_deadline = time.monotonic() + 5
+        while fleet.query()["status"]["offline"] < args.count and time.monotonic() < drain_deadline:
+            await asyncio.sleep(0.05)
+        summary = fleet.query()
+        reported = sum(member["published"] for member in summary["members"])
+
+    for client in {id(client): client for client in clients}.values():
+        await client.disconnect()
+    await subscriber.close()
+    if server:
+        await server.stop()
+
+    publish = sorted(stats.publish_latencies)
+    delivery = sorted(stats.delivery_latencies)
+    sent = len(publish)
+    print(f"Pattern:              {args.pattern}")
+    print(f"Triggers fired:       {stats.fired}")
+    print(f"Publish failures:     {stats.failed}")
+    print(f"Delivered:            {len(delivery)} from {len(stats.senders)} senders")
+    print(f"Publish throughput:   {sent / elapsed:.1f} msg/s over {elapsed:.2f}s")
+    if stats.burst_durations:
+        print(f"Burst completion:     avg {sum(stats.burst_durations) / len(stats.burst_durations) * 1000:.2f}ms  "
+              f"max {max(stats.burst_durations) * 1000:.2f}ms "
+              f"({args.count / max(stats.burst_durations):.1f} msg/s at peak)")
+    for label, values in (("Publish latency", publish), ("Delivery latency", delivery)):
+        if values:
+            print(f"{label + ':':<22}p50 {percentile(values, 50) * 1000:.2f}ms  "
+                  f"p90 {percentile(values, 90) * 1000:.2f}ms  "
+                  f"p99 {percentile(values, 99) * 1000:.2f}ms  "
+                  f"max {values[-1] * 1000:.2f}ms")
+    if fleet:
+        heartbeats = summary["heartbeats"]
+        print(f"Fleet view:           {armed}/{args.count} armed while running, "
+              f"{summary['status']['offline']} offline after shutdown")
+        print(f"Heartbeats:           {heartbeats['received']} received, {heartbeats['invalid']} invalid, "
+              f"{heartbeats['out_of_order']} out of order; published count {reported}/{sent} in the view")
+        print(f"Fleet query:          {query_ms:.2f}ms for {summary['starters']} starters")
+        return stats.failed == 0 and summary["status"]["offline"] == args.count and reported == sent
+    return stats.failed == 0
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Simulate a fleet of starters firing at a NATS server")
+    parser.add_argument("--count", type=int, default=200, help="Number of virtual starters")
+    parser.add_argument("--shared", action="store_true",
+                        help="Multiplex every virtual starter over one shared NATS connection")
+    parser.add_argument("--pattern", choices=["burst", "poisson", "replay"], default="burst")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to generate load (burst/poisson)")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between synchronized bursts")
+    parser.add_argument("--rate", type=float, default=0.5, help="Triggers per second per starter (poisson)")
+    parser.add_argument("--capture", help="Capture file to replay: '<seconds offset> [starter index]' per line")
+    parser.add_argument("--server", help="NATS server URL (default: start an in-process stand-in)")
+    parser.add_argument("--subject", help="Subject to publish to (default: natsSubject)")
+    parser.add_argument("--prefix", default="dunebugger-starter-load", help="Client id prefix")
+    parser.add_argument("--connect-concurrency", type=int, default=64, help="Connections opened in parallel")
+    parser.add_argument("--heartbeats", action="store_true",
+                        help="Publish heartbeats from every starter and check the fleet view")
+    parser.add_argument("--heartbeat-interval", type=float, default=30.0, help="Seconds between idle heartbeats")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args()
+
+    if args.pattern == "replay" and not args.capture:
+        parser.error("--pattern replay requires --capture")
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+
+    try:
+        result = asyncio.run(run(args))
+        sys.exit(0 if result else 1)
+    except KeyboardInterrupt:
+        logger.info("Load generation interrupted by user")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Memory Budget Test
+Runs the application in a child process against a local NATS stand-in, with
+triggers flowing, and fails if its peak resident set size exceeds a budget.
+Run it with the low-memory profile to guard the Pi Zero footprint against
+regressions.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app')
+TEST_SUBJECT = "dunebugger.test.memory"
+
+
+def read_status(pid):
+    """VmRSS and VmHWM (peak RSS) of a process in KiB."""
+    values = {}
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, value = line.split()[:2]
+                values[key[:-1]] = int(value)
+    return values
+
+
+def run_child(args):
+    """Application side: configure like a deployment, start, and fire triggers."""
+    sys.path.insert(0, APP_DIR)
+    from gpio_nats_settings import settings, LOW_MEMORY_DEFAULTS
+
+    settings.natsEnabled = True
+    settings.natsServer = args.server
+    settings.natsSubject = TEST_SUBJECT
+    settings.controlEnabled = True
+    settings.controlSocket = args.socket
+    settings.eventLogEnabled = False
+    if args.low_memory:
+        settings.lowMemory = True
+        for option, value in LOW_MEMORY_DEFAULTS.items():
+            setattr(settings, option, value)
+
+    from main import GPIONATSSender
+
+    async def main():
+        app = GPIONATSSender()
+        # run() installs the SIGTERM handler the parent uses to stop it
+        task = asyncio.create_task(app.run())
+        # run() returns early if initialize() fails, before the application is running
+        deadline = time.monotonic() + args.init_timeout
+        while not app.running:
+            if task.done() or time.monotonic() > deadline:
+                print("Application did not initialize", file=sys.stderr)
+                return False
+            await asyncio.sleep(0.05)
+        while not task.done():
+            app.submit_trigger(getattr(settings, 'gpioPin', 6), app.default_route)
+            await asyncio.sleep(args.trigger_interval)
+        return True
+
+    sys.exit(0 if asyncio.run(main()) else 1)
+
+
+async def run_parent(args):
+    sys.path.insert(0, APP_DIR)
+    from ctl import request
+    from nats_standin import StandInNATSServer
+
+    server = StandInNATSServer()
+    await server.start()
+    triggers = []
+    server.on_publish = lambda subject, payload, headers, t_ns: subject == TEST_SUBJECT and triggers.append(t_ns)
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="dunebugger-memory-"), "ctl.sock")
+    command = [sys.executable]
+    if args.tracemalloc:
+        command += ["-X", "tracemalloc"]
+    command += [os.path.abspath(__file__), "--child", "--server", server.url, "--socket", socket_path,
+                "--trigger-interval", str(args.trigger_interval), "--init-timeout", str(args.init_timeout)]
+    if args.low_memory:
+        command.append("--low-memory")
+    child = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.DEVNULL, stderr=None if args.verbose else asyncio.subprocess.DEVNULL
+    )
+
+    try:
+        deadline = time.monotonic() + args.init_timeout
+        while not os.path.exists(socket_path):
+            if time.monotonic() > deadline or child.returncode is not None:
+                print("Application did not start")
+                return False
+            await asyncio.sleep(0.1)
+
+        await asyncio.sleep(args.warmup)
+        published_before = len(triggers)
+        samples = []
+        end = time.monotonic() + args.duration
+        while time.monotonic() < end:
+            if child.returncode is not None:
+                print(f"Application exited with status {child.returncode} during the measurement")
+                return False
+            samples.append(read_status(child.pid)["VmRSS"])
+            await asyncio.sleep(0.5)
+        status = read_status(child.pid)
+        published = len(triggers) - published_before
+        report = await asyncio.get_running_loop().run_in_executor(None, request, socket_path, {"cmd": "memory"})
+    finally:
+        if child.returncode is None:
+            child.send_signal(signal.SIGTERM)
+            try:
+                await asyncio.wait_for(child.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                child.kill()
+        await server.stop()
+
+    peak = status["VmHWM"]
+    budget_kb = int(args.budget_mb * 1024)
+    print(f"Profile:           {'low-memory' if args.low_memory else 'default'}")
+    print(f"Triggers published during the measurement: {published}")
+    print(f"RSS min/max:       {min(samples)} / {max(samples)} KiB")
+    print(f"Peak RSS:          {peak} KiB (budget {budget_kb} KiB)")
+    if report.get("ok"):
+        result = report["result"]
+        print(f"Modules loaded:    {result['modules']}")
+        if "top_kb" in result:
+            print(f"Python allocations {result['python_kb']} KiB, by origin:")
+            for origin, size in result["top_kb"].items():
+                print(f"  {size:>6} KiB  {origin}")
+    if args.json:
+        print(json.dumps({"peak_rss_kb": peak, "budget_kb": budget_kb, "samples": samples,
+                          "report": report.get("result")}))
+    if not published:
+        # Without triggers flowing the measurement says nothing about the loaded footprint
+        print("FAIL: no triggers reached the NATS stand-in")
+        return False
+    if args.tracemalloc:
+        print("Budget not checked: tracing adds its own memory to the RSS")
+        return True
+    if peak > budget_kb:
+        print(f"FAIL: peak RSS exceeds the budget by {peak - budget_kb} KiB")
+        return False
+    print("PASS")
+    return True
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Fail if the application's peak RSS exceeds a budget")
+    parser.add_argument("--budget-mb", type=float, default=32.0,
+                        help="Peak RSS budget in MiB (measured about 28 MiB on 64-bit Linux)")
+    parser.add_argument("--low-memory", action="store_true", help="Run with the low-memory profile")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of measurement")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds before measuring")
+    parser.add_argument("--trigger-interval", type=float, default=0.05, help="Seconds between triggers")
+    parser.add_argument("--init-timeout", type=float, default=30.0,
+                        help="Seconds the application may take to start")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Run the application under tracemalloc and print its allocations by origin "
+                             "(the budget is not checked then)")
+    parser.add_argument("--json", action="store_true", help="Also print the measurements as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show application log output")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--server", help=argparse.SUPPRESS)
+    parser.add_argument("--socket", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+    sys.exit(0 if asyncio.run(run_parent(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
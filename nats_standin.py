@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+NATS Stand-in Server and Fault-Injecting Proxy
+A minimal in-process NATS server plus a TCP proxy that can inject network
+faults, used by the recovery, load and soak test utilities.
+"""
+
+import asyncio
+import json
+import random
+import socket
+import ssl
+import struct
+import time
+
+
+def subject_matches(pattern, subject):
+    """Check a NATS subject against a subscription pattern with '*' and '>' wildcards."""
+    pattern_tokens = pattern.split('.')
+    subject_tokens = subject.split('.')
+    for index, token in enumerate(pattern_tokens):
+        if token == '>':
+            return len(subject_tokens) > index
+        if index >= len(subject_tokens):
+            return False
+        if token != '*' and token != subject_tokens[index]:
+            return False
+    return len(pattern_tokens) == len(subject_tokens)
+
+
+def _abort_with_rst(writer):
+    """Close a stream so that the peer receives a TCP RST instead of a FIN."""
+    sock = writer.get_extra_info('socket')
+    if sock is not None:
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        except OSError:
+            pass
+    writer.transport.abort()
+
+
+class StandInNATSServer:
+    """Minimal NATS protocol server (INFO/CONNECT/PING/PUB/HPUB/SUB/UNSUB) for local testing.
+
+    With an ``ssl_context`` the server requires TLS like nats-server: the plaintext INFO
+    is followed by a TLS upgrade, or with ``handshake_first`` TLS starts right away. With
+    ``token`` or ``user``/``password`` the CONNECT credentials are checked. A ``version``
+    before 2.2 stands in for a server without message headers.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, ssl_context=None, handshake_first=False,
+                 token=None, user=None, password=None, version="2.10.0"):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.handshake_first = handshake_first
+        self.token = token
+        self.user = user
+        self.password = password
+        self.version = version
+        self.server = None
+        self.clients = set()
+        self.on_publish = None
+        self.published = 0
+        self.connections = 0
+        self.auth_failures = 0
+
+    async def start(self):
+        """Start listening; a port of 0 picks a free port which is then kept across restarts."""
+        self.server = await asyncio.start_server(
+            self._handle_client, self.host, self.port, reuse_address=True,
+            ssl=self.ssl_context if self.handshake_first else None
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop listening and drop every connected client."""
+        if self.server:
+            self.server.close()
+            for writer in list(self.clients):
+                writer.transport.abort()
+            self.clients.clear()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def restart(self, downtime=0.0):
+        """Simulate a server restart with the given downtime in seconds."""
+        await self.stop()
+        await asyncio.sleep(downtime)
+        await self.start()
+
+    @property
+    def url(self):
+        return f"{'tls' if self.ssl_context else 'nats'}://{self.host}:{self.port}"
+
+    def _info(self):
+        info = {
+            "server_id": "dunebugger-standin",
+            "server_name": "dunebugger-standin",
+            "version": self.version,
+            "proto": 1,
+            "host": self.host,
+            "port": self.port,
+            "max_payload": 1048576,
+        }
+        if tuple(int(part) for part in self.version.split('.')[:2]) >= (2, 2):
+            info["headers"] = True
+        if self.ssl_context:
+            info["tls_required"] = True
+        if self.token or self.user:
+            info["auth_required"] = True
+        return f"INFO {json.dumps(info)}\r\n".encode()
+
+    def _authorized(self, options):
+        if self.token:
+            return options.get("auth_token") == self.token
+        if self.user:
+            return options.get("user") == self.user and options.get("pass") == self.password
+        return True
+
+    async def _handle_client(self, reader, writer):
+        self.clients.add(writer)
+        self.connections += 1
+        writer.subscriptions = {}
+        try:
+            writer.write(self._info())
+            if self.ssl_context and not self.handshake_first:
+                await writer.start_tls(self.ssl_context)
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                parts = line.decode().split()
+                if not parts:
+                    continue
+                op = parts[0].upper()
+                if op == 'PING':
+                    writer.write(b"PONG\r\n")
+                elif op == 'PUB':
+                    size = int(parts[-1])
+                    data = await reader.readexactly(size + 2)
+                    self._route(parts[1], parts[2] if len(parts) == 4 else None, None, data[:-2])
+                elif op == 'HPUB':
+                    header_size, total_size = int(parts[-2]), int(parts[-1])
+                    data = await reader.readexactly(total_size + 2)
+                    reply = parts[2] if len(parts) == 5 else None
+                    self._route(parts[1], reply, data[:header_size], data[header_size:-2])
+                elif op == 'SUB':
+                    writer.subscriptions[parts[-1]] = parts[1]
+                elif op == 'UNSUB':
+                    writer.subscriptions.pop(parts[1], None)
+                elif op == 'CONNECT' and not self._authorized(json.loads(line.decode()[len('CONNECT'):])):
+                    self.auth_failures += 1
+                    writer.write(b"-ERR 'Authorization Violation'\r\n")
+                    await writer.drain()
+                    break
+                # CONNECT and PONG need no answer (verbose mode is not supported)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.transport.abort()
+
+    def _route(self, subject, reply, headers, payload):
+        self.published += 1
+        if self.on_publish:
+            self.on_publish(subject, payload, headers, time.monotonic_ns())
+        reply_part = f" {reply}" if reply else ""
+        for writer in self.clients:
+            for sid, pattern in writer.subscriptions.items():
+                if not subject_matches(pattern, subject):
+                    continue
+                if headers:
+                    writer.write(
+                        f"HMSG {subject} {sid}{reply_part} {len(headers)} {len(headers) + len(payload)}\r\n".encode()
+                        + headers + payload + b"\r\n"
+                    )
+                else:
+                    writer.write(f"MSG {subject} {sid}{reply_part} {len(payload)}\r\n".encode() + payload + b"\r\n")
+
+
+class FaultProxy:
+    """TCP proxy placed between a client and a server that injects network faults on demand.
+
+    Supported faults:
+    - latency/jitter: every chunk is released after ``latency`` plus a uniform ``jitter``,
+      keeping stream order
+    - dropped packets: a chunk is "lost" with probability ``drop_rate`` and released only
+      after ``retransmit_timeout``, which is how TCP surfaces packet loss to the application
+    - RST: every proxied connection is aborted with a TCP reset
+    - black-hole: nothing is forwarded in either direction and new connections are never
+      bridged upstream until the black hole is lifted
+    """
+
+    def __init__(self, upstream_host, upstream_port, host="127.0.0.1", port=0):
+        self.upstream_host = upstream_host
+        self.upstream_port = upstream_port
+        self.host = host
+        self.port = port
+        self.server = None
+        self.connections = set()
+        self.latency = 0.0
+        self.jitter = 0.0
+        self.drop_rate = 0.0
+        self.retransmit_timeout = 0.2
+        self._open = asyncio.Event()
+        self._open.set()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port, reuse_address=True)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            self.reset_connections()
+            await self.server.wait_closed()
+            self.server = None
+
+    @property
+    def url(self):
+        return f"nats://{self.host}:{self.port}"
+
+    def set_latency(self, latency, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+
+    def set_drop_rate(self, drop_rate, retransmit_timeout=0.2):
+        self.drop_rate = drop_rate
+        self.retransmit_timeout = retransmit_timeout
+
+    def set_blackhole(self, enabled):
+        if enabled:
+            self._open.clear()
+        else:
+            self._open.set()
+
+    def reset_connections(self):
+        """Abort every proxied connection with a TCP RST on both sides."""
+        for client_writer, upstream_writer in list(self.connections):
+            _abort_with_rst(client_writer)
+            if upstream_writer is not None:
+                _abort_with_rst(upstream_writer)
+        self.connections.clear()
+
+    def clear_faults(self):
+        self.set_latency(0.0, 0.0)
+        self.set_drop_rate(0.0)
+        self.set_blackhole(False)
+
+    def _release_delay(self):
+        delay = self.latency
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)
+        if self.drop_rate and random.random() < self.drop_rate:
+            delay += self.retransmit_timeout
+        return delay
+
+    async def _handle_client(self, client_reader, client_writer):
+        entry = (client_writer, None)
+        self.connections.add(entry)
+        try:
+            await self._open.wait()
+            upstream_reader, upstream_writer = await asyncio.open_connection(self.upstream_host, self.upstream_port)
+        except (OSError, asyncio.CancelledError):
+            self.connections.discard(entry)
+            client_writer.transport.abort()
+            return
+        self.connections.discard(entry)
+        if client_writer.is_closing():
+            upstream_writer.transport.abort()
+            return
+        entry = (client_writer, upstream_writer)
+        self.connections.add(entry)
+        try:
+            await asyncio.gather(
+                self._pump(client_reader, upstream_writer),
+                self._pump(upstream_reader, client_writer),
+                return_exceptions=True
+            )
+        except asyncio.CancelledError:
+            pass
+        self.connections.discard(entry)
+        client_writer.transport.abort()
+        upstream_writer.transport.abort()
+
+    async def _pump(self, reader, writer):
+        """Forward one direction, releasing chunks in order at their scheduled times."""
+        loop = asyncio.get_running_loop()
+        pending = asyncio.Queue()
+
+        async def release():
+            while True:
+                release_at, chunk = await pending.get()
+                if chunk is None:
+                    break
+                delay = release_at - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self._open.wait()
+                writer.write(chunk)
+                await writer.drain()
+
+        releaser = asyncio.create_task(release())
+        last_release = 0.0
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                last_release = max(loop.time() + self._release_delay(), last_release)
+                pending.put_nowait((last_release, chunk))
+        finally:
+            pending.put_nowait((0.0, None))
+            try:
+                await releaser
+            except (ConnectionError, OSError):
+                pass
+            if not writer.is_closing():
+                writer.close()
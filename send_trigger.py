@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Trigger Datagram Sender
+Send a trigger to a starter's network ingress over UDP or its Unix datagram
+socket, the same way an ESP board or a script would.
+"""
+
+import argparse
+import os
+import socket
+import sys
+import time
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from pulse_recognizer import PULSE_CLASSES
+from trigger_ingress import encode_trigger, parse_token
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Send trigger datagrams to a dunebugger starter")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--udp", metavar="HOST:PORT", help="UDP ingress address")
+    target.add_argument("--unix", metavar="PATH", help="Unix datagram ingress socket")
+    parser.add_argument("--channel", type=int, default=6, help="Channel (GPIO pin or virtual channel)")
+    parser.add_argument("--pulse", choices=PULSE_CLASSES, help="Press pattern to route as (default: plain trigger)")
+    parser.add_argument("--token", default="", help="Hex auth token")
+    parser.add_argument("--count", type=int, default=1, help="Number of triggers to send")
+    parser.add_argument("--interval", type=float, default=0.0, help="Seconds between triggers")
+    args = parser.parse_args()
+
+    if args.udp:
+        host, _, port = args.udp.rpartition(':')
+        host = host.strip('[]')
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        address = (host, int(port))
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        address = args.unix
+
+    token = parse_token(args.token)
+    # Sequence numbers start from the clock so a restarted sender is not taken for a replay
+    sequence = int(time.time()) & 0xFFFFFFFF
+    for index in range(args.count):
+        sock.sendto(encode_trigger(args.channel, args.pulse, sequence + index, token), address)
+        if args.interval:
+            time.sleep(args.interval)
+    sock.close()
+    print(f"Sent {args.count} trigger(s) on channel {args.channel} to {args.udp or args.unix}")
+
+
+if __name__ == "__main__":
+    main()
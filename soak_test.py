@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Soak Test with Leak Detection
+Runs the application for a long period against a local NATS stand-in with
+continuous triggers and forced reconnect churn, sampling process resources
+and failing if any of them keeps growing.
+"""
+
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from gpio_nats_logging import logger
+from gpio_nats_settings import settings
+from main import GPIONATSSender
+from nats_standin import StandInNATSServer, FaultProxy
+
+SOAK_SUBJECT = "dunebugger.test.soak"
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+HARNESS_FILES = {os.path.abspath(__file__), os.path.abspath(sys.modules[StandInNATSServer.__module__].__file__)}
+
+# Metric name -> default allowed growth between the start and the end of the measured window
+DEFAULT_TOLERANCES = {
+    "rss_kb": 4096,
+    "fds": 4,
+    "tasks": 10,
+    "threads": 2,
+    "traced_kb": 1024,
+}
+
+
+def read_rss_kb():
+    """Resident set size of this process in KiB."""
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * PAGE_SIZE // 1024
+
+
+def count_fds():
+    """Number of open file descriptors of this process."""
+    return len(os.listdir("/proc/self/fd"))
+
+
+def count_application_tasks():
+    """Number of pending asyncio tasks, excluding the harness and stand-in server's own tasks."""
+    count = 0
+    for task in asyncio.all_tasks():
+        code = getattr(task.get_coro(), "cr_code", None)
+        if code is None or os.path.abspath(code.co_filename) not in HARNESS_FILES:
+            count += 1
+    return count
+
+
+def take_sample(started):
+    """Collect one resource sample."""
+    traced, _ = tracemalloc.get_traced_memory()
+    return {
+        "elapsed": time.monotonic() - started,
+        "rss_kb": read_rss_kb(),
+        "fds": count_fds(),
+        "tasks": count_application_tasks(),
+        "threads": threading.active_count(),
+        "traced_kb": traced // 1024,
+    }
+
+
+def detect_growth(samples, warmup, tolerances):
+    """Compare the median of the first and last quarter of the post-warmup window per metric.
+
+    Returns a list of (metric, growth, tolerance) for metrics exceeding their tolerance.
+    """
+    window = [sample for sample in samples if sample["elapsed"] >= warmup]
+    if len(window) < 8:
+        logger.warning("Not enough samples after warmup to judge growth")
+        return []
+    quarter = len(window) // 4
+    failures = []
+    for metric, tolerance in tolerances.items():
+        first = statistics.median(sample[metric] for sample in window[:quarter])
+        last = statistics.median(sample[metric] for sample in window[-quarter:])
+        growth = last - first
+        if growth > tolerance:
+            failures.append((metric, growth, tolerance))
+    return failures
+
+
+def start_thread_trigger(app, interval, stop_event):
+    """Fire the GPIO callback from a separate thread, as RPi.GPIO does."""
+    def trigger_loop():
+        while not stop_event.wait(random.uniform(0, 2 * interval)):
+            app.gpio_handler._gpio_callback(app.gpio_handler.gpio_pin)
+
+    thread = threading.Thread(target=trigger_loop, name="soak-trigger", daemon=True)
+    thread.start()
+    return thread
+
+
+async def run(args):
+    server = StandInNATSServer()
+    await server.start()
+    proxy = FaultProxy(server.host, server.port)
+    await proxy.start()
+
+    app = GPIONATSSender()
+    app.nats_server = proxy.url
+    app.nats_subject = SOAK_SUBJECT
+    app_task = asyncio.create_task(app.run())
+    # run() returns early if initialize() fails, before the application is running
+    deadline = time.monotonic() + args.startup_timeout
+    while not app.running and not app_task.done() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    problem = None
+    if not app.running:
+        problem = "Application did not initialize" if app_task.done() else \
+            f"Application did not start within {args.startup_timeout:g}s"
+    elif args.trigger_mode == "thread" and app.gpio_handler is None:
+        problem = "Thread trigger mode needs the GPIO handler (gpioEnabled, no acquisition process)"
+    if problem:
+        print(f"❌ {problem}")
+        app.running = False
+        await asyncio.wait_for(app_task, timeout=30)
+        await proxy.stop()
+        await server.stop()
+        return False
+
+    started = time.monotonic()
+    stop_event = threading.Event()
+    samples = []
+    tracemalloc.start(args.traceback_depth)
+    baseline_snapshot = None
+    # Publishes started by the loop trigger, kept so that none is lost and their errors count
+    publish_tasks = set()
+    publish_errors = []
+
+    def publish_done(task):
+        publish_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            publish_errors.append(task.exception())
+
+    async def loop_trigger():
+        while not stop_event.is_set():
+            await asyncio.sleep(random.uniform(0, 2 * args.trigger_interval))
+            if app.gpio_handler:
+                app.gpio_handler._gpio_callback(app.gpio_handler.gpio_pin)
+            else:
+                task = asyncio.create_task(app.gpio_trigger_callback(0))
+                publish_tasks.add(task)
+                task.add_done_callback(publish_done)
+
+    async def churn():
+        cycle = 0
+        while not stop_event.is_set():
+            await asyncio.sleep(args.churn_interval)
+            cycle += 1
+            if cycle % 4 == 0:
+                await server.restart(args.churn_interval / 4)
+            else:
+                proxy.reset_connections()
+            logger.debug(f"Soak: reconnect churn cycle {cycle}")
+
+    tasks = [asyncio.create_task(churn())]
+    if args.trigger_mode == "thread":
+        trigger_thread = start_thread_trigger(app, args.trigger_interval, stop_event)
+    else:
+        trigger_thread = None
+        tasks.append(asyncio.create_task(loop_trigger()))
+
+    try:
+        while time.monotonic() - started < args.duration:
+            await asyncio.sleep(args.sample_interval)
+            sample = take_sample(started)
+            samples.append(sample)
+            if baseline_snapshot is None and sample["elapsed"] >= args.warmup:
+                baseline_snapshot = tracemalloc.take_snapshot()
+            print(f"[{sample['elapsed']:8.0f}s] rss={sample['rss_kb']}KiB fds={sample['fds']} "
+                  f"tasks={sample['tasks']} threads={sample['threads']} traced={sample['traced_kb']}KiB "
+                  f"published={server.published}", flush=True)
+    finally:
+        stop_event.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(*publish_tasks, return_exceptions=True)
+        if trigger_thread:
+            trigger_thread.join(timeout=5)
+        final_snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        app.running = False
+        await asyncio.wait_for(app_task, timeout=30)
+        await proxy.stop()
+        await server.stop()
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=list(samples[0]) if samples else [])
+            writer.writeheader()
+            writer.writerows(samples)
+
+    if baseline_snapshot is not None:
+        print("Top allocation growth since warmup:")
+        for stat in final_snapshot.compare_to(baseline_snapshot, "lineno")[:args.top]:
+            print(f"  {stat}")
+
+    tolerances = dict(DEFAULT_TOLERANCES)
+    for override in args.tolerance or []:
+        metric, value = override.split("=", 1)
+        tolerances[metric] = float(value)
+
+    failures = detect_growth(samples, args.warmup, tolerances)
+    print(f"Messages delivered to stand-in: {server.published}, connections accepted: {server.connections}")
+    if publish_errors:
+        print(f"❌ {len(publish_errors)} publishes raised, first: {publish_errors[0]!r}")
+    if failures:
+        for metric, growth, tolerance in failures:
+            print(f"❌ {metric} grew by {growth:g} (tolerance {tolerance:g})")
+    if publish_errors or failures:
+        return False
+    print("✅ No unbounded resource growth detected")
+    return True
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Long-running soak test with leak detection")
+    parser.add_argument("--duration", type=float, default=3600.0, help="Seconds to run")
+    parser.add_argument("--warmup", type=float, default=120.0, help="Seconds ignored before measuring growth")
+    parser.add_argument("--sample-interval", type=float, default=10.0, help="Seconds between resource samples")
+    parser.add_argument("--trigger-interval", type=float, default=0.05, help="Mean seconds between triggers")
+    parser.add_argument("--trigger-mode", choices=["thread", "loop"], default="thread",
+                        help="Fire the GPIO callback from a separate thread (like RPi.GPIO) or from the loop")
+    parser.add_argument("--churn-interval", type=float, default=20.0,
+                        help="Seconds between forced reconnects (every fourth one restarts the server)")
+    parser.add_argument("--startup-timeout", type=float, default=30.0,
+                        help="Seconds the application may take to start")
+    parser.add_argument("--retry-delay", type=int, default=1,
+                        help="natsRetryDelay used to accelerate reconnect cycles")
+    parser.add_argument("--tolerance", action="append", metavar="METRIC=VALUE",
+                        help=f"Override allowed growth ({', '.join(DEFAULT_TOLERANCES)})")
+    parser.add_argument("--traceback-depth", type=int, default=1, help="tracemalloc frames per allocation")
+    parser.add_argument("--top", type=int, default=10, help="Top allocators to report")
+    parser.add_argument("--csv", help="Write samples to this CSV file")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args()
+
+    settings.natsRetryDelay = args.retry_delay
+    settings.natsEnabled = True
+    # Leave the control socket and event log of a starter running on this machine alone
+    settings.controlEnabled = False
+    settings.eventLogEnabled = False
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+
+    try:
+        result = asyncio.run(run(args))
+        sys.exit(0 if result else 1)
+    except KeyboardInterrupt:
+        logger.info("Soak test interrupted by user")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Acquisition Process Test
+Forks producers onto the shared-memory edge ring and checks that every edge
+arrives in order and once, also when the ring and its u32 index wrap around,
+that a lapped consumer counts what it lost, and that the real acquisition
+process delivers mock GPIO edges and keeps none of the parent's sockets.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import stat
+import sys
+import time
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+import acquisition_process
+from acquisition_process import AcquisitionProcess, EventRing, Wakeup, HEADER_FORMAT, INDEX_MASK
+from gpio_nats_logging import logger
+from gpio_nats_settings import settings
+
+TEST_PIN = 6
+FORK = multiprocessing.get_context('fork')
+original_main = acquisition_process._acquisition_main
+
+
+def check(name, ok, detail=""):
+    print(f"{'PASS' if ok else 'FAIL'} {name:16} {detail}")
+    return ok
+
+
+def start_index(ring, index):
+    """Move an unused ring's write and read index, e.g. to just before the u32 wrap."""
+    ring._write_index = ring.read_index = index
+    HEADER_FORMAT.pack_into(ring.buf, 0, index, ring.capacity)
+
+
+def wait_for_room(sequence, progress, window):
+    """Hold the producer while ``window`` records are unread, so the ring fills up but is never lapped."""
+    while sequence - progress.value >= window:
+        time.sleep(0.0002)
+
+
+def produce(ring, wakeup, count, progress, window):
+    """Producer process: write and announce ``count`` records (without flow control if window is 0)."""
+    for sequence in range(count):
+        if window:
+            wait_for_room(sequence, progress, window)
+        ring.write(sequence, TEST_PIN, sequence & 1)
+        wakeup.notify()
+    os._exit(0)
+
+
+async def consume(ring, wakeup, count, progress, timeout=10.0):
+    """Drain the ring on wakeups like AcquisitionProcess does, until ``count`` records or the timeout."""
+    loop = asyncio.get_running_loop()
+    records = []
+    done = asyncio.Event()
+
+    def drain():
+        records.extend(ring.read(wakeup.clear()))
+        progress.value = len(records) + ring.lost
+        if len(records) + ring.lost >= count:
+            done.set()
+
+    loop.add_reader(wakeup.read_fd, drain)
+    try:
+        await asyncio.wait_for(done.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        loop.remove_reader(wakeup.read_fd)
+    return records
+
+
+async def run_producer(count, capacity, first_index=0, flow_control=True):
+    ring = EventRing(capacity)
+    wakeup = Wakeup()
+    start_index(ring, first_index)
+    progress = FORK.Value('Q', 0, lock=False)
+    process = FORK.Process(target=produce, args=(ring, wakeup, count, progress,
+                                                 ring.capacity if flow_control else 0))
+    process.start()
+    if not flow_control:
+        # Let the producer run ahead before reading anything
+        process.join()
+    records = await consume(ring, wakeup, count, progress)
+    process.join()
+    lost = ring.lost
+    wakeup.close()
+    ring.close(unlink=True)
+    return records, lost
+
+
+def in_order(records, first=0):
+    return [t_ns for t_ns, _, _ in records] == list(range(first, first + len(records)))
+
+
+async def test_wrap(count, capacity):
+    # The producer keeps the ring as full as it can without lapping the consumer
+    records, lost = await run_producer(count, capacity)
+    return check("ring wrap", len(records) == count and not lost and in_order(records),
+                 f"{len(records)}/{count} records through a ring of {capacity}, lost {lost}")
+
+
+async def test_index_wrap(capacity):
+    count = 4 * capacity
+    first_index = INDEX_MASK + 1 - capacity - 3
+    records, lost = await run_producer(count, capacity, first_index)
+    return check("u32 index wrap", len(records) == count and not lost and in_order(records),
+                 f"{len(records)}/{count} records from index {first_index:#x}, lost {lost}")
+
+
+async def test_overrun(capacity):
+    count = 3 * capacity
+    records, lost = await run_producer(count, capacity, flow_control=False)
+    # The oldest records were overwritten; the newest full ring survives
+    ok = lost == count - capacity and len(records) == capacity and in_order(records, count - capacity)
+    return check("overrun", ok, f"{len(records)} newest records kept, {lost} counted lost")
+
+
+def inject_edges(ring, wakeup, stop_event, parent_pid, count, progress):
+    """Acquisition child with a thread toggling the mock GPIO pin once the handler is set up."""
+    import threading
+    from simple_gpio_handler import GPIO
+
+    def toggle():
+        while TEST_PIN not in GPIO.callbacks:
+            time.sleep(0.01)
+        for index in range(count):
+            wait_for_room(index, progress, ring.capacity)
+            GPIO.simulate_edge(TEST_PIN, (index + 1) & 1)
+
+    threading.Thread(target=toggle, daemon=True).start()
+    original_main(ring, wakeup, stop_event, parent_pid)
+
+
+def child_sockets(pid):
+    sockets = 0
+    for fd in os.listdir(f"/proc/{pid}/fd"):
+        try:
+            sockets += stat.S_ISSOCK(os.stat(f"/proc/{pid}/fd/{fd}").st_mode)
+        except OSError:
+            pass
+    return sockets
+
+
+async def test_process(count, capacity):
+    from simple_gpio_handler import GPIO
+
+    if not hasattr(GPIO, "simulate_edge"):
+        return check("process", False, "needs the mock GPIO backend (not available on a Raspberry Pi)")
+    settings.gpioPin = TEST_PIN
+    settings.gpioEdgeDetection = "BOTH"
+    settings.gpioSampling = False
+
+    edges = []
+    done = asyncio.Event()
+
+    progress = FORK.Value('Q', 0, lock=False)
+
+    def on_edge(t_ns, channel, level):
+        edges.append((t_ns, channel, level))
+        progress.value = len(edges)
+        if len(edges) >= count:
+            done.set()
+
+    # A socket open in the parent must not stay open in the child
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    acquisition_process._acquisition_main = lambda *args: inject_edges(*args, count, progress)
+    acquisition = AcquisitionProcess(on_edge, capacity)
+    try:
+        acquisition.start(asyncio.get_running_loop())
+        try:
+            await asyncio.wait_for(done.wait(), 10)
+        except asyncio.TimeoutError:
+            pass
+        sockets = child_sockets(acquisition.process.pid)
+        lost = acquisition.ring.lost
+    finally:
+        acquisition.stop()
+        acquisition_process._acquisition_main = original_main
+        listener.close()
+
+    times = [t_ns for t_ns, _, _ in edges]
+    levels = [level for _, _, level in edges]
+    ok = (len(edges) == count and not lost and times == sorted(times)
+          and levels == [(index + 1) & 1 for index in range(count)]
+          and all(channel == TEST_PIN for _, channel, _ in edges) and not sockets)
+    return check("process", ok, f"{len(edges)}/{count} edges through a ring of {capacity}, lost {lost}, "
+                                f"sockets in child {sockets}")
+
+
+async def run(args):
+    return [
+        await test_wrap(args.count, args.capacity),
+        await test_index_wrap(args.capacity),
+        await test_overrun(args.capacity),
+        await test_process(args.count, args.capacity),
+    ]
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Check the acquisition process and its shared-memory ring")
+    parser.add_argument("--count", type=int, default=2000, help="Edges per run")
+    parser.add_argument("--capacity", type=int, default=16, help="Ring capacity (rounded up to a power of two)")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+
+    results = asyncio.run(run(args))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
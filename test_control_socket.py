@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Control Socket Test
+Starts the application with its control socket and a stand-in NATS server and
+checks the JSON-lines protocol: status, counters, events, pause, fire and
+resume, pipelined requests, malformed and over-long lines, that the socket is
+created with mode 0660 whatever the umask, and that a file that is not a
+socket is never replaced.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import stat
+import sys
+import tempfile
+import time
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from control_socket import ControlServer, MAX_REQUEST_SIZE
+from gpio_nats_logging import logger
+from gpio_nats_settings import settings
+
+TEST_PIN = 6
+
+
+def check(name, ok, detail=""):
+    print(f"{'PASS' if ok else 'FAIL'} {name:16} {detail}")
+    return ok
+
+
+async def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+class Client:
+    """One control connection; requests can be written raw to test malformed input."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, path):
+        return cls(*await asyncio.open_unix_connection(path))
+
+    async def send(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def response(self):
+        line = await asyncio.wait_for(self.reader.readline(), 5)
+        return json.loads(line) if line else None
+
+    async def request(self, payload):
+        await self.send(json.dumps(payload).encode() + b"\n")
+        return await self.response()
+
+    def close(self):
+        self.writer.close()
+
+
+async def test_commands(client, app, server):
+    results = []
+    response = await client.request({"cmd": "status"})
+    result = response.get("result") or {}
+    results.append(check("status", response.get("ok") and result.get("pid") == os.getpid()
+                         and result.get("nats_connected") and not result.get("paused"),
+                         f"pid {result.get('pid')}, nats_connected {result.get('nats_connected')}"))
+
+    paused = await client.request({"cmd": "pause"})
+    fired = await client.request({"cmd": "fire", "pin": TEST_PIN})
+    await asyncio.sleep(0.3)
+    counters = await client.request({"cmd": "counters"})
+    held = counters["result"]["queue"]["depth"] if counters.get("ok") else None
+    results.append(check("pause and fire", paused == {"ok": True, "result": {"paused": True}}
+                         and fired.get("ok") and fired["result"]["paused"] and held == 1
+                         and not server.published,
+                         f"queue depth {held}, published {server.published} while paused"))
+
+    resumed = await client.request({"cmd": "resume"})
+    published = await wait_for(lambda: server.published == 1, 5)
+    counters = await client.request({"cmd": "counters"})
+    results.append(check("resume", resumed == {"ok": True, "result": {"paused": False}} and published
+                         and counters["result"]["published"] == 1,
+                         f"published {server.published}, counter {counters['result']['published']}"))
+
+    events = await client.request({"cmd": "events", "limit": 50})
+    names = [event["event"] for event in events.get("result", [])]
+    fire_event = next((event for event in events.get("result", []) if event["event"] == "test-fire"), {})
+    order = [name for name in names if name in ("paused", "test-fire", "resumed", "published")]
+    last = await client.request({"cmd": "events", "limit": 2})
+    results.append(check("events", events.get("ok") and order == ["paused", "test-fire", "resumed", "published"]
+                         and fire_event.get("channel") == TEST_PIN and len(last.get("result", [])) == 2,
+                         f"{names}"))
+    return results
+
+
+async def test_malformed(client, path):
+    results = []
+    cases = [
+        ("invalid JSON", b"{\"cmd\": \"status\"\n", "invalid JSON"),
+        ("not an object", b"[\"status\"]\n", "request must be a JSON object"),
+        ("unknown command", b"{\"cmd\": \"reboot\"}\n", "unknown command 'reboot'"),
+        ("missing command", b"{}\n", "unknown command 'None'"),
+        ("bad argument", b"{\"cmd\": \"fire\", \"pin\": \"six\"}\n", "invalid literal"),
+        ("unknown route", b"{\"cmd\": \"fire\", \"route\": \"nope\"}\n", "unknown route 'nope'"),
+    ]
+    for name, line, error in cases:
+        await client.send(line)
+        response = await client.response()
+        results.append(check(name, response is not None and response.get("ok") is False
+                             and error in response.get("error", ""), f"{response}"))
+
+    # Several requests in one write are answered in order, and an error does not end the connection
+    await client.send(b"{\"cmd\": \"status\"}\nnot json\n{\"cmd\": \"counters\"}\n")
+    responses = [await client.response() for _ in range(3)]
+    results.append(check("pipelined", [response.get("ok") for response in responses] == [True, False, True]
+                         and "uptime_s" in responses[0]["result"] and "published" in responses[2]["result"],
+                         f"ok flags {[response.get('ok') for response in responses]}"))
+
+    # An over-long line is refused and the connection closed; the server keeps serving others
+    long_client = await Client.connect(path)
+    await long_client.send(b"x" * (MAX_REQUEST_SIZE * 2) + b"\n")
+    response = await long_client.response()
+    closed = await long_client.response() is None
+    long_client.close()
+    status = await client.request({"cmd": "status"})
+    results.append(check("too long", response == {"ok": False, "error": "request too long"} and closed
+                         and status.get("ok"), f"{response}, closed {closed}"))
+    return results
+
+
+async def test_not_a_socket(directory):
+    path = os.path.join(directory, "regular-file")
+    with open(path, "w") as f:
+        f.write("keep")
+    control = ControlServer(path, {})
+    try:
+        await control.start()
+        started = True
+        await control.close()
+    except OSError:
+        started = False
+    with open(path) as f:
+        kept = f.read() == "keep"
+    return check("not a socket", not started and kept, f"started {started}, file kept {kept}")
+
+
+async def run(args):
+    settings.natsEnabled = True
+    settings.gpioEnabled = False
+    settings.gpioPin = TEST_PIN
+    settings.controlEnabled = True
+    settings.eventLogEnabled = False
+    settings.heartbeatEnabled = False
+    from main import GPIONATSSender
+    from nats_standin import StandInNATSServer
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "starter.ctl")
+        settings.controlSocket = path
+        server = StandInNATSServer()
+        await server.start()
+        app = GPIONATSSender()
+        app.nats_server = server.url
+        # A permissive umask must not widen the socket's mode
+        umask = os.umask(0)
+        try:
+            initialized = await app.initialize()
+        finally:
+            os.umask(umask)
+        if not initialized or app.control is None:
+            await server.stop()
+            return [check("start", False, "application or control socket did not start")]
+
+        results = []
+        client = None
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+            results.append(check("socket mode", mode == 0o660, f"{mode:#o} under umask 0"))
+            client = await Client.connect(path)
+            results += await test_commands(client, app, server)
+            results += await test_malformed(client, path)
+        finally:
+            if client:
+                client.close()
+            await app.cleanup()
+            await server.stop()
+        results.append(check("removed", not os.path.exists(path), "socket removed on cleanup"))
+        results.append(await test_not_a_socket(directory))
+    return results
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Check the control socket's JSON-lines protocol")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+
+    results = asyncio.run(run(args))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
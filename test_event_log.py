@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Event Log Test
+Writes events into a temporary event log with a controlled wall clock and
+checks segment rotation, compression and pruning, the time-range queries of
+event_log_query.py, a wall clock stepping back, and segment numbering across
+restarts.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from gpio_nats_logging import logger
+from event_log import EventLog, HEADER_FORMAT, RECORD_FORMAT, EVENT_CODES, list_segments, segment_sequence
+from event_log_query import iter_records, read_head
+
+# Around 2026-09-21, in nanoseconds
+BASE_NS = 1_790_000_000 * 10**9
+SECOND_NS = 10**9
+
+
+class SteppedClock:
+    """Wall clock for the log under test, set by the test."""
+
+    def __init__(self, t_ns):
+        self.t_ns = t_ns
+
+    def __call__(self):
+        return self.t_ns
+
+
+def check(name, ok, detail=""):
+    print(f"{'PASS' if ok else 'FAIL'} {name:14} {detail}")
+    return ok
+
+
+def write_events(directory, clock, times_ns, **options):
+    """Log one published event per timestamp and close the log; returns it."""
+    async def write():
+        log = EventLog(directory, clock=clock, **options)
+        log.start(asyncio.get_running_loop())
+        for index, t_ns in enumerate(times_ns):
+            clock.t_ns = t_ns
+            log.record("published", 6, "default", 0, (index % 100) * 1000)
+        log.close()
+        return log
+    return asyncio.run(write())
+
+
+def query(directory, since_ns, until_ns):
+    return [record[0] for record in iter_records(directory, since_ns, until_ns)]
+
+
+def test_rotation(count, segment_records):
+    directory = tempfile.mkdtemp(prefix="dunebugger-events-")
+    times = [BASE_NS + index * 10**7 for index in range(count)]
+    log = write_events(directory, SteppedClock(BASE_NS), times, batch_size=16, keep_segments=count,
+                       segment_size=HEADER_FORMAT.size + segment_records * RECORD_FORMAT.size)
+    segments = list_segments(directory)
+    sequences = [segment_sequence(path) for path in segments]
+    # Closed segments are compressed when the compressor is free; the rest at the next rotation
+    compressed = sum(path.endswith(".gz") for path in segments)
+    found = query(directory, 0, BASE_NS * 2)
+    middle = query(directory, times[count // 4], times[3 * count // 4])
+    ok = (sequences == list(range(len(segments))) and len(segments) == log.segments
+          and compressed and sorted(found) == times
+          and middle == times[count // 4:3 * count // 4])
+    return check("rotation", ok, f"{count} events in {len(segments)} segments ({compressed} compressed), "
+                                 f"found {len(found)}, range query {len(middle)}/{count // 2}")
+
+
+def test_pruning(count, segment_records, keep):
+    directory = tempfile.mkdtemp(prefix="dunebugger-events-")
+    times = [BASE_NS + index * 10**7 for index in range(count)]
+    write_events(directory, SteppedClock(BASE_NS), times, batch_size=16, keep_segments=keep,
+                 segment_size=HEADER_FORMAT.size + segment_records * RECORD_FORMAT.size)
+    segments = list_segments(directory)
+    found = sorted(query(directory, 0, BASE_NS * 2))
+    # The newest segments are kept, so what remains is the end of the run
+    ok = len(segments) <= keep + 1 and found and found == times[-len(found):]
+    return check("pruning", ok, f"{len(segments)} segments kept (keep {keep}), newest {len(found)} events remain")
+
+
+def test_clock_step():
+    directory = tempfile.mkdtemp(prefix="dunebugger-events-")
+    # 100 events a second apart, then the clock is set back by an hour (an NTP correction)
+    before = [BASE_NS + index * SECOND_NS for index in range(100)]
+    after = [BASE_NS - 3600 * SECOND_NS + index * SECOND_NS for index in range(100)]
+    log = write_events(directory, SteppedClock(BASE_NS), before + after, batch_size=32)
+    segments = list_segments(directory)
+    heads = [read_head(path) for path in segments]
+    late = query(directory, before[50], before[-1] + 1)
+    early = query(directory, after[10], after[20])
+    everything = query(directory, after[0], before[-1] + 1)
+    ok = (log.clock_steps == 1 and len(segments) == 2 and heads[1][0] == before[-1]
+          and late == before[50:] and early == after[10:20] and len(everything) == 200)
+    return check("clock step", ok, f"{len(segments)} segments, steps {log.clock_steps}, "
+                                   f"queries {len(late)}/50, {len(early)}/10, {len(everything)}/200")
+
+
+def test_restart():
+    directory = tempfile.mkdtemp(prefix="dunebugger-events-")
+    first = [BASE_NS + index * SECOND_NS for index in range(10)]
+    second = [first[-1] + (index + 1) * SECOND_NS for index in range(10)]
+    write_events(directory, SteppedClock(first[0]), first)
+    write_events(directory, SteppedClock(second[0]), second)
+    segments = list_segments(directory)
+    heads = [read_head(path) for path in segments]
+    stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(second[0] / 1e9))
+    ok = ([segment_sequence(path) for path in segments] == [0, 1] and heads[1][0] == first[-1]
+          and stamp in os.path.basename(segments[1]) and query(directory, 0, BASE_NS * 2) == first + second)
+    return check("restart", ok, ", ".join(os.path.basename(path) for path in segments))
+
+
+def test_event_codes():
+    directory = tempfile.mkdtemp(prefix="dunebugger-events-")
+
+    async def write():
+        log = EventLog(directory)
+        log.start(asyncio.get_running_loop())
+        for event in ("queued", "coalesced", "published", "cancelled", "overflow"):
+            log.record(event, 6, "default/2", 1, 2500, 3)
+        log.close()
+    asyncio.run(write())
+    records = list(iter_records(directory, 0, time.time_ns() + SECOND_NS))
+    events = [record[5] for record in records]
+    expected = [EVENT_CODES[name] for name in ("queued", "coalesced", "published", "cancelled", "overflow")]
+    ok = events == expected and all(record[1] == 2 and record[3] == 3 and record[4] == 6 for record in records)
+    return check("records", ok, f"{len(records)} records read back")
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Check event log rotation, queries and clock steps")
+    parser.add_argument("--events", type=int, default=2000, help="Events for the rotation checks")
+    parser.add_argument("--segment-records", type=int, default=300, help="Records per segment")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+
+    results = [
+        test_rotation(args.events, args.segment_records),
+        test_pruning(args.events, args.segment_records, 3),
+        test_clock_step(),
+        test_restart(),
+        test_event_codes(),
+    ]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
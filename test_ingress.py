@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Trigger Ingress Test
+Sends trigger datagrams to the network ingress on localhost and checks the
+UDP allow-list and tokens (also for IPv4 senders on a dual-stack socket), the
+Unix socket token, duplicate and replayed sequence numbers per sender,
+malformed datagrams, batched draining and that sockets are closed when setup
+fails.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import sys
+import tempfile
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from gpio_nats_logging import logger
+from trigger_ingress import TriggerIngress, encode_trigger, parse_allowlist
+
+TOKEN = 0x1F2E3D4C
+
+
+def check(name, ok, detail=""):
+    print(f"{'PASS' if ok else 'FAIL'} {name:16} {detail}")
+    return ok
+
+
+async def receive(ingress, sender, address, datagrams):
+    """Send datagrams and let the loop drain them; return the accepted triggers."""
+    accepted = []
+    ingress.trigger_callback = lambda channel, pulse, source: accepted.append((channel, pulse))
+    for datagram in datagrams:
+        sender.sendto(datagram, address)
+    await asyncio.sleep(0.1)
+    return accepted
+
+
+async def start_udp(allowlist="", batch_size=32, bind="127.0.0.1:0"):
+    ingress = TriggerIngress(None, udp_bind=bind, allowlist=parse_allowlist(allowlist),
+                             batch_size=batch_size)
+    ingress.start(asyncio.get_running_loop())
+    return ingress, ingress.sockets[0].getsockname()
+
+
+async def test_allowlist(sender):
+    results = []
+    ingress, address = await start_udp("10.0.0.0/8")
+    accepted = await receive(ingress, sender, address, [encode_trigger(6)])
+    results.append(check("allow-list", not accepted and ingress.rejected == 1,
+                         f"127.0.0.1 outside 10.0.0.0/8: accepted {len(accepted)}, rejected {ingress.rejected}"))
+    ingress.close()
+
+    ingress, address = await start_udp(f"127.0.0.0/8={TOKEN:x}")
+    accepted = await receive(ingress, sender, address, [
+        encode_trigger(6, sequence=1),
+        encode_trigger(6, sequence=2, token=TOKEN + 1),
+        encode_trigger(7, "double", sequence=3, token=TOKEN),
+    ])
+    results.append(check("udp token", accepted == [(7, "double")] and ingress.rejected == 2,
+                         f"accepted {accepted}, rejected {ingress.rejected}"))
+    ingress.close()
+    return all(results)
+
+
+async def test_unix_token():
+    path = os.path.join(tempfile.mkdtemp(prefix="dunebugger-ingress-"), "trigger.sock")
+    ingress = TriggerIngress(None, unix_path=path, unix_token=TOKEN)
+    ingress.start(asyncio.get_running_loop())
+    sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        accepted = await receive(ingress, sender, path, [
+            encode_trigger(6, sequence=1),
+            encode_trigger(6, "long", sequence=2, token=TOKEN),
+        ])
+    finally:
+        sender.close()
+        ingress.close()
+    return check("unix token", accepted == [(6, "long")] and ingress.rejected == 1 and not os.path.exists(path),
+                 f"accepted {accepted}, rejected {ingress.rejected}")
+
+
+async def test_dual_stack(sender):
+    try:
+        ingress, address = await start_udp(f"127.0.0.0/8={TOKEN:x}", bind="[::]:0")
+    except OSError as e:
+        return check("dual stack", True, f"skipped, no IPv6 socket: {e}")
+    # The IPv4 sender arrives as ::ffff:127.0.0.1
+    accepted = await receive(ingress, sender, ("127.0.0.1", address[1]), [encode_trigger(6, token=TOKEN)])
+    ingress.close()
+    return check("dual stack", accepted == [(6, None)] and ingress.rejected == 0,
+                 f"accepted {accepted}, rejected {ingress.rejected}")
+
+
+async def test_unix_senders():
+    directory = tempfile.mkdtemp(prefix="dunebugger-ingress-")
+    path = os.path.join(directory, "trigger.sock")
+    ingress = TriggerIngress(None, unix_path=path)
+    ingress.start(asyncio.get_running_loop())
+    # Two unbound senders, one numbering from the clock like send_trigger.py and one from 1
+    clock_sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    counter_sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    bound_sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    bound_sender.bind(os.path.join(directory, "sender.sock"))
+    try:
+        accepted = await receive(ingress, clock_sender, path, [encode_trigger(1, sequence=1_790_000_000)])
+        accepted += await receive(ingress, counter_sender, path, [encode_trigger(2, sequence=1),
+                                                                  encode_trigger(3, sequence=2)])
+        # A bound sender has an address, so its repeats are still caught
+        accepted += await receive(ingress, bound_sender, path, [encode_trigger(4, sequence=7),
+                                                                encode_trigger(5, sequence=7)])
+    finally:
+        for sock in (clock_sender, counter_sender, bound_sender):
+            sock.close()
+        ingress.close()
+    channels = [channel for channel, _ in accepted]
+    return check("unix senders", channels == [1, 2, 3, 4] and ingress.duplicates == 1,
+                 f"accepted channels {channels}, duplicates {ingress.duplicates}")
+
+
+async def test_sequence(sender):
+    ingress, address = await start_udp()
+    accepted = await receive(ingress, sender, address, [
+        encode_trigger(1, sequence=10),
+        encode_trigger(2, sequence=10),          # repeated
+        encode_trigger(3, sequence=9),           # replayed older datagram
+        encode_trigger(4, sequence=11),
+        encode_trigger(5, sequence=0),           # unnumbered sender, always accepted
+        encode_trigger(6, sequence=0xFFFFFFFF),
+        encode_trigger(7, sequence=0x00000001),  # wrapped around
+        b"DB\x01",                               # truncated
+        b"XX" + encode_trigger(8)[2:],           # wrong magic
+    ])
+    ingress.close()
+    channels = [channel for channel, _ in accepted]
+    return check("sequence", channels == [1, 4, 5, 6, 7] and ingress.duplicates == 2 and ingress.malformed == 2,
+                 f"accepted channels {channels}, duplicates {ingress.duplicates}, malformed {ingress.malformed}")
+
+
+async def test_batches(sender, count):
+    ingress, address = await start_udp(batch_size=8)
+    # Queue every datagram before the loop gets to read any of them
+    loop = asyncio.get_running_loop()
+    loop.remove_reader(ingress.sockets[0].fileno())
+    accepted = await receive(ingress, sender, address, [encode_trigger(6) for _ in range(count)])
+    loop.add_reader(ingress.sockets[0].fileno(), ingress._drain, ingress.sockets[0], ingress._check_udp_source)
+    await asyncio.sleep(0.1)
+    ingress.close()
+    return check("batch drain", len(accepted) == count and ingress.batches >= count // 8,
+                 f"accepted {len(accepted)}/{count} in {ingress.batches} reads of up to 8")
+
+
+async def test_failed_bind():
+    before = len(os.listdir("/proc/self/fd"))
+    ingress = TriggerIngress(None, udp_bind="192.0.2.1:5005")
+    failed = False
+    after = None
+    try:
+        ingress.start(asyncio.get_running_loop())
+    except OSError:
+        # Counted while the traceback still references the socket, so only an explicit close shows
+        failed = True
+        after = len(os.listdir("/proc/self/fd"))
+    return check("failed bind", failed and after == before and not ingress.sockets,
+                 f"open descriptors {before} -> {after}")
+
+
+async def run(args):
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        return [
+            await test_allowlist(sender),
+            await test_dual_stack(sender),
+            await test_unix_token(),
+            await test_unix_senders(),
+            await test_sequence(sender),
+            await test_batches(sender, args.count),
+            await test_failed_bind(),
+        ]
+    finally:
+        sender.close()
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Check the network trigger ingress")
+    parser.add_argument("--count", type=int, default=100, help="Datagrams for the batch drain check")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+
+    results = asyncio.run(run(args))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
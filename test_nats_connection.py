@@ -14,6 +14,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
 from gpio_nats_logging import logger
 from gpio_nats_settings import settings
 from simple_nats_client import SimpleNATSClient
+from nats_security import security_options
 
 
 async def test_nats_connection():
@@ -41,7 +42,8 @@ async def test_nats_connection():
         client_id=client_id,
         connection_timeout=timeout,
         max_retries=max_retries,
-        retry_delay=retry_delay
+        retry_delay=retry_delay,
+        **security_options(settings)
     )
     
     # Test connection
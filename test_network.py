@@ -1,161 +1,139 @@
 #!/usr/bin/env python3
 """
 Network Connectivity Test Utility
-Test basic network connectivity to the NATS server.
+Test basic network connectivity to the NATS servers. All servers are probed
+concurrently: DNS resolution, ping, TCP connect time and NATS PING round trips.
 """
 
-import socket
+import argparse
+import asyncio
+import json
 import sys
 import os
-import subprocess
-import time
+import re
 
 # Add the app directory to the path so we can import our modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
 
 from gpio_nats_logging import logger
 from gpio_nats_settings import settings
+from network_diagnostics import DNSCache, parse_nats_url, probe_servers, split_servers
 
 
-def parse_nats_url(nats_url):
-    """Parse NATS URL to extract host and port."""
-    try:
-        # Remove protocol if present
-        if '://' in nats_url:
-            url_parts = nats_url.split('://', 1)[1]
-        else:
-            url_parts = nats_url
-        
-        # Extract host and port
-        if ':' in url_parts:
-            host, port_str = url_parts.rsplit(':', 1)
-            port = int(port_str)
-        else:
-            host = url_parts
-            port = 4222  # Default NATS port
-        
-        return host, port
-    except Exception as e:
-        logger.error(f"Failed to parse NATS URL '{nats_url}': {e}")
-        return None, None
-
-
-def test_tcp_connection(host, port, timeout=5):
-    """Test TCP connection to host:port."""
-    try:
-        logger.info(f"Testing TCP connection to {host}:{port} (timeout: {timeout}s)...")
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(timeout)
-        start_time = time.time()
-        result = sock.connect_ex((host, port))
-        end_time = time.time()
-        sock.close()
-        
-        if result == 0:
-            logger.info(f"✅ TCP connection successful! ({end_time - start_time:.2f}s)")
-            return True
-        else:
-            logger.error(f"❌ TCP connection failed with error code: {result}")
-            return False
-    except socket.timeout:
-        logger.error(f"❌ TCP connection timed out after {timeout}s")
-        return False
-    except Exception as e:
-        logger.error(f"❌ TCP connection error: {e}")
-        return False
-
-
-def test_dns_resolution(host):
-    """Test DNS resolution for the host."""
-    try:
-        logger.info(f"Testing DNS resolution for '{host}'...")
-        ip_address = socket.gethostbyname(host)
-        logger.info(f"✅ DNS resolution successful: {host} -> {ip_address}")
-        return ip_address
-    except socket.gaierror as e:
-        logger.error(f"❌ DNS resolution failed: {e}")
-        return None
-    except Exception as e:
-        logger.error(f"❌ DNS resolution error: {e}")
-        return None
-
-
-def test_ping(host, count=3):
+async def test_ping(host, count=3):
     """Test ping connectivity to the host."""
     try:
-        logger.info(f"Testing ping to '{host}' ({count} packets)...")
-        result = subprocess.run(
-            ['ping', '-c', str(count), '-W', '3', host],
-            capture_output=True,
-            text=True,
-            timeout=15
+        process = await asyncio.create_subprocess_exec(
+            'ping', '-c', str(count), '-W', '3', host,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
         )
-        
-        if result.returncode == 0:
-            # Extract ping statistics
-            lines = result.stdout.strip().split('\\n')
-            stats_line = [line for line in lines if 'packets transmitted' in line]
-            if stats_line:
-                logger.info(f"✅ Ping successful: {stats_line[0]}")
-            else:
-                logger.info("✅ Ping successful!")
-            return True
-        else:
-            logger.error(f"❌ Ping failed: {result.stderr.strip()}")
-            return False
-    except subprocess.TimeoutExpired:
-        logger.error("❌ Ping timed out")
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=15)
+    except asyncio.TimeoutError:
+        process.kill()
+        logger.error(f"❌ Ping to {host} timed out")
         return False
     except FileNotFoundError:
         logger.warning("⚠️ Ping command not available")
         return None
-    except Exception as e:
-        logger.error(f"❌ Ping error: {e}")
+
+    if process.returncode == 0:
+        # Extract ping statistics
+        summary = re.search(r"rtt [^=]+= ([\d.]+)/([\d.]+)/([\d.]+)", stdout.decode())
+        if summary:
+            logger.info(f"✅ Ping {host}: min {summary.group(1)}ms  avg {summary.group(2)}ms  max {summary.group(3)}ms")
+        else:
+            logger.info(f"✅ Ping {host} successful!")
+        return True
+    lines = (stderr or stdout).decode().strip().splitlines()
+    logger.error(f"❌ Ping to {host} failed: {lines[-1] if lines else 'no reply'}")
+    return False
+
+
+def report(result):
+    """Log the probe result of one server; returns True if it is usable."""
+    logger.info("-" * 50)
+    logger.info(f"Server: {result.url}")
+    if result.endpoint is None:
+        logger.error(f"❌ Invalid URL: {result.error}")
+        return False
+    logger.info(f"Target: {result.endpoint.host} port {result.endpoint.port}")
+    if not result.addresses:
+        logger.error(f"❌ {result.error}")
+        return False
+    addresses = ", ".join(sockaddr[0] for _, sockaddr in result.addresses)
+    logger.info(f"✅ DNS resolution ({result.dns_ms:.1f}ms): {result.endpoint.host} -> {addresses}")
+    if result.reachable:
+        logger.info(f"✅ TCP connect: {result.tcp}")
+    else:
+        logger.error(f"❌ {result.error}")
         return False
+    if result.server_info and result.server_info.get("tls_required"):
+        logger.warning("⚠️ Server requires TLS, NATS PING not measured")
+    elif result.nats.count:
+        server = result.server_info or {}
+        logger.info(f"✅ NATS PING: {result.nats}  (server {server.get('server_name', '?')} {server.get('version', '')})")
+    elif result.error:
+        logger.error(f"❌ {result.error}")
+        return False
+    return True
 
 
-def main():
-    """Main entry point."""
+async def run(args):
+    servers = args.server or split_servers(getattr(settings, 'natsServer', 'nats://localhost:4222'))
     logger.info("Network Connectivity Test")
     logger.info("=" * 50)
-    
-    # Get NATS server from settings
-    nats_server = getattr(settings, 'natsServer', 'nats://localhost:4222')
-    logger.info(f"NATS Server: {nats_server}")
-    
-    # Parse the NATS URL
-    host, port = parse_nats_url(nats_server)
-    if not host or not port:
-        logger.error("Failed to parse NATS server URL")
-        sys.exit(1)
-    
-    logger.info(f"Target: {host}:{port}")
-    logger.info("-" * 50)
-    
-    # Test DNS resolution
-    ip_address = test_dns_resolution(host)
-    
-    # Test ping (if available)
-    ping_result = test_ping(host)
-    
-    # Test TCP connection
-    tcp_result = test_tcp_connection(host, port)
-    
+    logger.info(f"NATS Servers: {', '.join(servers)}")
+    logger.info(f"Samples: {args.samples}, timeout: {args.timeout}s")
+
+    hosts = set()
+    for server in servers:
+        try:
+            hosts.add(parse_nats_url(server).host)
+        except ValueError:
+            pass
+
+    # ICMP ping runs alongside the TCP and NATS probes
+    pings = [] if args.no_ping else [test_ping(host) for host in sorted(hosts)]
+    outcome = await asyncio.gather(
+        probe_servers(servers, DNSCache(), args.samples, args.timeout, nats_ping=not args.no_nats_ping),
+        *pings
+    )
+    results = outcome[0]
+
+    if args.json:
+        print(json.dumps([result.as_dict() for result in results], indent=2))
+        return any(result.reachable for result in results)
+
+    usable = [report(result) for result in results]
+
     # Summary
     logger.info("=" * 50)
     logger.info("Test Summary:")
-    logger.info(f"DNS Resolution: {'✅ OK' if ip_address else '❌ Failed'}")
-    logger.info(f"Ping: {'✅ OK' if ping_result else '❌ Failed' if ping_result is False else '⚠️ N/A'}")
-    logger.info(f"TCP Connection: {'✅ OK' if tcp_result else '❌ Failed'}")
-    
+    for result, ok in zip(results, usable):
+        logger.info(f"{result.url}: {'✅ OK' if ok else '❌ Failed'}")
+    return any(usable)
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Test network connectivity to the NATS servers")
+    parser.add_argument("--server", action="append", help="NATS server URL (repeatable; default: natsServer)")
+    parser.add_argument("--samples", type=int, default=5, help="TCP connects and NATS PINGs per server")
+    parser.add_argument("--timeout", type=float, default=3.0, help="Timeout per probe in seconds")
+    parser.add_argument("--no-ping", action="store_true", help="Skip the ICMP ping")
+    parser.add_argument("--no-nats-ping", action="store_true", help="Only measure TCP connects")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
     # Overall result
-    if tcp_result:
+    if asyncio.run(run(args)):
         logger.info("🎉 Network connectivity test PASSED")
-        logger.info("The NATS server appears to be reachable.")
+        logger.info("At least one NATS server appears to be reachable.")
         sys.exit(0)
     else:
         logger.error("💥 Network connectivity test FAILED")
-        logger.error("The NATS server is not reachable. Check:")
+        logger.error("No NATS server is reachable. Check:")
         logger.error("  1. Network connectivity")
         logger.error("  2. NATS server is running")
         logger.error("  3. Firewall settings")
@@ -164,4 +142,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
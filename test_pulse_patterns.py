@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Press Pattern Test
+Drives the mock GPIO backend with press sequences through the application in
+both-edges mode and checks the pulse classes it queues (short, double, triple,
+long, hold, a short press followed by a long one, and a glitch shorter than the
+debounce time) and when they are sent.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from gpio_nats_logging import logger
+from gpio_nats_settings import settings
+
+TEST_PIN = 6
+
+# Scenario name -> (presses as (down ms, up ms), expected pulses as (ms, class)), with
+# pulseLongPress 0.8s, pulseMultiPressWindow 0.4s, pulseHoldDelay 1.5s, pulseHoldInterval 0.5s
+SCENARIOS = {
+    "short": ([(0, 100)], [(500, "short")]),
+    "double": ([(0, 100), (250, 350)], [(750, "double")]),
+    "triple": ([(0, 100), (250, 350), (500, 600)], [(600, "triple")]),
+    "long": ([(0, 1000)], [(800, "long")]),
+    "hold": ([(0, 2600)], [(800, "long"), (1500, "hold"), (2000, "hold"), (2500, "hold")]),
+    "short-then-long": ([(0, 100), (300, 2000)], [(1100, "short"), (1100, "long"), (1800, "hold")]),
+    # Released again within pulseDebounce (20ms): no press at all, so no long press later
+    "glitch": ([(0, 5)], []),
+    "glitch-then-short": ([(0, 5), (200, 300)], [(700, "short")]),
+}
+
+
+async def run_scenario(name, app, gpio, args):
+    presses, expected = SCENARIOS[name]
+    edges = sorted([(down, 1) for down, _ in presses] + [(up, 0) for _, up in presses])
+    app.events.clear()
+    t0 = time.time()
+    loop_t0 = time.monotonic()
+    for at, level in edges:
+        await asyncio.sleep(max(0.0, loop_t0 + at / 1000.0 - time.monotonic()))
+        gpio.simulate_edge(TEST_PIN, level)
+    # Let the multi-press window of the last release and a long press deadline run out
+    await asyncio.sleep(1.0)
+
+    pulses = [(round((timestamp - t0) * 1000), detail) for timestamp, event, _, detail in app.events
+              if event == "queued"]
+    ok = len(pulses) == len(expected) and all(
+        pulse == expected_pulse and abs(at - expected_at) <= args.tolerance_ms
+        for (at, pulse), (expected_at, expected_pulse) in zip(pulses, expected)
+    )
+    print(f"{'PASS' if ok else 'FAIL'} {name:17} "
+          + (", ".join(f"{pulse} at {at}ms" for at, pulse in pulses) or "no pulses"))
+    if not ok:
+        print(f"     expected " + (", ".join(f"{pulse} at {at}ms" for at, pulse in expected) or "no pulses"))
+    return ok
+
+
+async def run(args):
+    settings.natsEnabled = False
+    settings.gpioEnabled = True
+    settings.gpioAcquisitionProcess = False
+    settings.gpioSampling = False
+    settings.gpioPin = TEST_PIN
+    settings.gpioEdgeDetection = "BOTH"
+    settings.controlEnabled = False
+    settings.eventLogEnabled = False
+    settings.heartbeatEnabled = False
+    settings.pulseLongPress = 0.8
+    settings.pulseMultiPressWindow = 0.4
+    settings.pulseHoldDelay = 1.5
+    settings.pulseHoldInterval = 0.5
+    settings.pulseDebounce = 0.02
+    for pulse in ("Short", "Double", "Triple", "Long", "Hold"):
+        setattr(settings, f"pulse{pulse}Message", pulse.lower())
+        setattr(settings, f"cue{pulse}Sequence", "")
+
+    from main import GPIONATSSender
+    from simple_gpio_handler import GPIO
+
+    if not hasattr(GPIO, "simulate_edge"):
+        print("Press patterns need the mock GPIO backend (not available on a Raspberry Pi)")
+        return False
+    app = GPIONATSSender()
+    if not await app.initialize():
+        print("Application did not initialize")
+        return False
+    try:
+        return [await run_scenario(name, app, GPIO, args) for name in (args.scenario or SCENARIOS)]
+    finally:
+        await app.cleanup()
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Check press pattern recognition with the mock GPIO backend")
+    parser.add_argument("--scenario", choices=list(SCENARIOS), action="append",
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--tolerance-ms", type=float, default=50.0, help="Allowed timing error of a pulse")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+
+    results = asyncio.run(run(args))
+    sys.exit(0 if results and all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
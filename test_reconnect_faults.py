@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Reconnect Fault-Injection Test
+Runs the application against a local NATS stand-in behind a fault-injecting
+proxy and reports, per scenario, how long it takes to recover and how many
+triggers were lost or delayed.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from gpio_nats_logging import logger
+from gpio_nats_settings import settings
+from main import GPIONATSSender
+from trigger_routes import Route
+from nats_standin import StandInNATSServer, FaultProxy
+
+TEST_SUBJECT = "dunebugger.test.recovery"
+
+# Each scenario is a schedule of (seconds after start, action, parameters)
+SCENARIOS = {
+    "latency": [
+        (3.0, "latency", {"latency": 0.2, "jitter": 0.1}),
+        (13.0, "clear", {}),
+    ],
+    "packet-loss": [
+        (3.0, "drop", {"rate": 0.3, "retransmit_timeout": 0.2}),
+        (13.0, "clear", {}),
+    ],
+    "rst": [
+        (3.0, "rst", {}),
+    ],
+    "blackhole": [
+        (3.0, "blackhole", {}),
+        (13.0, "clear", {}),
+    ],
+    "server-restart": [
+        (3.0, "restart", {"downtime": 3.0}),
+    ],
+}
+
+
+class ScenarioResult:
+    """Measurements collected for a single scenario run."""
+
+    def __init__(self, name):
+        self.name = name
+        self.fault_start = None
+        self.fault_end = None
+        self.transitions = []
+        self.fired = {}
+        self.delivered = {}
+
+    def disconnected_at(self):
+        for timestamp, connected in self.transitions:
+            if not connected and timestamp >= self.fault_start:
+                return timestamp
+        return None
+
+    def reconnected_at(self):
+        disconnect = self.disconnected_at()
+        if disconnect is None:
+            return None
+        for timestamp, connected in self.transitions:
+            if connected and timestamp > disconnect:
+                return timestamp
+        return None
+
+    def first_delivery_after_fault(self):
+        after = [t for t in self.delivered.values() if t >= self.fault_end]
+        return min(after) if after else None
+
+
+async def run_scenario(name, schedule, duration, interval):
+    """Run one fault scenario end to end and return its measurements."""
+    result = ScenarioResult(name)
+    server = StandInNATSServer()
+    await server.start()
+    proxy = FaultProxy(server.host, server.port)
+    await proxy.start()
+
+    def on_publish(subject, payload, headers, t_ns):
+        if subject == TEST_SUBJECT:
+            body = payload.decode()
+            marker = body.find('#')
+            if marker != -1:
+                seq = int(body[marker + 1:body.index('"', marker)])
+                result.delivered.setdefault(seq, t_ns / 1e9)
+
+    server.on_publish = on_publish
+
+    app = GPIONATSSender()
+    app.nats_server = proxy.url
+    app.nats_subject = TEST_SUBJECT
+    app_task = asyncio.create_task(app.run())
+
+    # Wait for the initial connection before starting the clock
+    deadline = time.monotonic() + 15
+    while not (app.nats_client and app.nats_client.get_connection_status()):
+        if time.monotonic() > deadline:
+            logger.error(f"Scenario {name}: initial connection never established")
+            break
+        await asyncio.sleep(0.05)
+
+    start = time.monotonic()
+    stop_event = asyncio.Event()
+
+    async def monitor():
+        connected = None
+        while not stop_event.is_set():
+            status = bool(app.nats_client and app.nats_client.get_connection_status())
+            if status != connected:
+                result.transitions.append((time.monotonic(), status))
+                connected = status
+            await asyncio.sleep(0.01)
+
+    async def inject():
+        for offset, action, params in schedule:
+            await asyncio.sleep(max(0.0, start + offset - time.monotonic()))
+            now = time.monotonic()
+            if result.fault_start is None:
+                result.fault_start = now
+            if action == "latency":
+                proxy.set_latency(params["latency"], params.get("jitter", 0.0))
+            elif action == "drop":
+                proxy.set_drop_rate(params["rate"], params.get("retransmit_timeout", 0.2))
+            elif action == "blackhole":
+                proxy.set_blackhole(True)
+            elif action == "rst":
+                proxy.reset_connections()
+            elif action == "restart":
+                await server.restart(params.get("downtime", 0.0))
+            elif action == "clear":
+                proxy.clear_faults()
+            result.fault_end = time.monotonic()
+            logger.debug(f"Scenario {name}: applied '{action}' at +{now - start:.2f}s")
+
+    async def fire():
+        seq = 0
+        base_message = app.nats_message
+        while not stop_event.is_set():
+            # A unique route per trigger tags the message body with its sequence number
+            route = Route("recovery", TEST_SUBJECT, f"{base_message}#{seq}", app.default_route.lane)
+            result.fired[seq] = time.monotonic()
+            app.submit_trigger(getattr(settings, 'gpioPin', 6), route)
+            seq += 1
+            await asyncio.sleep(interval)
+
+    tasks = [asyncio.create_task(monitor()), asyncio.create_task(inject()), asyncio.create_task(fire())]
+    await asyncio.sleep(duration)
+    stop_event.set()
+    # Give in-flight triggers a moment to land before tearing everything down
+    await asyncio.sleep(1.0)
+    app.running = False
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.wait_for(app_task, timeout=30)
+    await proxy.stop()
+    await server.stop()
+    return result
+
+
+def report(result, delay_threshold):
+    """Print a summary of one scenario."""
+    latencies = [result.delivered[seq] - fired for seq, fired in result.fired.items() if seq in result.delivered]
+    lost = len(result.fired) - len(latencies)
+    delayed = sum(1 for latency in latencies if latency > delay_threshold)
+    disconnect = result.disconnected_at()
+    reconnect = result.reconnected_at()
+    first_delivery = result.first_delivery_after_fault()
+
+    print(f"Scenario: {result.name}")
+    if disconnect is None:
+        print("  Disconnect detected:   no")
+    else:
+        print(f"  Disconnect detected:   {disconnect - result.fault_start:.2f}s after fault start")
+    if reconnect is not None:
+        print(f"  Time to reconnect:     {max(0.0, reconnect - result.fault_end):.2f}s after fault cleared")
+    elif disconnect is not None:
+        print("  Time to reconnect:     did not reconnect")
+    if first_delivery is not None:
+        print(f"  First delivery:        {first_delivery - result.fault_end:.2f}s after fault cleared")
+    print(f"  Triggers fired:        {len(result.fired)}")
+    print(f"  Triggers lost:         {lost}")
+    print(f"  Triggers delayed:      {delayed} (> {delay_threshold:.2f}s)")
+    if latencies:
+        print(f"  Latency p50/max:       {statistics.median(latencies) * 1000:.1f}ms / {max(latencies) * 1000:.1f}ms")
+    return lost == 0 or reconnect is not None or disconnect is None
+
+
+async def run(args):
+    names = args.scenario or list(SCENARIOS)
+    all_recovered = True
+    for name in names:
+        result = await run_scenario(name, SCENARIOS[name], args.duration, args.interval)
+        all_recovered = report(result, args.delay_threshold) and all_recovered
+    return all_recovered
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Measure NATS recovery time under injected network faults")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--duration", type=float, default=40.0, help="Seconds to run each scenario")
+    parser.add_argument("--interval", type=float, default=0.25, help="Seconds between triggers")
+    parser.add_argument("--delay-threshold", type=float, default=0.5,
+                        help="Delivery latency above which a trigger counts as delayed")
+    parser.add_argument("--retry-delay", type=int, help="Override natsRetryDelay")
+    parser.add_argument("--timeout", type=int, help="Override natsTimeout")
+    parser.add_argument("--max-retries", type=int, help="Override natsMaxRetries")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args()
+
+    if args.retry_delay is not None:
+        settings.natsRetryDelay = args.retry_delay
+    if args.timeout is not None:
+        settings.natsTimeout = args.timeout
+    if args.max_retries is not None:
+        settings.natsMaxRetries = args.max_retries
+    settings.natsEnabled = True
+    # Leave the control socket and event log of a starter running on this machine alone
+    settings.controlEnabled = False
+    settings.eventLogEnabled = False
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+
+    try:
+        result = asyncio.run(run(args))
+        sys.exit(0 if result else 1)
+    except KeyboardInterrupt:
+        logger.info("Test interrupted by user")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
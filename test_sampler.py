@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+GPIO Sampler Test
+Drives the mock GPIO backend with synthetic waveforms (clean presses, contact
+bounce, noise spikes, short pulses) and checks the transitions found by the
+polled sampling mode, their timestamp error and the sampling CPU cost.
+"""
+
+import argparse
+import bisect
+import logging
+import os
+import sys
+import time
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from gpio_nats_logging import logger
+import gpio_sampler
+from gpio_sampler import GPIOSampler
+from simple_gpio_handler import GPIO
+
+TEST_PIN = 6
+
+
+def bounce(at, level, count=5, width=0.0004):
+    """Edges of a contact bouncing `count` times before settling at `level`."""
+    edges = []
+    for i in range(count):
+        edges.append((at + 2 * i * width, level))
+        edges.append((at + (2 * i + 1) * width, level ^ 1))
+    edges.append((at + 2 * count * width, level))
+    return edges
+
+
+def spikes(start, count, spacing, width=0.0002):
+    """Edges of `count` short high spikes on an idle low line."""
+    edges = []
+    for i in range(count):
+        edges.append((start + i * spacing, 1))
+        edges.append((start + i * spacing + width, 0))
+    return edges
+
+
+# Scenario name -> (waveform edges as (seconds, level), expected transitions as (seconds, level))
+SCENARIOS = {
+    "clean": (
+        [(0.05, 1), (0.15, 0)],
+        [(0.05, 1), (0.15, 0)],
+    ),
+    "bouncy": (
+        bounce(0.05, 1) + bounce(0.20, 0),
+        [(0.05, 1), (0.20, 0)],
+    ),
+    "noise": (
+        spikes(0.02, 20, 0.01),
+        [],
+    ),
+    "short-pulse": (
+        [(0.05, 1), (0.058, 0)],
+        [(0.05, 1), (0.058, 0)],
+    ),
+    "noisy-press": (
+        spikes(0.01, 5, 0.006) + bounce(0.06, 1) + [(0.16, 0)] + spikes(0.18, 5, 0.006),
+        [(0.06, 1), (0.16, 0)],
+    ),
+}
+
+
+def make_waveform(edges, t0_ns):
+    """Return waveform(t_ns) -> level following `edges` from t0_ns on."""
+    edge_ns = [t0_ns + int(t * 1e9) for t, _ in edges]
+    edge_levels = [level for _, level in edges]
+
+    def waveform(t_ns):
+        index = bisect.bisect_right(edge_ns, t_ns)
+        return edge_levels[index - 1] if index else 0
+
+    return waveform
+
+
+def run_scenario(name, args):
+    edges, expected = SCENARIOS[name]
+    transitions = []
+
+    def on_transition(channel, level, t_ns):
+        transitions.append((level, t_ns))
+
+    duration = (edges[-1][0] if edges else 0) + 0.1
+    sampler = GPIOSampler(GPIO.input, TEST_PIN, on_transition, rate_hz=args.rate,
+                          block_size=args.block, stable_time=args.stable_time,
+                          report_interval=duration)
+    t0_ns = time.monotonic_ns() + 20_000_000
+    GPIO.set_waveform(TEST_PIN, make_waveform(edges, t0_ns))
+    sampler.start()
+    time.sleep(duration + 0.02 + 2 * args.block / args.rate)
+    sampler.stop()
+    GPIO.set_waveform(TEST_PIN, None)
+
+    metrics = sampler.get_metrics()
+    errors_us = []
+    ok = len(transitions) == len(expected)
+    for (level, t_ns), (offset, expected_level) in zip(transitions, expected):
+        error_us = (t_ns - t0_ns - offset * 1e9) / 1e3
+        errors_us.append(error_us)
+        ok = ok and level == expected_level and abs(error_us) <= args.max_error_us
+
+    print(f"{'PASS' if ok else 'FAIL'} {name:12} transitions {len(transitions)}/{len(expected)}, "
+          f"edges {metrics['edges']}, glitches {metrics['glitches']}, late {metrics['late_samples']}")
+    if errors_us:
+        print(f"     timestamp error: " + ", ".join(f"{e:+.0f}us" for e in errors_us))
+    print(f"     rate {metrics['achieved_rate']} Hz, CPU {metrics['cpu_percent']}%, "
+          f"detect {metrics['detect_us_per_block']} us/block")
+    return ok
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Check polled GPIO sampling with synthetic waveforms")
+    parser.add_argument("--scenario", choices=list(SCENARIOS), action="append",
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--rate", type=int, default=10000, help="Samples per second")
+    parser.add_argument("--block", type=int, default=500, help="Samples per detection block")
+    parser.add_argument("--stable-time", type=float, default=0.005, help="Seconds a level must hold")
+    parser.add_argument("--max-error-us", type=float, default=1000.0,
+                        help="Allowed transition timestamp error in microseconds")
+    parser.add_argument("--no-numpy", action="store_true", help="Use the bytearray detection fallback")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+    if args.no_numpy:
+        gpio_sampler.numpy_available = False
+    if not hasattr(GPIO, "set_waveform"):
+        print("Synthetic waveforms need the mock GPIO backend (not available on a Raspberry Pi)")
+        sys.exit(1)
+
+    print(f"Detection backend: {'numpy' if gpio_sampler.numpy_available else 'bytearray'}")
+    results = [run_scenario(name, args) for name in (args.scenario or SCENARIOS)]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
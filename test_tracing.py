@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Tracing Test
+Publishes traced triggers to a stand-in NATS server and checks that every
+message carries a traceparent header naming its exported nats.publish span,
+that a server without header support gets the messages without headers, and
+that the trace collector drops traces that never get a publish span and spans
+that arrive after their trace was finished.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from gpio_nats_logging import logger
+from gpio_nats_settings import settings
+from trace_collector import TraceStore
+
+TEST_PIN = 6
+
+
+def check(name, ok, detail=""):
+    print(f"{'PASS' if ok else 'FAIL'} {name:16} {detail}")
+    return ok
+
+
+async def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+def parse_headers(headers):
+    """Header block of an HPUB (``NATS/1.0`` line, then ``Key: value`` lines) as a dict."""
+    if headers is None:
+        return None
+    lines = headers.decode().split("\r\n")[1:]
+    return dict(line.split(": ", 1) for line in lines if line)
+
+
+def read_spans(path):
+    spans = []
+    with open(path) as f:
+        for line in f:
+            for resource_spans in json.loads(line)["resourceSpans"]:
+                for scope_spans in resource_spans["scopeSpans"]:
+                    spans.extend(scope_spans["spans"])
+    return spans
+
+
+async def publish_traced(count, version, export):
+    """Run the application against a stand-in server; return the received headers and exported spans."""
+    from main import GPIONATSSender
+    from nats_standin import StandInNATSServer
+
+    settings.tracingExport = export
+    received = []
+    server = StandInNATSServer(version=version)
+    server.on_publish = lambda subject, payload, headers, t_ns: received.append(parse_headers(headers))
+    await server.start()
+    app = GPIONATSSender()
+    app.nats_server = server.url
+    try:
+        if not await app.initialize():
+            return None, []
+        for _ in range(count):
+            app.submit_trigger(TEST_PIN)
+        await wait_for(lambda: len(received) == count, 5)
+    finally:
+        # Shuts the tracer down, which flushes the exported spans
+        await app.cleanup()
+        await server.stop()
+    return received, read_spans(export) if os.path.exists(export) else []
+
+
+async def test_propagation(count, directory):
+    received, spans = await publish_traced(count, "2.10.0", os.path.join(directory, "traces.jsonl"))
+    if received is None:
+        return check("propagation", False, "application did not initialize")
+    by_id = {(span["traceId"], span["spanId"]): span for span in spans}
+    matched = 0
+    for headers in received:
+        version, trace_id, span_id, flags = (headers or {}).get("traceparent", "---").split("-")
+        span = by_id.get((trace_id, span_id))
+        parent = by_id.get((trace_id, span.get("parentSpanId"))) if span else None
+        matched += (version == "00" and flags == "01" and span is not None and span["name"] == "nats.publish"
+                    and parent is not None and parent["name"] == "trigger.publish")
+    traces = {span["traceId"] for span in spans if span["name"] == "trigger.submit"}
+    return check("propagation", len(received) == count and matched == count and len(traces) == count,
+                 f"{matched}/{len(received)} traceparent headers match a nats.publish span, "
+                 f"{len(traces)} traces")
+
+
+async def test_no_headers(count, directory):
+    # nats-server before 2.2 closes the connection on HPUB, so headers must not be sent
+    received, spans = await publish_traced(count, "2.1.0", os.path.join(directory, "old-server.jsonl"))
+    if received is None:
+        return check("no headers", False, "application did not initialize")
+    published = sum(span["name"] == "nats.publish" for span in spans)
+    return check("no headers", len(received) == count and all(headers is None for headers in received)
+                 and published == count, f"{len(received)}/{count} received without headers, "
+                                         f"{published} nats.publish spans still exported")
+
+
+def document(*spans):
+    return {"resourceSpans": [{"scopeSpans": [{"spans": [
+        {"traceId": trace_id, "spanId": f"{index:016x}", "name": name,
+         "startTimeUnixNano": str(int(start * 1e9)), "endTimeUnixNano": str(int(end * 1e9))}
+        for index, (trace_id, name, start, end) in enumerate(spans)
+    ]}]}]}
+
+
+def test_collector_aging():
+    store = TraceStore(quiet=True, timeout=10)
+    # "a" never gets its publish span; "b" completes and then gets a late span
+    store.add_document(document(("a", "trigger.submit", 100, 100.001)))
+    store.add_document(document(("b", "trigger.submit", 101, 101.001), ("b", "trigger.publish", 101, 101.01)))
+    store.add_document(document(("b", "gpio.callback", 101, 101.002)))
+    kept_late = "b" in store.traces
+    # Span time moves on past the timeout
+    store.add_document(document(("c", "trigger.submit", 120, 120.001), ("c", "trigger.publish", 120, 120.01)))
+    store.add_document(document(("c", "nats.publish", 120, 120.005)))
+    ok = (not kept_late and store.incomplete == 1 and store.late_spans == 2 and not store.traces
+          and len(store.end_to_end) == 2 and set(store.finished) == {"a", "c"})
+    return check("collector aging", ok, f"{store.incomplete} incomplete, {store.late_spans} late spans, "
+                                        f"{len(store.traces)} open, {len(store.finished)} remembered")
+
+
+async def run(args):
+    settings.natsEnabled = True
+    settings.gpioEnabled = False
+    settings.gpioPin = TEST_PIN
+    settings.controlEnabled = False
+    settings.eventLogEnabled = False
+    settings.heartbeatEnabled = False
+    settings.tracingSampleRate = 1.0
+
+    with tempfile.TemporaryDirectory() as directory:
+        return [
+            await test_propagation(args.count, directory),
+            await test_no_headers(args.count, directory),
+            test_collector_aging(),
+        ]
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Check trace context propagation and the trace collector")
+    parser.add_argument("--count", type=int, default=5, help="Traced triggers per run")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+
+    results = asyncio.run(run(args))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Trigger Queue Test
+Checks the bounded trigger queue: the drop_oldest, drop_newest and coalesce
+overflow policies, priority lanes, the expiry of triggers held longer than
+triggerMaxAge while publishing is paused, and that triggers are held, not
+failed, while NATS is disconnected.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from gpio_nats_logging import logger
+from gpio_nats_settings import settings
+from trigger_queue import TriggerQueue, QUEUED, REPLACED, COALESCED, DROPPED
+from trigger_routes import Route
+
+ROUTE_A = Route("a", "test.a", "a", 0, b"a")
+ROUTE_B = Route("b", "test.b", "b", 0, b"b")
+
+
+def drain(queue):
+    items = []
+    while True:
+        item = queue.pop()
+        if item is None:
+            return items
+        items.append(item)
+
+
+def check(name, ok, detail=""):
+    print(f"{'PASS' if ok else 'FAIL'} {name:14} {detail}")
+    return ok
+
+
+def test_drop_oldest():
+    queue = TriggerQueue(3, 1, "drop_oldest")
+    results = [queue.put(ROUTE_A, channel, channel) for channel in range(5)]
+    channels = [item[1] for item in drain(queue)]
+    return check("drop_oldest", results == [QUEUED] * 3 + [REPLACED] * 2 and channels == [2, 3, 4]
+                 and queue.dropped == 2, f"results {results}, kept channels {channels}")
+
+
+def test_drop_newest():
+    queue = TriggerQueue(3, 1, "drop_newest")
+    results = [queue.put(ROUTE_A, channel, channel) for channel in range(5)]
+    channels = [item[1] for item in drain(queue)]
+    return check("drop_newest", results == [QUEUED] * 3 + [DROPPED] * 2 and channels == [0, 1, 2]
+                 and queue.dropped == 2, f"results {results}, kept channels {channels}")
+
+
+def test_coalesce():
+    queue = TriggerQueue(2, 1, "coalesce")
+    results = [queue.put(ROUTE_A, 6, 1), queue.put(ROUTE_B, 6, 2),
+               queue.put(ROUTE_A, 6, 3), queue.put(ROUTE_A, 6, 4),
+               # No queued trigger for this route and channel to merge into
+               queue.put(ROUTE_A, 7, 5)]
+    items = [(route.name, channel, count) for route, channel, _, count, _, _ in drain(queue)]
+    expected_results = [QUEUED, QUEUED, COALESCED, COALESCED, DROPPED]
+    return check("coalesce", results == expected_results and items == [("a", 6, 3), ("b", 6, 1)]
+                 and queue.coalesced == 2 and queue.dropped == 1, f"results {results}, queued {items}")
+
+
+def test_lanes():
+    queue = TriggerQueue(4, 3)
+    for channel, lane in ((1, 2), (2, 1), (3, 2), (4, 0), (5, 1), (6, 9)):
+        queue.put(ROUTE_A, channel, channel, lane)
+    order = [(item[1], item[4]) for item in drain(queue)]
+    # Lane 0 first, FIFO within a lane; out-of-range lanes are clamped to the last one
+    expected = [(4, 0), (2, 1), (5, 1), (1, 2), (3, 2), (6, 2)]
+    return check("lanes", order == expected and len(queue) == 0, f"(channel, lane) order {order}")
+
+
+def configure_app(nats_enabled, max_age=0):
+    settings.natsEnabled = nats_enabled
+    settings.gpioEnabled = False
+    settings.controlEnabled = False
+    settings.eventLogEnabled = False
+    settings.heartbeatEnabled = False
+    settings.triggerMaxAge = max_age
+
+
+async def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+async def test_max_age(args):
+    configure_app(False, args.max_age)
+    from main import GPIONATSSender
+
+    app = GPIONATSSender()
+    if not await app.initialize():
+        return check("max age", False, "application did not initialize")
+    app._ctl_pause({})
+    app.submit_trigger(6)
+    await asyncio.sleep(args.max_age * 1.5)
+    app.submit_trigger(7)
+    app._ctl_resume({})
+    await asyncio.sleep(0.3)
+    await app.cleanup()
+    # NATS is disabled, so the fresh trigger is attempted and counted as a failure
+    return check("max age", app.expired == 1 and app.publish_failures == 1 and len(app.trigger_queue) == 0,
+                 f"expired {app.expired}, attempted {app.publish_failures}")
+
+
+async def test_disconnect_hold():
+    configure_app(True)
+    from main import GPIONATSSender
+    from nats_standin import StandInNATSServer
+
+    server = StandInNATSServer()
+    await server.start()
+    app = GPIONATSSender()
+    app.nats_server = server.url
+    if not await app.initialize():
+        await server.stop()
+        return check("disconnect", False, "application did not initialize")
+    try:
+        app.submit_trigger(6)
+        await wait_for(lambda: app.published == 1, 5)
+        # The worker is idle, waiting for the next trigger, when the connection goes
+        restart = asyncio.create_task(server.restart(2.0))
+        await wait_for(lambda: not app.nats_client.get_connection_status(), 5)
+        app.submit_trigger(7)
+        await asyncio.sleep(0.5)
+        held = len(app.trigger_queue)
+        failed_while_down = app.publish_failures
+        await restart
+        reconnected = await wait_for(lambda: app.nats_client.get_connection_status(), 15)
+        await wait_for(lambda: app.published == 2, 5)
+    finally:
+        await app.cleanup()
+        await server.stop()
+    events = [event for _, event, _, _ in app.events if event in ("disconnected", "reconnected")]
+    ok = held == 1 and not failed_while_down and reconnected and app.published == 2 and not app.publish_failures
+    return check("disconnect", ok, f"held {held} while disconnected, failed {app.publish_failures}, "
+                                   f"published {app.published}, events {events}")
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Check the trigger queue overflow policies, lanes and expiry")
+    parser.add_argument("--max-age", type=float, default=0.5, help="triggerMaxAge for the expiry check (seconds)")
+    parser.add_argument("--verbose", action="store_true", help="Show application logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+
+    results = [test_drop_oldest(), test_drop_newest(), test_coalesce(), test_lanes(),
+               asyncio.run(test_max_age(args)), asyncio.run(test_disconnect_hold())]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
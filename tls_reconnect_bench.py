@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+TLS Reconnect Benchmark
+Measures how long the NATS client takes to reconnect after the server drops the
+connection, over plaintext, TLS with a full handshake and TLS with session
+resumption, against the local TLS-enabled stand-in server.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from nats.aio.client import Client as NATS
+from gpio_nats_logging import logger
+from nats_security import create_tls_context
+from nats_standin import StandInNATSServer
+
+
+def generate_certificate(directory, key_type):
+    """Self-signed certificate for 'localhost' and 127.0.0.1, made with the openssl command."""
+    cert = os.path.join(directory, "server.pem")
+    key = os.path.join(directory, "server.key")
+    key_options = ["-newkey", "rsa:2048"] if key_type == "rsa" else ["-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:P-256"]
+    subprocess.run(
+        ["openssl", "req", "-x509", "-nodes", "-days", "1", *key_options, "-keyout", key, "-out", cert,
+         "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1"],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+
+def server_context(cert, key, tls_version):
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    if tls_version == "1.2":
+        context.maximum_version = ssl.TLSVersion.TLSv1_2
+    return context
+
+
+async def measure(name, server, client_tls, reconnects):
+    """Drop the connection ``reconnects`` times; return reconnect times (ms), CPU times (ms) and resumptions."""
+    reconnected = asyncio.Event()
+
+    async def on_reconnect():
+        reconnected.set()
+
+    nc = NATS()
+    await nc.connect(
+        servers=[server.url.replace("tls://", "nats://")],
+        tls=client_tls,
+        tls_hostname="localhost" if client_tls else None,
+        reconnect_time_wait=0.01,
+        max_reconnect_attempts=-1,
+        reconnected_cb=on_reconnect,
+        ping_interval=60
+    )
+    wall, cpu, resumed = [], [], 0
+    for _ in range(reconnects):
+        reconnected.clear()
+        start = time.perf_counter()
+        start_cpu = time.process_time()
+        for writer in list(server.clients):
+            writer.transport.abort()
+        await asyncio.wait_for(reconnected.wait(), timeout=10)
+        await nc.flush(timeout=5)
+        wall.append((time.perf_counter() - start) * 1000)
+        cpu.append((time.process_time() - start_cpu) * 1000)
+        sslobj = nc._transport._io_writer.get_extra_info("ssl_object") if client_tls else None
+        if sslobj is not None and sslobj.session_reused:
+            resumed += 1
+    await nc.close()
+    if hasattr(client_tls, "get_metrics"):
+        # The context counts resumptions itself; it must agree with the connections
+        counted = client_tls.get_metrics()["resumed"]
+        if counted != resumed:
+            print(f"  {name}: context counted {counted} resumed handshakes, connections show {resumed}")
+    return wall, cpu, resumed
+
+
+def report(name, wall, cpu, resumed, reconnects, tls):
+    wall = sorted(wall)
+    resumption = f"  resumed {resumed}/{reconnects}" if tls else ""
+    print(f"  {name:16} p50 {statistics.median(wall):7.2f}ms  p90 {wall[int(0.9 * (len(wall) - 1))]:7.2f}ms  "
+          f"max {wall[-1]:7.2f}ms  cpu/reconnect {statistics.mean(cpu):6.2f}ms{resumption}")
+
+
+async def run(args, cert, key):
+    context = server_context(cert, key, args.tls_version)
+    cases = [
+        ("plaintext", None, None),
+        ("tls full", context, create_tls_context(ca_file=cert, resume=False)),
+        ("tls resumed", context, create_tls_context(ca_file=cert, resume=True)),
+    ]
+    print(f"Reconnect latency over {args.reconnects} server-side drops (TLS {args.tls_version}, {args.key_type} key):")
+    for name, server_tls, client_tls in cases:
+        server = StandInNATSServer(ssl_context=server_tls)
+        await server.start()
+        try:
+            wall, cpu, resumed = await measure(name, server, client_tls, args.reconnects)
+        finally:
+            await server.stop()
+        report(name, wall, cpu, resumed, args.reconnects, client_tls is not None)
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark NATS reconnects with and without TLS session resumption")
+    parser.add_argument("--reconnects", type=int, default=50, help="Connection drops per case")
+    parser.add_argument("--tls-version", choices=["1.2", "1.3"], default="1.3", help="Highest TLS version offered by the server")
+    parser.add_argument("--key-type", choices=["rsa", "ec"], default="rsa", help="Server key type for the generated certificate")
+    parser.add_argument("--cert", help="Server certificate (default: generate a self-signed one)")
+    parser.add_argument("--key", help="Server private key for --cert")
+    parser.add_argument("--verbose", action="store_true", help="Show application log output")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)
+        logging.getLogger("nats").setLevel(logging.CRITICAL)
+        logging.getLogger("asyncio").setLevel(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.cert:
+            cert, key = args.cert, args.key
+        else:
+            cert, key = generate_certificate(directory, args.key_type)
+        asyncio.run(run(args, cert, key))
+
+
+if __name__ == "__main__":
+    main()
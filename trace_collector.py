@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Trace Collector Stand-in
+Receives OTLP/JSON trace exports over HTTP (like an OpenTelemetry collector on
+port 4318) or reads a span export file, and breaks every trigger down into the
+time spent in the GPIO callback, the loop/queue handoff and the NATS publish.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+from collections import OrderedDict, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+from utils import percentile
+
+# Span names in the order they happen for a trigger
+STAGES = ("gpio.callback", "trigger.submit", "trigger.wait", "trigger.publish", "nats.publish")
+
+# Seconds of span time after which a trace without a trigger.publish span (a dropped or
+# expired trigger, a lost export batch) is given up
+TRACE_TIMEOUT_S = 30.0
+
+
+class TraceStore:
+    """Collects spans by trace and prints each trace once its publish span arrives.
+
+    Traces that get no publish span within ``timeout`` seconds of span time are counted
+    and dropped, and so are spans arriving after their trace was reported or dropped, so
+    a long-running collector only holds the traces still in flight.
+    """
+
+    def __init__(self, quiet=False, timeout=TRACE_TIMEOUT_S):
+        self.quiet = quiet
+        self.timeout_ns = int(timeout * 1e9)
+        # Trace id -> {span name: (start, end)}, oldest trace first
+        self.traces = OrderedDict()
+        # Trace id -> span time it was finished at, for traces reported or given up
+        self.finished = OrderedDict()
+        self.newest_ns = 0
+        self.incomplete = 0
+        self.late_spans = 0
+        self.durations = defaultdict(list)
+        self.end_to_end = []
+        self.lock = threading.Lock()
+
+    def add_document(self, document):
+        with self.lock:
+            for resource_spans in document.get("resourceSpans", []):
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    for span in scope_spans.get("spans", []):
+                        self._add_span(span)
+            self._expire()
+
+    def _add_span(self, span):
+        start = int(span["startTimeUnixNano"])
+        end = int(span["endTimeUnixNano"])
+        name = span["name"]
+        trace_id = span["traceId"]
+        self.durations[name].append((end - start) / 1e6)
+        self.newest_ns = max(self.newest_ns, end)
+        if trace_id in self.finished:
+            self.late_spans += 1
+            return
+        trace = self.traces.setdefault(trace_id, {})
+        trace[name] = (start, end)
+        if name == "trigger.publish":
+            # The publish span ends last, after its children and the earlier stages
+            self._report(trace_id, self.traces.pop(trace_id))
+            self.finished[trace_id] = self.newest_ns
+
+    def _expire(self):
+        horizon = self.newest_ns - self.timeout_ns
+        while self.traces:
+            trace_id, trace = next(iter(self.traces.items()))
+            if max(end for _, end in trace.values()) > horizon:
+                break
+            del self.traces[trace_id]
+            self.finished[trace_id] = self.newest_ns
+            self.incomplete += 1
+        while self.finished and next(iter(self.finished.values())) <= horizon:
+            self.finished.popitem(last=False)
+
+    def _report(self, trace_id, trace):
+        first = min(start for start, _ in trace.values())
+        last = max(end for _, end in trace.values())
+        self.end_to_end.append((last - first) / 1e6)
+        if self.quiet:
+            return
+        parts = [f"{name} {(trace[name][1] - trace[name][0]) / 1e6:.3f}ms" for name in STAGES if name in trace]
+        print(f"{trace_id[:16]}  total {(last - first) / 1e6:.3f}ms  |  " + "  ".join(parts))
+
+    def summary(self):
+        print("\nSpan durations (ms):")
+        rows = [(name, self.durations[name]) for name in STAGES if name in self.durations]
+        rows.append(("edge to publish", self.end_to_end))
+        for name, values in rows:
+            if not values:
+                continue
+            values = sorted(values)
+            print(f"  {name:16} n={len(values):<6} p50 {percentile(values, 50):8.3f}  "
+                  f"p99 {percentile(values, 99):8.3f}  max {values[-1]:8.3f}")
+        if self.incomplete or self.late_spans:
+            print(f"  {self.incomplete} traces without a publish span dropped after "
+                  f"{self.timeout_ns / 1e9:g}s, {self.late_spans} late spans")
+
+
+def make_handler(store):
+    class OTLPHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                store.add_document(json.loads(self.rfile.read(length)))
+                self.send_response(200)
+                body = b"{}"
+            except (ValueError, KeyError) as e:
+                self.send_response(400)
+                body = json.dumps({"error": str(e)}).encode()
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return OTLPHandler
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Collect and summarize dunebugger-starter trace spans")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--listen", metavar="HOST:PORT", help="Accept OTLP/HTTP JSON exports, e.g. 0.0.0.0:4318")
+    source.add_argument("--file", help="Read a span export file written by the application")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary")
+    parser.add_argument("--trace-timeout", type=float, default=TRACE_TIMEOUT_S,
+                        help="Seconds after which a trace without a publish span is dropped")
+    args = parser.parse_args()
+
+    store = TraceStore(quiet=args.quiet, timeout=args.trace_timeout)
+    if args.file:
+        with open(args.file) as f:
+            for line in f:
+                if line.strip():
+                    store.add_document(json.loads(line))
+        store.summary()
+        return
+
+    host, _, port = args.listen.rpartition(':')
+    server = ThreadingHTTPServer((host or "0.0.0.0", int(port)), make_handler(store))
+    print(f"Collecting traces on http://{args.listen}/v1/traces (Ctrl+C for summary)")
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.summary()
+
+
+if __name__ == "__main__":
+    main()